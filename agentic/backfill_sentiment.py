@@ -0,0 +1,267 @@
+"""
+Historical Sentiment Backfill
+=============================
+Date-aware sentiment for every (Symbol, Date) row of the dataset, written to
+the `sentiment` side table of the columnar dataset store
+(crypto_price_prediction/scripts/dataset_store.py) instead of a rewritten CSV.
+
+For each row, the articles published in the `--window-days` before the end
+of that day are taken from the news store (web_api/backend/services/
+news_store.py), optionally seeded from a local fixture file, and analyzed
+with the backend's sentiment prompt. Rows whose windows hold the same
+articles share one analysis, and windows of different coins ending on the
+same day are analyzed together, `--batch-size` coins per LLM prompt (a
+batch the LLM answers incompletely falls back to one prompt per coin).
+Rows without news get NEUTRAL without a call.
+
+- Bounded concurrency: `--concurrency` prompts in flight, all going
+  through the backend LLM gateway (LLM_MAX_CONCURRENCY slots, circuit breaker)
+- Checkpoint/resume: every finished row is appended to a JSON-lines
+  checkpoint; a rerun skips those rows, so an interrupted backfill resumes
+  where it stopped. `--restart` discards the checkpoint
+- Results produced while the LLM was unavailable (keyword fallback) are not
+  checkpointed and are retried by the next run
+- The side table is rewritten from the checkpoint every `--flush-every`
+  prompts, on completion and on Ctrl+C
+
+Fixture format (`--fixtures`): {"Bitcoin": [{"id", "title", "body",
+"source", "url", "published_on"}, ...], "Ethereum": [...]}
+
+Usage:
+    python backfill_sentiment.py                                   # every row
+    python backfill_sentiment.py --symbols BTC --from 2021-01-01   # a slice
+    python backfill_sentiment.py --fixtures news_fixture.json --concurrency 4
+    python backfill_sentiment.py --batch-size 1                    # one prompt per window
+
+    from dataset_store import load_dataset
+    df = load_dataset(columns=['Symbol', 'Date', 'Close'], side=['sentiment'])
+"""
+
+import argparse
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT))
+sys.path.append(str(ROOT / "web_api" / "backend"))
+
+from crypto_price_prediction.scripts.dataset_store import DatasetStore, STORE_PATH  # noqa: E402
+from services.llm_gateway import LLM_MAX_CONCURRENCY  # noqa: E402
+from services.news_store import NewsStore, NEWS_STORE_PATH  # noqa: E402
+from services.sentiment_service import SentimentService, NEWS_PROMPT_ARTICLES, SENTIMENT_BATCH_SIZE  # noqa: E402
+
+CHECKPOINT_PATH = Path(__file__).parent / "state" / "sentiment_backfill.jsonl"
+SIDE_TABLE = "sentiment"
+SIDE_COLUMNS = ['Sentiment', 'Sentiment_Score', 'Sentiment_Confidence', 'Key_Factors', 'Sentiment_Articles']
+NO_NEWS = {'sentiment': 'NEUTRAL', 'score': 0, 'confidence': 0.5, 'key_factors': []}
+
+
+# ========================================
+# Checkpoint
+# ========================================
+
+def load_checkpoint(path: Path) -> Dict[Tuple[str, str], Dict]:
+    """Finished rows by (Symbol, Date); a torn last line from a crash is ignored"""
+    done = {}
+    if path.exists():
+        with open(path) as f:
+            for line in f:
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                done[(row['Symbol'], row['Date'])] = row
+    return done
+
+
+def flush_side_table(store: DatasetStore, done: Dict[Tuple[str, str], Dict]) -> int:
+    """Upsert every checkpointed row into the side table"""
+    if not done:
+        return 0
+    df = pd.DataFrame(list(done.values()))
+    store.write_side_table(SIDE_TABLE, df, SIDE_COLUMNS,
+                           defaults={'Sentiment': 'NEUTRAL', 'Sentiment_Score': 0, 'Sentiment_Confidence': 0.5,
+                                     'Key_Factors': '', 'Sentiment_Articles': 0})
+    return len(df)
+
+
+# ========================================
+# Work units
+# ========================================
+
+def plan(rows: pd.DataFrame, news: NewsStore, window_days: float) -> Tuple[Dict, List[Dict]]:
+    """
+    Group rows by the article set of their news window
+
+    Returns:
+        ({(name, article ids): {'name', 'articles', 'as_of', 'rows'}}, rows without news)
+    """
+    groups, no_news = {}, []
+    window = int(window_days * 86400)
+    for name, coin_rows in rows.groupby('Name', sort=False):
+        # One read per coin; windows are binary searches on published_on
+        articles = news.between(str(name).lower())
+        published = np.array([a['published'] for a in articles], dtype=np.int64)
+        for row in coin_rows.itertuples(index=False):
+            until = int(pd.Timestamp(row.Date).timestamp()) + 1
+            lo = int(np.searchsorted(published, until - window, side='left'))
+            hi = int(np.searchsorted(published, until, side='left'))
+            key_row = {'Symbol': row.Symbol, 'Date': str(pd.Timestamp(row.Date))}
+            if hi == lo:
+                no_news.append(key_row)
+                continue
+            window_articles = articles[max(lo, hi - NEWS_PROMPT_ARTICLES):hi][::-1]  # Newest first
+            key = (name, tuple(a['id'] for a in window_articles))
+            if key not in groups:
+                as_of = datetime.fromtimestamp(window_articles[0]['published'], timezone.utc).strftime('%Y-%m-%d')
+                groups[key] = {'name': str(name), 'articles': window_articles, 'as_of': as_of, 'rows': []}
+            groups[key]['rows'].append(key_row)
+    return groups, no_news
+
+
+def batches(groups: Dict, batch_size: int) -> List[List[Dict]]:
+    """Pack windows with the same as_of date into prompts of up to batch_size distinct coins"""
+    by_date = {}
+    for group in groups.values():
+        by_date.setdefault(group['as_of'], []).append(group)
+    packed = []
+    for same_day in by_date.values():
+        while same_day:
+            batch, rest = [], []
+            for group in same_day:
+                if len(batch) < batch_size and all(group['name'] != other['name'] for other in batch):
+                    batch.append(group)
+                else:
+                    rest.append(group)
+            packed.append(batch)
+            same_day = rest
+    return packed
+
+
+def _result_row(key_row: Dict, sentiment: Dict, n_articles: int) -> Dict:
+    return dict(key_row,
+                Sentiment=sentiment.get('sentiment', 'NEUTRAL'),
+                Sentiment_Score=sentiment.get('score', 0),
+                Sentiment_Confidence=sentiment.get('confidence', 0.5),
+                Key_Factors=', '.join(sentiment.get('key_factors', [])),
+                Sentiment_Articles=n_articles)
+
+
+# ========================================
+# Backfill
+# ========================================
+
+def backfill(symbols: Optional[List[str]] = None, start=None, end=None, window_days: float = 3,
+             concurrency: int = LLM_MAX_CONCURRENCY, batch_size: int = SENTIMENT_BATCH_SIZE,
+             flush_every: int = 50, fixtures: Optional[Path] = None,
+             restart: bool = False, checkpoint_path: Path = CHECKPOINT_PATH, store_path: Path = STORE_PATH,
+             news_path: Path = NEWS_STORE_PATH) -> Dict:
+    """
+    Score every unfinished row in the selection and write the side table
+
+    Returns:
+        Counts: rows, skipped (already checkpointed), windows (analyzed), llm_calls (prompts,
+        before per-coin fallbacks), no_news, retry (LLM unavailable)
+    """
+    store = DatasetStore(store_path)
+    news = NewsStore(news_path)
+    if fixtures:
+        with open(fixtures) as f:
+            for name, articles in json.load(f).items():
+                # watermark=0: historical fixtures go in even when newer news is already stored
+                added = news.add(name.lower(), articles, watermark=0)
+                print(f"✓ Fixtures: {added} new {name} article(s)")
+
+    checkpoint_path.parent.mkdir(parents=True, exist_ok=True)
+    if restart:
+        checkpoint_path.unlink(missing_ok=True)
+    done = load_checkpoint(checkpoint_path)
+
+    rows = store.load(columns=['Symbol', 'Date', 'Name'], symbols=symbols, start=start, end=end)
+    rows['Symbol'], rows['Name'] = rows['Symbol'].astype(str), rows['Name'].astype(str)
+    selected = len(rows)
+    finished = set(done)
+    pending = np.array([(s, str(pd.Timestamp(d))) not in finished for s, d in zip(rows['Symbol'], rows['Date'])],
+                       dtype=bool)
+    rows = rows.loc[pending]
+    groups, no_news = plan(rows, news, window_days)
+    work = batches(groups, max(1, batch_size))
+    stats = {'rows': selected, 'skipped': selected - len(rows), 'windows': 0, 'llm_calls': 0,
+             'no_news': len(no_news), 'retry': 0}
+    print(f"📊 {selected} rows selected, {stats['skipped']} already done, "
+          f"{len(groups)} distinct news windows to analyze in {len(work)} prompts, {len(no_news)} rows without news")
+
+    with open(checkpoint_path, 'a') as checkpoint:
+        def record(row: Dict):
+            done[(row['Symbol'], row['Date'])] = row
+            checkpoint.write(json.dumps(row) + "\n")
+
+        for key_row in no_news:
+            record(_result_row(key_row, NO_NEWS, 0))
+        checkpoint.flush()
+
+        service = SentimentService()
+        started = time.time()
+        executor = ThreadPoolExecutor(max_workers=max(1, concurrency))
+        try:
+            futures = {executor.submit(service.analyze_sentiment_batch,
+                                       {group['name']: group['articles'] for group in batch},
+                                       batch[0]['as_of'], batch_size): batch
+                       for batch in work}
+            for i, future in enumerate(as_completed(futures), 1):
+                batch = futures[future]
+                stats['llm_calls'] += 1
+                sentiments = future.result()
+                for group in batch:
+                    stats['windows'] += 1
+                    sentiment = sentiments[group['name']]
+                    if sentiment.get('degraded'):
+                        stats['retry'] += len(group['rows'])
+                        continue
+                    for key_row in group['rows']:
+                        record(_result_row(key_row, sentiment, len(group['articles'])))
+                checkpoint.flush()
+                if i % flush_every == 0:
+                    flush_side_table(store, done)
+                    print(f"   {stats['windows']}/{len(groups)} windows ({time.time() - started:.0f}s)")
+        except KeyboardInterrupt:
+            print("\n⚠ Interrupted; finished rows are checkpointed, rerun to resume")
+            executor.shutdown(wait=False, cancel_futures=True)
+            flush_side_table(store, done)
+            raise
+        executor.shutdown()
+
+    written = flush_side_table(store, done)
+    print(f"✓ Side table '{SIDE_TABLE}': {written} rows with sentiment "
+          f"({stats['windows']} windows in {stats['llm_calls']} prompts, {stats['retry']} rows left for a retry)")
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backfill date-aware sentiment into the dataset side table")
+    parser.add_argument('--symbols', nargs='+', help="Symbols to backfill (default: all)")
+    parser.add_argument('--from', dest='start', help="First date (YYYY-MM-DD)")
+    parser.add_argument('--to', dest='end', help="Last date, inclusive (YYYY-MM-DD)")
+    parser.add_argument('--window-days', type=float, default=3, help="Days of news before each row's close")
+    parser.add_argument('--concurrency', type=int, default=LLM_MAX_CONCURRENCY, help="Analyses in flight")
+    parser.add_argument('--batch-size', type=int, default=SENTIMENT_BATCH_SIZE, help="Coins per LLM prompt")
+    parser.add_argument('--flush-every', type=int, default=50, help="Rewrite the side table every N prompts")
+    parser.add_argument('--fixtures', type=Path, help="JSON file of articles per coin, loaded into the news store")
+    parser.add_argument('--restart', action='store_true', help="Discard the checkpoint and start over")
+    args = parser.parse_args(argv)
+    backfill(symbols=args.symbols, start=args.start, end=args.end, window_days=args.window_days,
+             concurrency=args.concurrency, batch_size=args.batch_size, flush_every=args.flush_every,
+             fixtures=args.fixtures,
+             restart=args.restart)
+
+
+if __name__ == "__main__":
+    main()
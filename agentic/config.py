@@ -190,8 +190,7 @@ COLOR_PALETTE = 'Set2'
 # FILE PATHS
 # =============================================================================
 
-DEFAULT_INPUT_FILE = 'combined_crypto_dataset (1).csv'
-DEFAULT_OUTPUT_FILE = 'combined_crypto_dataset_with_sentiment.csv'
+DEFAULT_INPUT_FILE = None  # None: the project dataset; results go to its 'sentiment' side table
 CHART_OUTPUT_PATH = './agentic/'
 
 # =============================================================================
@@ -0,0 +1,192 @@
+"""
+Memory-Mapped Model Artifacts
+=============================
+Stores fitted models and scalers so that their large arrays (support
+vectors, dual coefficients, scaler means/scales, flattened tree nodes, ...)
+are memory-mapped read-only instead of unpickled into every process.
+
+An artifact is a directory next to the original pickle:
+
+    models_svm/bitcoin_svm_model.pkl
+    models_svm/bitcoin_svm_model.artifact/
+        skeleton.pkl      # the object graph, with arrays replaced by references
+        arrays/0.npy      # one file per large array
+        arrays/1.npy
+
+Loading unpickles only the small skeleton and maps each array from its
+file, so cold start does not grow with model size and several uvicorn
+workers share the same physical pages through the OS page cache.
+
+Arrays are mapped copy-on-write (mmap_mode='c') by default: libsvm insists
+on writable buffers even though it never writes, and a private mapping
+keeps sharing clean pages with every other process while the file itself
+can never be modified.
+
+Usage:
+    from artifacts import load_model
+    model = load_model('models_svm/bitcoin_svm_model.pkl')   # exports on first use
+
+    python artifacts.py export ../models ../models_svm ../../prediction
+"""
+
+import io
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+from typing import List, Union
+
+import numpy as np
+
+ARTIFACT_SUFFIX = '.artifact'
+MIN_ARRAY_BYTES = 4096  # Smaller arrays stay inline in the skeleton
+
+
+class _ArtifactPickler(pickle.Pickler):
+    """Pickler that spills large numpy arrays and byte buffers to .npy files"""
+
+    def __init__(self, file, arrays_dir: Path, min_bytes: int):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.arrays_dir = arrays_dir
+        self.min_bytes = min_bytes
+        self.count = 0
+        self._seen = {}  # id(obj) -> (obj, ref)
+
+    def persistent_id(self, obj):
+        if isinstance(obj, np.ndarray):
+            kind = 'ndarray'
+            if obj.dtype.hasobject or obj.nbytes < self.min_bytes:
+                return None
+        elif isinstance(obj, (bytes, bytearray)):
+            # Serialized native models (e.g. an XGBoost booster buffer)
+            kind = type(obj).__name__
+            if len(obj) < self.min_bytes:
+                return None
+        else:
+            return None
+
+        # Arrays shared inside the graph are written once. The object is kept
+        # alive with its ref: a temporary (e.g. a __reduce__ buffer) could
+        # otherwise be freed and its id reused by a different buffer
+        if id(obj) in self._seen:
+            return self._seen[id(obj)][1]
+        name = f"{self.count}.npy"
+        self.count += 1
+        if kind == 'ndarray':
+            # .npy keeps Fortran order, so the mapped array has the original layout
+            np.save(self.arrays_dir / name, obj, allow_pickle=False)
+        else:
+            np.save(self.arrays_dir / name, np.frombuffer(bytes(obj), dtype=np.uint8), allow_pickle=False)
+        ref = (kind, name)
+        self._seen[id(obj)] = (obj, ref)
+        return ref
+
+
+class _ArtifactUnpickler(pickle.Unpickler):
+    """Unpickler that maps spilled arrays back from their files"""
+
+    def __init__(self, file, arrays_dir: Path, mmap_mode):
+        super().__init__(file)
+        self.arrays_dir = arrays_dir
+        self.mmap_mode = mmap_mode
+
+    def persistent_load(self, ref):
+        kind, name = ref
+        array = np.load(self.arrays_dir / name, mmap_mode=self.mmap_mode, allow_pickle=False)
+        if kind == 'ndarray':
+            return array
+        # Native libraries parse their buffers into their own memory anyway
+        data = array.tobytes()
+        return bytearray(data) if kind == 'bytearray' else data
+
+
+def artifact_path(pkl_path: Union[str, Path]) -> Path:
+    pkl_path = Path(pkl_path)
+    return pkl_path.with_name(pkl_path.stem + ARTIFACT_SUFFIX)
+
+
+def export_artifact(obj, path: Union[str, Path], min_bytes: int = MIN_ARRAY_BYTES) -> Path:
+    """
+    Write an object as a memory-mappable artifact directory
+
+    The directory is written under a temporary name and renamed into place,
+    so concurrent readers (or a second exporting worker) never see a
+    half-written artifact.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_dir = Path(tempfile.mkdtemp(prefix=f".{path.name}-", dir=path.parent))
+    os.chmod(tmp_dir, 0o755)  # mkdtemp is owner-only; workers may run as another user
+    try:
+        arrays_dir = tmp_dir / 'arrays'
+        arrays_dir.mkdir()
+        with open(tmp_dir / 'skeleton.pkl', 'wb') as f:
+            _ArtifactPickler(f, arrays_dir, min_bytes).dump(obj)
+        if path.exists():
+            shutil.rmtree(path)
+        os.replace(tmp_dir, path)
+    except OSError:
+        # Another process won the race; its artifact is equivalent
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        if not (path / 'skeleton.pkl').exists():
+            raise
+    return path
+
+
+def load_artifact(path: Union[str, Path], mmap_mode: str = 'c'):
+    """Load an artifact directory, memory-mapping its arrays"""
+    path = Path(path)
+    with open(path / 'skeleton.pkl', 'rb') as f:
+        return _ArtifactUnpickler(io.BufferedReader(f), path / 'arrays', mmap_mode).load()
+
+
+def _load_pickle(pkl_path: Path):
+    """Load a plain pickle or a joblib dump"""
+    try:
+        with open(pkl_path, 'rb') as f:
+            return pickle.load(f)
+    except pickle.UnpicklingError:
+        import joblib
+        return joblib.load(pkl_path)
+
+
+def load_model(pkl_path: Union[str, Path], mmap_mode: str = 'c'):
+    """
+    Load a model/scaler through its memory-mapped artifact
+
+    The artifact is (re)exported from the pickle when it is missing or
+    older than the pickle, so retraining and overwriting the .pkl is all
+    that is needed to publish a new model.
+    """
+    pkl_path = Path(pkl_path)
+    path = artifact_path(pkl_path)
+    skeleton = path / 'skeleton.pkl'
+    if not skeleton.exists() or skeleton.stat().st_mtime < pkl_path.stat().st_mtime:
+        export_artifact(_load_pickle(pkl_path), path)
+    return load_artifact(path, mmap_mode=mmap_mode)
+
+
+def export_directory(directory: Union[str, Path]) -> List[Path]:
+    """Export every .pkl in a directory to an artifact"""
+    exported = []
+    for pkl_path in sorted(Path(directory).glob('*.pkl')):
+        exported.append(export_artifact(_load_pickle(pkl_path), artifact_path(pkl_path)))
+    return exported
+
+
+def main(argv: List[str]):
+    if len(argv) < 2 or argv[0] != 'export':
+        print(__doc__)
+        return 1
+    for directory in argv[1:]:
+        for path in export_directory(directory):
+            arrays = list((path / 'arrays').glob('*.npy'))
+            size = sum(p.stat().st_size for p in arrays)
+            print(f"✓ {path} ({len(arrays)} mapped arrays, {size / 1024:.0f} KB)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
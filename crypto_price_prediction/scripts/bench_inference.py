@@ -0,0 +1,90 @@
+"""
+Inference Microbenchmark
+========================
+Per-prediction latency of the single-row path used by the API:
+
+    baseline: pandas Series -> reshape -> scaler.transform -> XGBClassifier.predict_proba
+    native:   CompiledTreeEnsemble.predict_proba_one on the raw feature row
+
+Rows are drawn around the scaler's training distribution, so no market
+data is needed.
+
+Usage:
+    python bench_inference.py [--model bitcoin] [--rows 2000] [--repeat 3]
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from artifacts import load_model
+from tree_inference import load_compiled
+
+MODELS_DIR = Path(__file__).parent.parent / 'models'
+
+
+def time_calls(func, rows, repeat):
+    """Best-of-`repeat` per-call latencies in microseconds"""
+    best = None
+    for _ in range(repeat):
+        latencies = np.empty(len(rows))
+        for i, row in enumerate(rows):
+            started = time.perf_counter()
+            func(row)
+            latencies[i] = time.perf_counter() - started
+        if best is None or np.median(latencies) < np.median(best):
+            best = latencies
+    return best * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Single-row inference latency")
+    parser.add_argument('--model', default='bitcoin', choices=['bitcoin', 'ethereum'])
+    parser.add_argument('--rows', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    model_pkl = MODELS_DIR / f'{args.model}_best_model.pkl'
+    scaler_pkl = MODELS_DIR / f'{args.model}_scaler.pkl'
+    model = load_model(model_pkl)
+    scaler = load_model(scaler_pkl)
+    feature_cols = list(load_model(MODELS_DIR / 'feature_columns.pkl'))
+    native = load_compiled(model_pkl, scaler_pkl)
+
+    rng = np.random.default_rng(42)
+    X = scaler.mean_ + rng.standard_normal((args.rows, len(feature_cols))) * scaler.scale_
+    series = [pd.Series(row, index=feature_cols, dtype=object) for row in X]
+
+    def baseline(latest):
+        X_latest = latest[feature_cols].values.reshape(1, -1)
+        return model.predict_proba(scaler.transform(X_latest))[0, 1]
+
+    def compiled(latest):
+        return native.predict_proba_one(np.asarray(latest[feature_cols].values, dtype=np.float64))
+
+    print(f"Model: {model_pkl.name} ({native.n_trees} trees, depth {native.max_depth}, "
+          f"{len(feature_cols)} features, {args.rows} rows)")
+    print(f"{'path':<28}{'p50 µs':>10}{'p99 µs':>10}{'mean µs':>10}")
+    results = {}
+    for name, func, rows in [
+        ('baseline (pandas + xgb)', baseline, series),
+        ('native (from Series)', compiled, series),
+        ('native (ndarray row)', native.predict_proba_one, X)
+    ]:
+        latencies = time_calls(func, rows, args.repeat)
+        results[name] = latencies
+        print(f"{name:<28}{np.percentile(latencies, 50):>10.1f}"
+              f"{np.percentile(latencies, 99):>10.1f}{latencies.mean():>10.1f}")
+
+    reference = model.predict_proba(scaler.transform(X))[:, 1]
+    max_diff = np.abs(native.predict_proba(X)[:, 1] - reference).max()
+    speedup = np.median(results['baseline (pandas + xgb)']) / np.median(results['native (ndarray row)'])
+    print(f"\n✓ Speedup (p50, ndarray row): {speedup:.1f}x")
+    print(f"✓ Max |Δ probability| vs predict_proba: {max_diff:.2e}")
+
+
+if __name__ == "__main__":
+    main()
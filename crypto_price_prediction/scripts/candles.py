@@ -0,0 +1,225 @@
+"""
+Intraday Candle Store
+=====================
+Keeps minute-level OHLCV candles per symbol and serves them resampled to
+any supported timeframe (1m, 1h, 4h, 1d).
+
+Resampled bars are built lazily on first request and cached per
+(symbol, timeframe). Appending new minutes only invalidates the buckets
+they fall into, so a refresh re-aggregates the last bar or two instead of
+the whole history.
+
+Buckets are aligned on the UTC epoch, so 4h bars close at 00:00, 04:00,
+08:00 ... and daily bars at midnight, matching the daily pipeline.
+
+With a `retention`, minutes (and cached bars) older than the retention
+before the newest minute are dropped on append, cut at a UTC midnight so
+no bar is left partial; memory and resampling cost stay bounded however
+long the process runs.
+
+Usage:
+    store = CandleStore(retention=pd.Timedelta(days=60))
+    store.append('BTC', minute_df)        # Date, Open, High, Low, Close, Volume
+    store.bars('BTC', '4h')               # resampled OHLCV
+    store.frame('1h')                     # all symbols, pipeline layout
+"""
+
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+TIMEFRAMES = {
+    '1m': 60,
+    '1h': 60 * 60,
+    '4h': 4 * 60 * 60,
+    '1d': 24 * 60 * 60
+}
+
+OHLCV_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+
+def aggregate_ohlcv(dates: np.ndarray, ohlcv: np.ndarray, seconds: int) -> pd.DataFrame:
+    """
+    Aggregate sorted candles into fixed-size epoch-aligned buckets
+
+    Args:
+        dates: datetime64 array, sorted ascending
+        ohlcv: float array of shape (n, 5) - Open, High, Low, Close, Volume
+        seconds: Bucket size in seconds
+
+    Returns:
+        DataFrame with Date (bucket start) and OHLCV columns
+    """
+    if len(dates) == 0:
+        return pd.DataFrame(columns=['Date'] + OHLCV_COLUMNS)
+
+    epoch_seconds = dates.astype('datetime64[s]').astype(np.int64)
+    buckets = epoch_seconds - (epoch_seconds % seconds)
+    # Start offset of every bucket in the sorted input
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(buckets)] - 1
+
+    return pd.DataFrame({
+        'Date': buckets[starts].astype('datetime64[s]'),
+        'Open': ohlcv[starts, 0],
+        'High': np.maximum.reduceat(ohlcv[:, 1], starts),
+        'Low': np.minimum.reduceat(ohlcv[:, 2], starts),
+        'Close': ohlcv[ends, 3],
+        'Volume': np.add.reduceat(ohlcv[:, 4], starts)
+    })
+
+
+class CandleStore:
+    """Minute candle store with lazily resampled, incrementally updated timeframes"""
+
+    def __init__(self, retention: Optional[pd.Timedelta] = None):
+        """
+        Args:
+            retention: How much history to keep per symbol (None: keep everything)
+        """
+        self.retention = retention
+        self._minutes: Dict[str, pd.DataFrame] = {}
+        # (symbol, timeframe) -> {'bars': DataFrame, 'dirty_from': Timestamp | None}
+        self._cache: Dict[tuple, Dict] = {}
+        self._lock = threading.RLock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    @property
+    def symbols(self) -> List[str]:
+        return sorted(self._minutes)
+
+    def watermark(self, symbol: str) -> Optional[pd.Timestamp]:
+        """Timestamp of the latest stored minute for a symbol"""
+        with self._lock:
+            df = self._minutes.get(symbol)
+            if df is None or df.empty:
+                return None
+            return df.index[-1]
+
+    def append(self, symbol: str, candles: pd.DataFrame) -> int:
+        """
+        Add minute candles for a symbol
+
+        Rows for minutes already stored are replaced (the last write wins,
+        which is what a still-forming candle needs).
+
+        Args:
+            symbol: Symbol name (e.g. 'BTC')
+            candles: DataFrame with a Date column (or DatetimeIndex) and OHLCV columns
+
+        Returns:
+            Number of new minutes added
+        """
+        df = candles.copy()
+        if 'Date' in df.columns:
+            df = df.set_index('Date')
+        df.index = pd.DatetimeIndex(df.index)
+        if df.index.tz is not None:
+            df.index = df.index.tz_convert('UTC').tz_localize(None)
+        df = df[OHLCV_COLUMNS].astype(float).dropna(subset=['Open', 'High', 'Low', 'Close'])
+        if df.empty:
+            return 0
+        df = df[~df.index.duplicated(keep='last')].sort_index()
+
+        with self._lock:
+            existing = self._minutes.get(symbol)
+            if existing is None or existing.empty:
+                merged = df
+                added = len(df)
+            elif df.index[0] > existing.index[-1]:
+                # Common case: strictly newer minutes, no re-sort needed
+                merged = pd.concat([existing, df])
+                added = len(df)
+            else:
+                merged = pd.concat([existing, df])
+                merged = merged[~merged.index.duplicated(keep='last')].sort_index()
+                added = len(merged) - len(existing)
+
+            cutoff = None
+            if self.retention is not None:
+                cutoff = (merged.index[-1] - self.retention).floor('1D')
+                if merged.index[0] < cutoff:
+                    merged = merged.iloc[merged.index.searchsorted(cutoff):]
+                else:
+                    cutoff = None
+            self._minutes[symbol] = merged
+
+            first_new = df.index[0]
+            for (cached_symbol, _), entry in self._cache.items():
+                if cached_symbol == symbol:
+                    dirty = entry['dirty_from']
+                    entry['dirty_from'] = first_new if dirty is None else min(dirty, first_new)
+                    if cutoff is not None:
+                        entry['bars'] = entry['bars'].iloc[entry['bars']['Date'].searchsorted(cutoff):]
+        return added
+
+    def bars(self, symbol: str, timeframe: str = '1d', include_partial: bool = True) -> pd.DataFrame:
+        """
+        Get OHLCV bars for a symbol at a timeframe
+
+        Args:
+            symbol: Symbol name
+            timeframe: One of TIMEFRAMES
+            include_partial: Keep the still-forming last bar
+
+        Returns:
+            DataFrame with Date and OHLCV columns
+        """
+        if timeframe not in TIMEFRAMES:
+            raise ValueError(f"Unsupported timeframe '{timeframe}'. Use one of {list(TIMEFRAMES)}")
+        seconds = TIMEFRAMES[timeframe]
+
+        with self._lock:
+            minutes = self._minutes.get(symbol)
+            if minutes is None or minutes.empty:
+                return pd.DataFrame(columns=['Date'] + OHLCV_COLUMNS)
+
+            key = (symbol, timeframe)
+            entry = self._cache.get(key)
+            if entry is not None and entry['dirty_from'] is None:
+                self.cache_hits += 1
+                bars = entry['bars']
+            else:
+                self.cache_misses += 1
+                if entry is None:
+                    bars = self._aggregate(minutes, seconds)
+                else:
+                    # Only buckets at or after the first changed minute are stale
+                    dirty = entry['dirty_from'].floor(f'{seconds}s')
+                    kept = entry['bars'].iloc[:entry['bars']['Date'].searchsorted(dirty)]
+                    tail = self._aggregate(minutes.iloc[minutes.index.searchsorted(dirty):], seconds)
+                    bars = pd.concat([kept, tail], ignore_index=True) if len(kept) else tail
+                self._cache[key] = {'bars': bars, 'dirty_from': None}
+
+        if not include_partial and len(bars):
+            bucket_end = bars['Date'].iloc[-1] + pd.Timedelta(seconds=seconds)
+            if minutes.index[-1] + pd.Timedelta(minutes=1) < bucket_end:
+                bars = bars.iloc[:-1]
+        return bars.copy()
+
+    @staticmethod
+    def _aggregate(minutes: pd.DataFrame, seconds: int) -> pd.DataFrame:
+        return aggregate_ohlcv(minutes.index.values, minutes[OHLCV_COLUMNS].to_numpy(), seconds)
+
+    def frame(self, timeframe: str = '1d', symbols: Optional[List[str]] = None,
+              include_partial: bool = True) -> pd.DataFrame:
+        """
+        All symbols' bars in the pipeline layout expected by engineer_features
+
+        Returns:
+            DataFrame with Date, Adj Close, Open, High, Low, Close, Volume, symbol
+        """
+        parts = []
+        for symbol in symbols or self.symbols:
+            bars = self.bars(symbol, timeframe, include_partial=include_partial)
+            if bars.empty:
+                continue
+            bars['Adj Close'] = bars['Close']
+            bars['symbol'] = symbol
+            parts.append(bars[['Date', 'Adj Close'] + OHLCV_COLUMNS + ['symbol']])
+        if not parts:
+            return pd.DataFrame(columns=['Date', 'Adj Close'] + OHLCV_COLUMNS + ['symbol'])
+        return pd.concat(parts, ignore_index=True)
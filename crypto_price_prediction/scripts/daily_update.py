@@ -5,95 +5,78 @@ This script fetches live data and generates daily predictions automatically.
 Can be scheduled to run daily using Windows Task Scheduler.
 
 Usage:
-    python daily_update.py
+    python daily_update.py                                   # predict from the latest candle
+    python daily_update.py --from 2025-12-01 --to 2026-01-31 # backfill missing dates
+    python daily_update.py --from 2025-12-01 --force         # re-score dates already stored
+
+Backfill fetches the range once (plus FEATURE_LOOKBACK_DAYS of warm-up),
+computes features once, scores every missing date per symbol in one batch
+and upserts the rows into the history store.
 
 Output:
     - Console output with predictions
-    - predictions_history.csv (appends daily predictions)
+    - predictions_history.csv (upserted by date and symbol, see history_store.py)
 """
 
+import argparse
 import pandas as pd
 import numpy as np
-import yfinance as yf
-import pickle
 from datetime import datetime, timedelta
+from pathlib import Path
 import warnings
 warnings.filterwarnings('ignore')
 
-def fetch_live_crypto_data(days_back=365):
-    """Fetch live cryptocurrency data"""
+try:
+    from .market_data import MarketDataFetcher
+    from .artifacts import load_model
+    from .history_store import HISTORY_PATH, load_history, predicted_price, upsert_history
+except ImportError:
+    # Running as a plain script from this directory
+    from market_data import MarketDataFetcher
+    from artifacts import load_model
+    from history_store import HISTORY_PATH, load_history, predicted_price, upsert_history
+
+CRYPTOS = {
+    'BTC-USD': 'BTC',
+    'ETH-USD': 'ETH'
+}
+
+MODELS_DIR = Path(__file__).parent.parent / "models"
+FEATURE_LOOKBACK_DAYS = 200  # Warm-up for MA_50, and MACD's EWM decays to ~1e-7
+THRESHOLD_UP = 0.70
+THRESHOLD_DOWN = 0.30
+
+def fetch_live_crypto_data(days_back=365, fetcher=None, start_date=None, end_date=None):
+    """
+    Fetch live cryptocurrency data (one batched request for all tickers)
+    
+    Args:
+        days_back: Days before end_date to fetch when start_date is not given
+        start_date / end_date: Explicit range (end exclusive, default today)
+    """
     print("="*60)
     print("📡 Fetching Live Cryptocurrency Data...")
     print("="*60)
     
     # Calculate date range - use past dates only
-    end_date = datetime.now().date()
-    start_date = end_date - timedelta(days=days_back)
+    end_date = end_date or datetime.now().date()
+    start_date = start_date or end_date - timedelta(days=days_back)
     
-    cryptos = {
-        'BTC-USD': 'BTC',
-        'ETH-USD': 'ETH'
-    }
+    fetcher = fetcher or MarketDataFetcher()
+    result = fetcher.fetch_history(list(CRYPTOS), start=start_date, end=end_date)
     
-    all_data = []
-    
-    for ticker, symbol in cryptos.items():
-        print(f"{'🔶' if symbol == 'BTC' else '🔷'} Fetching {ticker}...")
-        
-        try:
-            # Download data using yfinance
-            df = yf.download(ticker, start=start_date, end=end_date, progress=False)
-            
-            if len(df) == 0:
-                print(f"   ⚠️ Warning: No data received for {symbol}")
-                continue
-            
-            # Handle MultiIndex columns (when downloading single ticker)
-            if isinstance(df.columns, pd.MultiIndex):
-                df.columns = df.columns.get_level_values(0)
-            
-            # Reset index to make Date a column
-            df = df.reset_index()
-            
-            # Remove duplicate columns
-            df = df.loc[:, ~df.columns.duplicated()]
-            
-            # Ensure required columns exist
-            expected_cols = ['Date', 'Open', 'High', 'Low', 'Close', 'Volume']
-            missing_cols = [col for col in expected_cols if col not in df.columns]
-            if missing_cols:
-                print(f"   ⚠️ Warning: Missing columns for {symbol}: {missing_cols}")
-                continue
-            
-            # Add 'Adj Close' if missing
-            if 'Adj Close' not in df.columns:
-                df['Adj Close'] = df['Close']
-            
-            # Select and reorder columns
-            df = df[['Date', 'Adj Close', 'Open', 'High', 'Low', 'Close', 'Volume']]
-            
-            # Remove rows with NaN in critical columns
-            df = df.dropna(subset=['Close', 'High', 'Low', 'Open'])
-            
-            if len(df) == 0:
-                print(f"   ⚠️ Warning: No valid data after cleaning for {symbol}")
-                continue
-            
-            # Add symbol column
-            df['symbol'] = symbol
-            
-            all_data.append(df)
-            print(f"   ✓ Successfully fetched {len(df)} records")
-            
-        except Exception as e:
-            print(f"   ❌ Error fetching {symbol}: {str(e)}")
-            continue
+    for ticker, symbol in CRYPTOS.items():
+        emoji = '🔶' if symbol == 'BTC' else '🔷'
+        if ticker in result.frames:
+            print(f"{emoji} {ticker}: ✓ Successfully fetched {len(result.frames[ticker])} records")
+        else:
+            print(f"{emoji} {ticker}: ❌ Error fetching {symbol}: {result.errors.get(ticker, 'No data')}")
     
-    if not all_data:
+    if not result.frames:
         raise ValueError("Failed to fetch data for any cryptocurrency")
     
     # Combine all data
-    df_combined = pd.concat(all_data, ignore_index=True)
+    df_combined = result.combined(CRYPTOS)
     df_combined = df_combined.sort_values(['symbol', 'Date']).reset_index(drop=True)
     
     print(f"✓ Data fetched! Latest: {df_combined['Date'].max().date()}")
@@ -187,6 +170,7 @@ def engineer_features(df):
         crypto_df['Distance_MA30'] = ((crypto_df['Close'] - crypto_df['MA_30']) / crypto_df['MA_30']) * 100
         crypto_df['Price_Direction'] = (crypto_df['Close'] > crypto_df['Close'].shift(1)).astype(int)
         crypto_df['Consecutive_Trend'] = crypto_df.groupby((crypto_df['Price_Direction'] != crypto_df['Price_Direction'].shift()).cumsum())['Price_Direction'].transform('count')
+        crypto_df['Momentum'] = crypto_df['Close'] - crypto_df['Close'].shift(4)  # SVM feature set (svm.ipynb)
         
         feature_dfs.append(crypto_df)
     
@@ -199,87 +183,130 @@ def engineer_features(df):
     return df_with_features
 
 def load_models():
-    """Load trained models"""
-    with open('../models/bitcoin_best_model.pkl', 'rb') as f:
-        btc_model = pickle.load(f)
-    with open('../models/bitcoin_scaler.pkl', 'rb') as f:
-        btc_scaler = pickle.load(f)
-    with open('../models/ethereum_best_model.pkl', 'rb') as f:
-        eth_model = pickle.load(f)
-    with open('../models/ethereum_scaler.pkl', 'rb') as f:
-        eth_scaler = pickle.load(f)
-    with open('../models/feature_columns.pkl', 'rb') as f:
-        feature_cols = pickle.load(f)
+    """Load trained models (memory-mapped artifacts, exported from the .pkl files on first use)"""
+    btc_model = load_model(MODELS_DIR / 'bitcoin_best_model.pkl')
+    btc_scaler = load_model(MODELS_DIR / 'bitcoin_scaler.pkl')
+    eth_model = load_model(MODELS_DIR / 'ethereum_best_model.pkl')
+    eth_scaler = load_model(MODELS_DIR / 'ethereum_scaler.pkl')
+    feature_cols = load_model(MODELS_DIR / 'feature_columns.pkl')
     
     return btc_model, btc_scaler, eth_model, eth_scaler, feature_cols
 
-def predict(df, btc_model, btc_scaler, eth_model, eth_scaler, feature_cols):
-    """Generate predictions"""
+def score_rows(symbol_data, symbol, model, scaler, feature_cols):
+    """
+    Score every engineered row of one symbol in a single batch
+    
+    Returns:
+        DataFrame in the history schema, plus a 'trend' column (UP/DOWN/UNCERTAIN)
+    """
+    X = scaler.transform(symbol_data[feature_cols].values)
+    pred_proba = model.predict_proba(X)
+    prob_down, prob_up = pred_proba[:, 0], pred_proba[:, 1]
+    
+    is_up = prob_up >= THRESHOLD_UP
+    is_down = prob_down >= (1 - THRESHOLD_DOWN)
+    signal = np.select([is_up, is_down], ['BUY', 'SELL'], 'HOLD')
+    price = symbol_data['Close'].to_numpy(dtype=np.float64)
+    
+    return pd.DataFrame({
+        'date': symbol_data['Date'].dt.strftime('%Y-%m-%d').to_numpy(),
+        'symbol': symbol,
+        'price': price,
+        'prediction': predicted_price(price, signal),
+        'signal': signal,
+        'confidence': np.select([is_up, is_down], [prob_up, prob_down], np.maximum(prob_up, prob_down)),
+        'prob_up': prob_up,
+        'prob_down': prob_down,
+        'trend': np.select([is_up, is_down], ['UP', 'DOWN'], 'UNCERTAIN')
+    })
+
+def predict(df, btc_model, btc_scaler, eth_model, eth_scaler, feature_cols, dates=None, skip=None):
+    """
+    Generate predictions
+    
+    Args:
+        dates: Inclusive (start, end) date range to score; default: the latest row per symbol
+        skip: (date, symbol) keys to leave out (already stored)
+    """
+    models = {'BTC': (btc_model, btc_scaler), 'ETH': (eth_model, eth_scaler)}
     results = []
     
     for symbol in ['BTC', 'ETH']:
-        symbol_data = df[df['symbol'] == symbol].copy()
+        symbol_data = df[df['symbol'] == symbol]
         if len(symbol_data) == 0:
             continue
         
-        latest = symbol_data.iloc[-1]
-        latest_date = latest['Date']
-        current_price = latest['Close']
-        
-        X_latest = latest[feature_cols].values.reshape(1, -1)
-        
-        if symbol == 'BTC':
-            model, scaler = btc_model, btc_scaler
-            threshold_up, threshold_down = 0.70, 0.30
-        else:
-            model, scaler = eth_model, eth_scaler
-            threshold_up, threshold_down = 0.70, 0.30
-        
-        X_scaled = scaler.transform(X_latest)
-        pred_proba = model.predict_proba(X_scaled)[0]
-        prob_down, prob_up = pred_proba[0], pred_proba[1]
-        
-        if prob_up >= threshold_up:
-            prediction, signal = "UP", "BUY"
-            confidence = prob_up
-        elif prob_down >= (1 - threshold_down):
-            prediction, signal = "DOWN", "SELL"
-            confidence = prob_down
+        if dates is None:
+            symbol_data = symbol_data.tail(1)
         else:
-            prediction, signal = "UNCERTAIN", "HOLD"
-            confidence = max(prob_up, prob_down)
+            start, end = pd.Timestamp(dates[0]), pd.Timestamp(dates[1])
+            symbol_data = symbol_data[(symbol_data['Date'] >= start) & (symbol_data['Date'] <= end)]
+        if skip:
+            keys = symbol_data['Date'].dt.strftime('%Y-%m-%d')
+            symbol_data = symbol_data[[(key, symbol) not in skip for key in keys]]
+        if len(symbol_data) == 0:
+            continue
         
-        results.append({
-            'date': latest_date,
-            'symbol': symbol,
-            'price': current_price,
-            'prediction': prediction,
-            'signal': signal,
-            'confidence': confidence,
-            'prob_up': prob_up,
-            'prob_down': prob_down
-        })
+        model, scaler = models[symbol]
+        results.append(score_rows(symbol_data, symbol, model, scaler, feature_cols))
     
-    return results
+    return pd.concat(results, ignore_index=True) if results else pd.DataFrame()
 
 def save_predictions(results):
-    """Save predictions to history file"""
-    df_results = pd.DataFrame(results)
-    
-    try:
-        # Append to existing file
-        df_history = pd.read_csv('../output/predictions_history.csv')
-        df_history = pd.concat([df_history, df_results], ignore_index=True)
-        df_history = df_history.drop_duplicates(subset=['date', 'symbol'], keep='last')
-    except FileNotFoundError:
-        # Create new file
-        df_history = df_results
-    
-    df_history.to_csv('../output/predictions_history.csv', index=False)
-    print(f"✓ Predictions saved to ../output/predictions_history.csv")
+    """Upsert predictions into the history file"""
+    added = upsert_history(results.drop(columns=['trend']))
+    print(f"✓ {len(results)} predictions saved to {HISTORY_PATH.name} ({added} new dates)")
+
+def backfill(date_from, date_to, force=False):
+    """Score every missing date in [date_from, date_to] and upsert them"""
+    today = datetime.now().date()
+    date_to = min(date_to or today, today - timedelta(days=1))  # Today's candle is still forming
+    if date_from > date_to:
+        raise ValueError(f"Empty range: {date_from} > {date_to}")
+    
+    print("\n" + "="*60)
+    print(f"⏪ BACKFILL {date_from} → {date_to}")
+    print("="*60 + "\n")
+    
+    skip = None
+    if not force:
+        history = load_history()
+        skip = set(zip(history['date'], history['symbol']))
+    
+    df = fetch_live_crypto_data(start_date=date_from - timedelta(days=FEATURE_LOOKBACK_DAYS),
+                                end_date=date_to + timedelta(days=1))
+    print("\n🔧 Creating technical indicators...")
+    df = engineer_features(df)
+    
+    print("\n📦 Loading models...")
+    models = load_models()
+    
+    print("\n🎯 Scoring...")
+    results = predict(df, *models, dates=(date_from, date_to), skip=skip)
+    if results.empty:
+        print("✓ Nothing to backfill, every date is already stored")
+        return results
+    for symbol, group in results.groupby('symbol'):
+        print(f"   {symbol}: {len(group)} dates ({group['date'].min()} → {group['date'].max()})")
+    save_predictions(results)
+    return results
 
-def main():
+def main(argv=None):
     """Main execution function"""
+    parser = argparse.ArgumentParser(description="Daily crypto predictions and history backfill")
+    parser.add_argument('--from', dest='date_from', type=lambda v: datetime.strptime(v, '%Y-%m-%d').date(),
+                        help="Backfill start date (YYYY-MM-DD)")
+    parser.add_argument('--to', dest='date_to', type=lambda v: datetime.strptime(v, '%Y-%m-%d').date(),
+                        help="Backfill end date, inclusive (default: yesterday)")
+    parser.add_argument('--force', action='store_true', help="Re-score dates already in the history")
+    args = parser.parse_args(argv)
+    
+    if args.date_from or args.date_to:
+        if not args.date_from:
+            parser.error("--to requires --from")
+        backfill(args.date_from, args.date_to, force=args.force)
+        return
+    
     print("\n" + "="*60)
     print("🚀 DAILY CRYPTO PRICE PREDICTION")
     print(f"📅 {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
@@ -307,14 +334,14 @@ def main():
     print("📊 TODAY'S PREDICTIONS")
     print("="*60)
     
-    for r in results:
+    for r in results.to_dict('records'):
         emoji = "🔶" if r['symbol'] == "BTC" else "🔷"
         name = "Bitcoin" if r['symbol'] == "BTC" else "Ethereum"
-        arrow = "⬆️" if r['prediction'] == "UP" else "⬇️" if r['prediction'] == "DOWN" else "⚠️"
+        arrow = "⬆️" if r['trend'] == "UP" else "⬇️" if r['trend'] == "DOWN" else "⚠️"
         
         print(f"\n{emoji} {name} ({r['symbol']})")
         print(f"   Price: ${r['price']:,.2f}")
-        print(f"   Prediction: {r['prediction']} {arrow}")
+        print(f"   Prediction: {r['trend']} {arrow}")
         print(f"   Signal: {r['signal']}")
         print(f"   Confidence: {r['confidence']*100:.1f}%")
         print(f"   Probabilities: UP={r['prob_up']*100:.1f}% | DOWN={r['prob_down']*100:.1f}%")
@@ -0,0 +1,363 @@
+"""
+Columnar Dataset Store
+======================
+Canonical binary copy of combined_crypto_dataset.csv: one memory-mapped
+NumPy file per column plus a JSON manifest. The CSV is the only text copy
+of the dataset; the store is rebuilt from it on first load after it changes.
+
+- Column projection: only the requested column files are opened
+- Predicate pushdown: rows are sorted by (Symbol, Date), the manifest keeps
+  each symbol's row range, and date bounds are a binary search on the
+  memory-mapped Date column - nothing outside the selection is read
+- No CSV or date parsing at load time
+- Derived data (e.g. sentiment) lives in side tables: column files aligned
+  to the base rows, written by (Symbol, Date) key, instead of full copies.
+  A side manifest records the base rows it is aligned to (source, row count,
+  key hash); a rebuild re-keys every side table onto the new rows, and a
+  side table that does not match its base is refused at load time
+
+Layout:
+    data/combined_crypto_dataset/
+        manifest.json
+        Date.npy  Close.npy  Symbol.npy ...
+        side/sentiment/manifest.json
+        side/sentiment/Sentiment.npy ...
+
+Usage:
+    python dataset_store.py build
+    python dataset_store.py import-side sentiment sentiment.csv \\
+        Sentiment Sentiment_Score Sentiment_Confidence Key_Factors
+
+    from dataset_store import load_dataset
+    df = load_dataset(columns=['Date', 'Close'], symbols=['BTC'], start='2020-01-01')
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+DATA_DIR = Path(__file__).parent.parent / "data"
+SOURCE_CSV = DATA_DIR / "combined_crypto_dataset.csv"
+STORE_PATH = DATA_DIR / "combined_crypto_dataset"
+KEY_COLUMNS = ['Symbol', 'Date']
+
+
+# ========================================
+# Column encoding
+# ========================================
+
+def _encode_column(values: pd.Series):
+    """Turn a pandas column into (array, manifest entry)"""
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.values.astype('datetime64[s]'), {'kind': 'datetime'}
+    if pd.api.types.is_bool_dtype(values) or pd.api.types.is_numeric_dtype(values):
+        return values.to_numpy(), {'kind': 'numeric'}
+    # Strings are dictionary-encoded: int32 codes, -1 for missing
+    categorical = pd.Categorical(values)
+    return categorical.codes.astype(np.int32), {
+        'kind': 'category',
+        'categories': [str(c) for c in categorical.categories]
+    }
+
+
+def _decode_column(array: np.ndarray, entry: Dict) -> pd.Series:
+    if entry['kind'] == 'category':
+        return pd.Categorical.from_codes(np.asarray(array), categories=entry['categories'])
+    if entry['kind'] == 'datetime':
+        return np.asarray(array).astype('datetime64[ns]')
+    return np.asarray(array)
+
+
+def _write_columns(df: pd.DataFrame, directory: Path, extra: Dict) -> Dict:
+    """Write every column of df plus a manifest into a fresh directory"""
+    columns = {}
+    for name in df.columns:
+        array, entry = _encode_column(df[name])
+        entry['file'] = f"{name}.npy"
+        entry['dtype'] = str(array.dtype)
+        np.save(directory / entry['file'], np.ascontiguousarray(array))
+        columns[name] = entry
+    manifest = dict(extra, rows=len(df), columns=columns)
+    with open(directory / 'manifest.json', 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def _replace_dir(tmp_dir: Path, target: Path):
+    """Swap a fully written directory into place"""
+    if target.exists():
+        old = target.with_name(target.name + '.old')
+        shutil.rmtree(old, ignore_errors=True)
+        os.replace(target, old)
+        os.replace(tmp_dir, target)
+        shutil.rmtree(old, ignore_errors=True)
+    else:
+        os.replace(tmp_dir, target)
+
+
+# ========================================
+# Build
+# ========================================
+
+def build_store(csv_path: Path = SOURCE_CSV, store_path: Path = STORE_PATH) -> Dict:
+    """
+    Convert the CSV dataset into the columnar store
+
+    Returns:
+        The written manifest
+    """
+    df = pd.read_csv(csv_path, parse_dates=['Date'])
+    df = df.sort_values(KEY_COLUMNS, kind='stable').reset_index(drop=True)
+
+    symbol_ranges = {}
+    for symbol, rows in df.groupby('Symbol', sort=True).indices.items():
+        symbol_ranges[str(symbol)] = [int(rows.min()), int(rows.max()) + 1]
+
+    store_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_dir = Path(tempfile.mkdtemp(prefix='.build-', dir=store_path.parent))
+    manifest = _write_columns(df, tmp_dir, {
+        'source': Path(csv_path).name,
+        'sort': KEY_COLUMNS,
+        'symbol_ranges': symbol_ranges
+    })
+    (tmp_dir / 'side').mkdir()
+    # Side tables are aligned to row positions; re-key them onto the new rows
+    if (store_path / 'manifest.json').exists():
+        old_store, new_store = DatasetStore(store_path, csv_path=None), DatasetStore(tmp_dir, csv_path=None)
+        for name in old_store.side_tables():
+            try:
+                old = old_store.load(columns=KEY_COLUMNS, side=[name])
+            except ValueError as e:
+                print(f"⚠ Side table '{name}' dropped on rebuild: {e}")
+                continue
+            side_manifest = old_store.side_manifest(name)
+            new_store.write_side_table(name, old, list(side_manifest['columns']), side_manifest.get('defaults'))
+    _replace_dir(tmp_dir, store_path)
+    return manifest
+
+
+def ensure_store(store_path: Path = STORE_PATH, csv_path: Path = SOURCE_CSV) -> Path:
+    """Build the store from the CSV if it is missing or older than the CSV"""
+    manifest = store_path / 'manifest.json'
+    if not manifest.exists() or (csv_path.exists() and manifest.stat().st_mtime < csv_path.stat().st_mtime):
+        build_store(csv_path, store_path)
+    return store_path
+
+
+# ========================================
+# Load
+# ========================================
+
+class DatasetStore:
+    """Read-only view over a columnar store directory"""
+
+    def __init__(self, store_path: Path = STORE_PATH, csv_path: Optional[Path] = SOURCE_CSV):
+        """
+        Args:
+            store_path: Store directory
+            csv_path: Source CSV the store is (re)built from when stale (None: open as is)
+        """
+        self.path = Path(store_path)
+        if csv_path is not None:
+            ensure_store(self.path, Path(csv_path))
+        with open(self.path / 'manifest.json') as f:
+            self.manifest = json.load(f)
+        self._arrays: Dict[str, np.ndarray] = {}
+        self._keys_hash: Optional[str] = None
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self.manifest['columns'])
+
+    @property
+    def symbols(self) -> List[str]:
+        return list(self.manifest['symbol_ranges'])
+
+    def side_tables(self) -> List[str]:
+        side_dir = self.path / 'side'
+        if not side_dir.exists():
+            return []
+        return sorted(p.name for p in side_dir.iterdir() if (p / 'manifest.json').exists())
+
+    def side_manifest(self, name: str) -> Dict:
+        with open(self.path / 'side' / name / 'manifest.json') as f:
+            return json.load(f)
+
+    def keys_hash(self) -> str:
+        """Fingerprint of the (Symbol, Date) key of every row, in row order"""
+        if self._keys_hash is None:
+            digest = hashlib.sha256()
+            symbol = self.manifest['columns']['Symbol']
+            digest.update(json.dumps(symbol.get('categories')).encode('utf-8'))
+            for entry in (symbol, self.manifest['columns']['Date']):
+                digest.update(np.ascontiguousarray(self._array(self.path, entry)).tobytes())
+            self._keys_hash = digest.hexdigest()
+        return self._keys_hash
+
+    def _array(self, directory: Path, entry: Dict) -> np.ndarray:
+        key = str(directory / entry['file'])
+        if key not in self._arrays:
+            self._arrays[key] = np.load(key, mmap_mode='r')
+        return self._arrays[key]
+
+    def row_selection(self, symbols: Optional[List[str]] = None, start=None, end=None) -> np.ndarray:
+        """
+        Resolve symbol/date predicates to row indices without reading data
+
+        Args:
+            symbols: Symbols to keep (default: all)
+            start: Inclusive lower date bound
+            end: Inclusive upper date bound (a bare date includes the whole day)
+        """
+        ranges = self.manifest['symbol_ranges']
+        wanted = symbols if symbols is not None else list(ranges)
+        dates = self._array(self.path, self.manifest['columns']['Date'])
+        lo_key = np.datetime64(pd.Timestamp(start), 's') if start is not None else None
+        hi_key = None
+        if end is not None:
+            end = pd.Timestamp(end)
+            if end == end.normalize():
+                # A bare date includes that whole day (rows are stamped 23:59:59)
+                end = end + pd.Timedelta(days=1) - pd.Timedelta(seconds=1)
+            hi_key = np.datetime64(end, 's')
+
+        slices = []
+        for symbol in wanted:
+            if symbol not in ranges:
+                continue
+            first, last = ranges[symbol]
+            lo, hi = first, last
+            # Dates are sorted within each symbol's range
+            if lo_key is not None:
+                lo = first + int(np.searchsorted(dates[first:last], lo_key, side='left'))
+            if hi_key is not None:
+                hi = first + int(np.searchsorted(dates[first:last], hi_key, side='right'))
+            if hi > lo:
+                slices.append(np.arange(lo, hi))
+        return np.concatenate(slices) if slices else np.array([], dtype=np.int64)
+
+    def load(self, columns: Optional[List[str]] = None, symbols: Optional[List[str]] = None,
+             start=None, end=None, side: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Load a projection of the dataset
+
+        Args:
+            columns: Base columns to read (default: all)
+            symbols: Symbol filter, pushed down to row ranges
+            start: Inclusive lower date bound, pushed down via binary search
+            end: Inclusive upper date bound
+            side: Side tables whose columns should be joined in (e.g. ['sentiment'])
+
+        Returns:
+            DataFrame with the requested columns, sorted by (Symbol, Date)
+        """
+        rows = self.row_selection(symbols, start, end)
+        contiguous = len(rows) > 0 and rows[-1] - rows[0] + 1 == len(rows)
+        selector = slice(int(rows[0]), int(rows[-1]) + 1) if contiguous else rows
+
+        data = {}
+        for name in (columns if columns is not None else self.columns):
+            entry = self.manifest['columns'].get(name)
+            if entry is None:
+                raise KeyError(f"Unknown column '{name}'. Available: {self.columns}")
+            data[name] = _decode_column(self._array(self.path, entry)[selector], entry)
+
+        for table in side or []:
+            side_dir = self.path / 'side' / table
+            side_manifest = self.side_manifest(table)
+            if (side_manifest.get('keyed_to') != self.manifest['source']
+                    or side_manifest['rows'] != self.manifest['rows']
+                    or side_manifest.get('keys_hash', self.keys_hash()) != self.keys_hash()):
+                raise ValueError(f"Side table '{table}' is not aligned to the rows of this store; "
+                                 f"rebuild the store or rewrite the side table")
+            for name, entry in side_manifest['columns'].items():
+                data[name] = _decode_column(self._array(side_dir, entry)[selector], entry)
+
+        return pd.DataFrame(data)
+
+    def write_side_table(self, name: str, df: pd.DataFrame, value_columns: Optional[List[str]] = None,
+                         defaults: Optional[Dict] = None) -> Dict:
+        """
+        Upsert derived columns keyed by (Symbol, Date) into a side table
+
+        Rows not present in `df` keep their previous side values (or the
+        defaults when the side table is new).
+
+        Args:
+            name: Side table name (e.g. 'sentiment')
+            df: DataFrame with Symbol, Date and value columns
+            value_columns: Columns to store (default: all non-key columns)
+            defaults: Fill values for rows never written (default: NaN / missing)
+
+        Returns:
+            The side table manifest
+        """
+        value_columns = value_columns or [c for c in df.columns if c not in KEY_COLUMNS]
+        defaults = defaults or {}
+        keys = self.load(columns=KEY_COLUMNS)
+        keys['Symbol'] = keys['Symbol'].astype(str)
+        keys['_row'] = np.arange(len(keys))
+
+        updates = df[KEY_COLUMNS + value_columns].copy()
+        updates['Symbol'] = updates['Symbol'].astype(str)
+        updates['Date'] = pd.to_datetime(updates['Date']).astype('datetime64[ns]')
+        matched = keys.merge(updates, on=KEY_COLUMNS, how='inner')
+
+        side_dir = self.path / 'side' / name
+        existing = self.load(columns=[], side=[name]) if (side_dir / 'manifest.json').exists() else pd.DataFrame(index=keys.index)
+        table = pd.DataFrame(index=keys.index)
+        for column in value_columns:
+            if column in existing.columns:
+                values = pd.Series(np.asarray(existing[column], dtype=object), index=keys.index)
+            else:
+                values = pd.Series([defaults.get(column, np.nan)] * len(keys), index=keys.index, dtype=object)
+            values.iloc[matched['_row'].to_numpy()] = matched[column].to_numpy()
+            table[column] = pd.Series(values.tolist(), index=keys.index).infer_objects()
+        # Keep side columns that this write did not touch
+        for column in existing.columns:
+            if column not in table.columns:
+                table[column] = existing[column]
+
+        tmp_dir = Path(tempfile.mkdtemp(prefix=f'.{name}-', dir=self.path))
+        manifest = _write_columns(table, tmp_dir, {'keyed_to': self.manifest['source'], 'key': KEY_COLUMNS,
+                                                   'keys_hash': self.keys_hash(), 'defaults': defaults})
+        (self.path / 'side').mkdir(exist_ok=True)
+        _replace_dir(tmp_dir, side_dir)
+        self._arrays = {k: v for k, v in self._arrays.items() if not k.startswith(str(side_dir))}
+        return manifest
+
+
+def load_dataset(columns: Optional[List[str]] = None, symbols: Optional[List[str]] = None,
+                 start=None, end=None, side: Optional[List[str]] = None,
+                 store_path: Path = STORE_PATH) -> pd.DataFrame:
+    """Shortcut for DatasetStore(store_path).load(...)"""
+    return DatasetStore(store_path).load(columns=columns, symbols=symbols, start=start, end=end, side=side)
+
+
+def main(argv: List[str]):
+    if not argv or argv[0] not in ('build', 'import-side'):
+        print(__doc__)
+        return 1
+
+    if argv[0] == 'build':
+        manifest = build_store()
+        print(f"✓ Built {STORE_PATH} ({manifest['rows']} rows, {len(manifest['columns'])} columns)")
+        return 0
+
+    name, csv_path, value_columns = argv[1], argv[2], argv[3:]
+    df = pd.read_csv(csv_path, parse_dates=['Date'])
+    manifest = DatasetStore().write_side_table(name, df, value_columns or None)
+    print(f"✓ Wrote side table '{name}' ({', '.join(manifest['columns'])})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,133 @@
+"""
+Prediction History Store
+========================
+Single reader/writer for output/predictions_history.csv, shared by
+daily_update.py and the API.
+
+Every row follows one schema:
+
+    date        YYYY-MM-DD of the scored daily candle
+    symbol      BTC / ETH
+    price       close of that candle
+    prediction  predicted next close (price moved by the signal's expected change)
+    signal      BUY / SELL / HOLD
+    confidence  probability of the predicted direction
+    prob_up     P(next close higher); empty only for legacy HOLD rows
+    prob_down   1 - prob_up
+
+Older files mixed two layouts (the API wrote a predicted price without
+probabilities, daily_update wrote UP/DOWN text with probabilities);
+`normalize_history` converts both, and `upsert_history` always writes the
+normalized form.
+
+Usage:
+    python history_store.py normalize      # rewrite the file in the current schema
+"""
+
+import os
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+HISTORY_PATH = Path(__file__).parent.parent / "output" / "predictions_history.csv"
+HISTORY_COLUMNS = ['date', 'symbol', 'price', 'prediction', 'signal', 'confidence', 'prob_up', 'prob_down']
+KEY_COLUMNS = ['date', 'symbol']
+
+# Expected move (percent) behind each signal, as used by the API
+SIGNAL_CHANGE_PERCENT = {'BUY': 2.5, 'SELL': -2.5, 'HOLD': 0.5}
+
+
+def predicted_price(price, signal):
+    """Predicted next close for each (price, signal) pair"""
+    change = pd.Series(signal).map(SIGNAL_CHANGE_PERCENT).fillna(0.0).to_numpy()
+    return np.asarray(price, dtype=np.float64) * (1 + change / 100)
+
+
+def normalize_history(df: pd.DataFrame) -> pd.DataFrame:
+    """Convert any past layout to HISTORY_COLUMNS, sorted by (date, symbol)"""
+    df = df.copy()
+    for column in HISTORY_COLUMNS:
+        if column not in df.columns:
+            df[column] = np.nan
+
+    df['date'] = pd.to_datetime(df['date'], errors='coerce').dt.strftime('%Y-%m-%d')
+    df = df.dropna(subset=['date', 'symbol'])
+    df['price'] = pd.to_numeric(df['price'], errors='coerce')
+    df['confidence'] = pd.to_numeric(df['confidence'], errors='coerce')
+
+    # Legacy daily_update rows: UP/DOWN/UNCERTAIN text instead of a price
+    numeric_prediction = pd.to_numeric(df['prediction'], errors='coerce')
+    textual = numeric_prediction.isna()
+    numeric_prediction[textual] = predicted_price(df.loc[textual, 'price'], df.loc[textual, 'signal'])
+    df['prediction'] = numeric_prediction
+
+    # Legacy API rows: probabilities follow from the signal, except for HOLD
+    prob_up = pd.to_numeric(df['prob_up'], errors='coerce')
+    missing = prob_up.isna()
+    prob_up[missing & (df['signal'] == 'BUY')] = df['confidence']
+    prob_up[missing & (df['signal'] == 'SELL')] = 1 - df['confidence']
+    df['prob_up'] = prob_up
+    df['prob_down'] = 1 - prob_up
+
+    return df[HISTORY_COLUMNS].sort_values(KEY_COLUMNS).reset_index(drop=True)
+
+
+def load_history(path: Path = HISTORY_PATH) -> pd.DataFrame:
+    """Normalized history (empty frame with the schema if the file is missing or unreadable)"""
+    path = Path(path)
+    if not path.exists():
+        return pd.DataFrame(columns=HISTORY_COLUMNS)
+    try:
+        df = pd.read_csv(path)
+    except (pd.errors.EmptyDataError, pd.errors.ParserError):
+        return pd.DataFrame(columns=HISTORY_COLUMNS)
+    return normalize_history(df)
+
+
+def history_watermarks(symbols: List[str], path: Path = HISTORY_PATH) -> Dict[str, Optional[pd.Timestamp]]:
+    """Latest stored date per symbol (None if the symbol has no rows)"""
+    df = load_history(path)
+    latest = pd.to_datetime(df['date']).groupby(df['symbol']).max() if len(df) else pd.Series(dtype=object)
+    return {symbol: latest.get(symbol) for symbol in symbols}
+
+
+def upsert_history(rows: pd.DataFrame, path: Path = HISTORY_PATH) -> int:
+    """
+    Insert or replace rows by (date, symbol) and rewrite the file atomically
+
+    Returns:
+        Number of (date, symbol) keys that were not in the file before
+    """
+    path = Path(path)
+    existing = load_history(path)
+    new = normalize_history(rows)
+    known = set(zip(existing['date'], existing['symbol']))
+    added = sum(1 for key in zip(new['date'], new['symbol']) if key not in known)
+
+    merged = pd.concat([existing, new], ignore_index=True) if len(existing) else new
+    merged = merged.drop_duplicates(subset=KEY_COLUMNS, keep='last')
+    merged = merged.sort_values(KEY_COLUMNS).reset_index(drop=True)
+
+    # Write then rename, so concurrent readers never see a partial file
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    merged.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+    return added
+
+
+def main(argv: List[str]):
+    if argv != ['normalize']:
+        print(__doc__)
+        return 1
+    df = load_history()
+    upsert_history(df)
+    print(f"✓ Normalized {HISTORY_PATH} ({len(df)} rows)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,461 @@
+"""
+Market Data Acquisition Layer
+=============================
+Batched, rate-limited market data fetching shared by the daily script
+and the web API.
+
+- One batched upstream call for all tickers, concurrent per-ticker retries
+  for whatever the batch did not return
+- Exponential backoff with jitter on transient failures
+- Token-bucket rate limiter shared by every call going upstream
+- Partial-failure reporting: callers get the frames that succeeded plus an
+  error per ticker that did not
+
+The upstream is a pluggable source object. `YFinanceSource` talks to Yahoo
+Finance, `FakeMarketDataSource` generates deterministic candles locally so
+the whole layer can be exercised offline.
+
+Usage:
+    fetcher = MarketDataFetcher()
+    result = fetcher.fetch_history(['BTC-USD', 'ETH-USD'], start, end)
+    result.frames['BTC-USD']   # normalized OHLCV DataFrame
+    result.errors              # {'XYZ-USD': 'No data returned'}
+"""
+
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+HISTORY_COLUMNS = ['Date', 'Adj Close', 'Open', 'High', 'Low', 'Close', 'Volume']
+
+
+# ========================================
+# Rate limiting & retries
+# ========================================
+
+class TokenBucket:
+    """Thread-safe token bucket rate limiter"""
+
+    def __init__(self, rate: float = 5.0, capacity: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        """
+        Args:
+            rate: Tokens added per second
+            capacity: Maximum burst size (default: rate)
+            clock: Monotonic clock, injectable for tests
+            sleep: Sleep function, injectable for tests
+        """
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else rate)
+        self._tokens = self.capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._last = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = self._clock()
+        elapsed = now - self._last
+        self._last = now
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        """Take tokens if available, without waiting"""
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens: float = 1.0, timeout: Optional[float] = None) -> bool:
+        """Block until tokens are available (or timeout expires)"""
+        deadline = None if timeout is None else self._clock() + timeout
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return True
+                wait = (tokens - self._tokens) / self.rate
+            if deadline is not None:
+                remaining = deadline - self._clock()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            self._sleep(wait)
+
+
+def retry_with_backoff(func: Callable, retries: int = 3, base_delay: float = 0.5,
+                       max_delay: float = 8.0, jitter: bool = True,
+                       sleep: Callable[[float], None] = time.sleep):
+    """
+    Call `func()` and retry on exception with exponential backoff
+
+    Args:
+        func: Zero-argument callable
+        retries: Number of retries after the first attempt
+        base_delay: Delay before the first retry (doubled on each retry)
+        max_delay: Upper bound for a single delay
+        jitter: Randomize each delay in [delay/2, delay] to avoid thundering herds
+        sleep: Sleep function, injectable for tests
+
+    Returns:
+        Whatever `func()` returns on the first successful attempt
+
+    Raises:
+        The last exception once retries are exhausted
+    """
+    attempt = 0
+    while True:
+        try:
+            return func()
+        except Exception:
+            if attempt >= retries:
+                raise
+            delay = min(max_delay, base_delay * (2 ** attempt))
+            if jitter:
+                delay = random.uniform(delay / 2, delay)
+            sleep(delay)
+            attempt += 1
+
+
+# ========================================
+# Upstream sources
+# ========================================
+
+class YFinanceSource:
+    """Yahoo Finance upstream (one batched download for many tickers)"""
+
+    def download(self, tickers: List[str], start, end, interval: str = '1d') -> Dict[str, pd.DataFrame]:
+        """Download OHLCV history for all tickers in a single request"""
+        import yfinance as yf
+
+        raw = yf.download(tickers, start=start, end=end, interval=interval,
+                          group_by='ticker', auto_adjust=False, threads=True,
+                          progress=False)
+        frames = {}
+        if raw is None or len(raw) == 0:
+            return frames
+
+        for ticker in tickers:
+            if isinstance(raw.columns, pd.MultiIndex):
+                if ticker in raw.columns.get_level_values(0):
+                    df = raw[ticker]
+                elif ticker in raw.columns.get_level_values(1):
+                    df = raw.xs(ticker, axis=1, level=1)
+                else:
+                    continue
+            else:
+                df = raw
+            frames[ticker] = df.copy()
+        return frames
+
+    def quote(self, ticker: str) -> Dict[str, float]:
+        """Fetch the latest quote for one ticker"""
+        import yfinance as yf
+
+        info = yf.Ticker(ticker).info
+        return {
+            "current_price": info.get('currentPrice', info.get('regularMarketPrice', 0)),
+            "previous_close": info.get('previousClose', 0),
+            "volume": info.get('volume', 0),
+            "market_cap": info.get('marketCap', 0)
+        }
+
+
+class FakeMarketDataSource:
+    """
+    Deterministic local market data source
+
+    Prices are a pure function of (ticker, timestamp), so overlapping
+    windows always agree and the same request always returns the same
+    candles. Counts upstream calls and can be told to
+    fail, which is what the fetcher's retry/partial-failure paths need.
+    """
+
+    def __init__(self, seed: int = 42, fail_tickers: Optional[Dict[str, int]] = None,
+                 latency: float = 0.0, base_prices: Optional[Dict[str, float]] = None):
+        """
+        Args:
+            seed: Base seed mixed into every ticker's price curve
+            fail_tickers: {ticker: n} - fail the first n calls touching ticker
+                (n < 0 fails forever)
+            latency: Simulated round-trip time in seconds
+            base_prices: Starting price per ticker (default 100)
+        """
+        self.seed = seed
+        self.fail_tickers = dict(fail_tickers or {})
+        self.latency = latency
+        self.base_prices = base_prices or {'BTC-USD': 60000.0, 'ETH-USD': 3000.0}
+        self.download_calls = 0
+        self.quote_calls = 0
+        self._lock = threading.Lock()
+
+    def _should_fail(self, ticker: str) -> bool:
+        with self._lock:
+            remaining = self.fail_tickers.get(ticker, 0)
+            if remaining == 0:
+                return False
+            if remaining > 0:
+                self.fail_tickers[ticker] = remaining - 1
+            return True
+
+    def _ticker_seed(self, ticker: str) -> int:
+        return self.seed + sum(ord(c) for c in ticker)
+
+    def _price_at(self, ticker: str, minutes: np.ndarray) -> np.ndarray:
+        """Deterministic price as a pure function of the timestamp"""
+        seed = self._ticker_seed(ticker)
+        noise = np.modf(np.abs(np.sin(minutes * 12.9898 + seed) * 43758.5453))[0]
+        trend = 0.3 * np.sin(minutes / (60 * 24 * 90) + seed) + 0.1 * np.sin(minutes / (60 * 24 * 7))
+        base = self.base_prices.get(ticker, 100.0)
+        return base * np.exp(trend + 0.02 * (noise - 0.5))
+
+    def candles(self, ticker: str, start, end, interval: str = '1d') -> pd.DataFrame:
+        """Generate OHLCV candles for [start, end)"""
+        freq = {'1m': 'min', '1h': 'h', '1d': 'D'}.get(interval, 'D')
+        index = pd.date_range(pd.Timestamp(start), pd.Timestamp(end), freq=freq, inclusive='left')
+        index.name = 'Date'
+        step = pd.Timedelta(1, unit=freq).total_seconds() / 60
+        minutes = (index.as_unit('s').asi8 // 60).astype(float)
+        close = self._price_at(ticker, minutes + step)
+        open_ = self._price_at(ticker, minutes)
+        spread = np.abs(close - open_) + close * 0.002
+        volume_noise = np.modf(np.abs(np.cos(minutes * 78.233) * 12345.6789))[0]
+        df = pd.DataFrame({
+            'Open': open_,
+            'High': np.maximum(open_, close) + spread / 2,
+            'Low': np.minimum(open_, close) - spread / 2,
+            'Close': close,
+            'Volume': (1e9 + 4e9 * volume_noise) * step / (60 * 24)
+        }, index=index)
+        df['Adj Close'] = df['Close']
+        return df
+
+    def download(self, tickers: List[str], start, end, interval: str = '1d') -> Dict[str, pd.DataFrame]:
+        with self._lock:
+            self.download_calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return {
+            ticker: self.candles(ticker, start, end, interval)
+            for ticker in tickers
+            if not self._should_fail(ticker)
+        }
+
+    def quote(self, ticker: str) -> Dict[str, float]:
+        with self._lock:
+            self.quote_calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if self._should_fail(ticker):
+            raise ConnectionError(f"Simulated upstream failure for {ticker}")
+        today = pd.Timestamp(datetime.now().date())
+        df = self.candles(ticker, today - timedelta(days=2), today + timedelta(days=1))
+        return {
+            "current_price": float(df['Close'].iloc[-1]),
+            "previous_close": float(df['Close'].iloc[-2]),
+            "volume": float(df['Volume'].iloc[-1]),
+            "market_cap": 0
+        }
+
+
+# ========================================
+# Fetcher
+# ========================================
+
+def source_from_env():
+    """
+    Market data source selected by MARKET_DATA_SOURCE ('yfinance' or 'fake')
+
+    'fake' runs the API and benchmarks fully offline; FAKE_MARKET_LATENCY
+    adds a simulated round-trip time in seconds.
+    """
+    name = os.getenv('MARKET_DATA_SOURCE', 'yfinance').lower()
+    if name == 'fake':
+        return FakeMarketDataSource(latency=float(os.getenv('FAKE_MARKET_LATENCY', '0')))
+    if name != 'yfinance':
+        raise ValueError(f"Unknown MARKET_DATA_SOURCE '{name}' (use 'yfinance' or 'fake')")
+    return YFinanceSource()
+
+
+class FetchResult:
+    """Outcome of a multi-ticker fetch, including partial failures"""
+
+    def __init__(self):
+        self.frames: Dict[str, pd.DataFrame] = {}
+        self.errors: Dict[str, str] = {}
+        self.upstream_calls = 0
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+    def combined(self, symbols: Optional[Dict[str, str]] = None) -> pd.DataFrame:
+        """
+        Concatenate all successful frames with a `symbol` column
+
+        Args:
+            symbols: Optional {ticker: symbol} mapping (default: ticker itself)
+        """
+        parts = []
+        for ticker, df in self.frames.items():
+            df = df.copy()
+            df['symbol'] = (symbols or {}).get(ticker, ticker)
+            parts.append(df)
+        if not parts:
+            return pd.DataFrame(columns=HISTORY_COLUMNS + ['symbol'])
+        return pd.concat(parts, ignore_index=True)
+
+
+def normalize_history(df: pd.DataFrame) -> pd.DataFrame:
+    """Bring a raw OHLCV frame into the pipeline's column layout"""
+    if isinstance(df.columns, pd.MultiIndex):
+        df = df.copy()
+        df.columns = df.columns.get_level_values(0)
+
+    df = df.reset_index()
+    df = df.loc[:, ~df.columns.duplicated()]
+    if 'Date' not in df.columns:
+        # Intraday downloads index on 'Datetime'
+        df = df.rename(columns={df.columns[0]: 'Date'})
+
+    missing_cols = [col for col in ['Open', 'High', 'Low', 'Close', 'Volume'] if col not in df.columns]
+    if missing_cols:
+        raise ValueError(f"Missing columns: {missing_cols}")
+
+    if 'Adj Close' not in df.columns:
+        df['Adj Close'] = df['Close']
+
+    df = df[HISTORY_COLUMNS]
+    df = df.dropna(subset=['Close', 'High', 'Low', 'Open'])
+    return df.reset_index(drop=True)
+
+
+class MarketDataFetcher:
+    """Batched, rate-limited, retrying front-end over a market data source"""
+
+    def __init__(self, source=None, max_workers: int = 8, rate_limiter: Optional[TokenBucket] = None,
+                 retries: int = 3, base_delay: float = 0.5, max_delay: float = 8.0,
+                 sleep: Callable[[float], None] = time.sleep):
+        """
+        Args:
+            source: Upstream source (default: from MARKET_DATA_SOURCE, i.e. YFinanceSource)
+            max_workers: Bound on concurrent per-ticker requests
+            rate_limiter: Shared TokenBucket (default: MARKET_DATA_RATE requests/s, 5, burst 2x)
+            retries: Retries per upstream call
+            base_delay: First backoff delay in seconds
+            max_delay: Maximum backoff delay in seconds
+            sleep: Sleep function used for backoff, injectable for tests
+        """
+        self.source = source or source_from_env()
+        self.max_workers = max_workers
+        rate = float(os.getenv('MARKET_DATA_RATE', '5'))
+        self.rate_limiter = rate_limiter or TokenBucket(rate=rate, capacity=2 * rate)
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._sleep = sleep
+
+    def _call(self, func: Callable):
+        """Run one upstream call through the rate limiter with backoff"""
+        def attempt():
+            self.rate_limiter.acquire()
+            return func()
+        return retry_with_backoff(attempt, retries=self.retries, base_delay=self.base_delay,
+                                  max_delay=self.max_delay, sleep=self._sleep)
+
+    def _collect(self, result: FetchResult, frames: Dict[str, pd.DataFrame], tickers: List[str]):
+        """Normalize returned frames, leaving unusable tickers out"""
+        for ticker in tickers:
+            df = frames.get(ticker)
+            if df is None or len(df) == 0:
+                continue
+            try:
+                df = normalize_history(df)
+            except ValueError as e:
+                result.errors[ticker] = str(e)
+                continue
+            if len(df) == 0:
+                continue
+            result.frames[ticker] = df
+            result.errors.pop(ticker, None)
+
+    def fetch_history(self, tickers: List[str], start, end, interval: str = '1d') -> FetchResult:
+        """
+        Fetch OHLCV history for many tickers
+
+        The first attempt is a single batched request for every ticker.
+        Tickers missing from that response are retried individually, in
+        parallel, each with its own backoff.
+        """
+        result = FetchResult()
+        tickers = list(dict.fromkeys(tickers))
+        if not tickers:
+            return result
+
+        try:
+            result.upstream_calls += 1
+            frames = self._call(lambda: self.source.download(tickers, start, end, interval))
+            self._collect(result, frames, tickers)
+        except Exception as e:
+            for ticker in tickers:
+                result.errors[ticker] = f"Batch download failed: {e}"
+
+        missing = [t for t in tickers if t not in result.frames]
+        if not missing:
+            return result
+
+        def download_one(ticker):
+            frames = self.source.download([ticker], start, end, interval)
+            if ticker not in frames or len(frames[ticker]) == 0:
+                raise LookupError("No data returned")
+            return frames
+
+        def fetch_one(ticker):
+            return ticker, self._call(lambda: download_one(ticker))
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(missing))) as pool:
+            futures = [pool.submit(fetch_one, ticker) for ticker in missing]
+            result.upstream_calls += len(futures)
+            for ticker, future in zip(missing, futures):
+                try:
+                    _, frames = future.result()
+                    self._collect(result, frames, [ticker])
+                except Exception as e:
+                    result.errors[ticker] = str(e)
+
+        return result
+
+    def fetch_quotes(self, tickers: List[str]) -> Dict[str, Dict]:
+        """
+        Fetch latest quotes for many tickers with bounded concurrency
+
+        Returns:
+            {ticker: quote_dict} - failed tickers map to {"error": message}
+        """
+        tickers = list(dict.fromkeys(tickers))
+        if not tickers:
+            return {}
+
+        def fetch_one(ticker):
+            return self._call(lambda: self.source.quote(ticker))
+
+        quotes = {}
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(tickers))) as pool:
+            futures = {ticker: pool.submit(fetch_one, ticker) for ticker in tickers}
+            for ticker, future in futures.items():
+                try:
+                    quotes[ticker] = future.result()
+                except Exception as e:
+                    quotes[ticker] = {"error": f"Unable to fetch price: {e}"}
+        return quotes
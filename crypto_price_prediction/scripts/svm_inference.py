@@ -0,0 +1,356 @@
+"""
+Approximate SVM Inference
+=========================
+Fast path for the RBF SVMs (models_svm/ and prediction/best_prediction_model_SVM.pkl).
+
+An exact RBF SVC evaluates one kernel per support vector for every row
+(1902-3820 here), which dominates backtests and range scoring. A
+`ReducedSetSVM` replaces the support vectors with a much smaller set of
+landmarks (k-means centres of the support vectors and calibration rows)
+and re-fits the expansion weights by least squares to the exact decision
+function:
+
+    f(x) = sum_i alpha_i k(x, sv_i) + b   ~=   sum_j w_j k(x, l_j) + c
+
+The Platt sigmoid mapping decision values to probabilities is fitted on
+the exact model's own outputs, and the scaler is applied inside, so it
+takes raw feature rows like the exact pipeline. Scoring is a handful of
+BLAS calls instead of a libsvm loop.
+
+The approximation is not exact - `fidelity_report` measures it against
+the exact model on held-out rows (probability error, signal agreement,
+speed-up), and callers choose exact or approx per use.
+
+Usage:
+    from svm_inference import load_reduced
+    approx = load_reduced('../models_svm/bitcoin_svm_model.pkl', '../models_svm/bitcoin_svm_scaler.pkl')
+    approx.predict_proba(X_raw)[:, 1]
+
+    python svm_inference.py report [--components 500]
+"""
+
+import argparse
+import json
+import time
+import warnings
+from pathlib import Path
+from typing import Callable, Dict, Optional, Union
+
+import numpy as np
+
+try:
+    from .artifacts import artifact_path, export_artifact, load_artifact, load_model
+except ImportError:
+    from artifacts import artifact_path, export_artifact, load_artifact, load_model
+
+REDUCED_SUFFIX = '.reduced'
+DEFAULT_COMPONENTS = 500
+PROJECT_DIR = Path(__file__).parent.parent
+
+
+def _rbf(X: np.ndarray, landmarks: np.ndarray, landmark_norms: np.ndarray, gamma: float) -> np.ndarray:
+    """exp(-gamma * ||x - l||^2) for every row/landmark pair"""
+    sq = (X * X).sum(axis=1)[:, None] + landmark_norms[None, :] - 2.0 * (X @ landmarks.T)
+    np.maximum(sq, 0.0, out=sq)
+    sq *= -gamma
+    return np.exp(sq, out=sq)
+
+
+def _sigmoid(z):
+    return 1.0 / (1.0 + np.exp(-z))
+
+
+def _exact_scores(model, X_scaled: np.ndarray):
+    """Exact decision values and P(class 1) (silences sklearn's probability deprecation)"""
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        return model.decision_function(X_scaled), model.predict_proba(X_scaled)[:, 1]
+
+
+class ReducedSetSVM:
+    """Binary RBF SVM approximated with a reduced landmark expansion"""
+
+    def __init__(self, landmarks, weights, bias: float, gamma: float, platt_a: float, platt_b: float,
+                 mean, scale, report: Optional[Dict] = None):
+        self.landmarks = landmarks
+        self.weights = weights
+        self.bias = float(bias)
+        self.gamma = float(gamma)
+        self.platt_a = float(platt_a)
+        self.platt_b = float(platt_b)
+        self.mean = mean
+        self.scale = scale
+        self.report = report or {}
+        self.landmark_norms = (landmarks * landmarks).sum(axis=1)
+
+    @property
+    def n_components(self) -> int:
+        return len(self.landmarks)
+
+    def to_dict(self) -> dict:
+        """Plain arrays/scalars, so stored artifacts do not depend on the import path"""
+        return {
+            'landmarks': self.landmarks, 'weights': self.weights, 'bias': self.bias,
+            'gamma': self.gamma, 'platt_a': self.platt_a, 'platt_b': self.platt_b,
+            'mean': self.mean, 'scale': self.scale, 'report': self.report
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'ReducedSetSVM':
+        return cls(**data)
+
+    # ========================================
+    # Fitting
+    # ========================================
+
+    @classmethod
+    def from_svc(cls, model, scaler=None, n_components: int = DEFAULT_COMPONENTS,
+                 calibration: Optional[np.ndarray] = None, random_state: int = 42,
+                 ridge: float = 1e-6) -> 'ReducedSetSVM':
+        """
+        Fit a reduced-set approximation of a trained binary RBF SVC
+
+        Args:
+            model: Fitted sklearn SVC (kernel='rbf', probability=True)
+            scaler: Scaler the SVC was trained behind (None if inputs are pre-scaled)
+            n_components: Number of landmarks
+            calibration: Optional raw feature rows from the deployment distribution;
+                the support vectors are always used as well
+            random_state: Seed for the landmark k-means
+            ridge: Tikhonov regularisation of the weight fit
+        """
+        from sklearn.cluster import KMeans
+
+        if getattr(model, 'kernel', None) != 'rbf' or len(model.classes_) != 2:
+            raise ValueError("Only binary RBF SVC models are supported")
+
+        support = np.asarray(model.support_vectors_, dtype=np.float64)
+        points = support
+        if calibration is not None and len(calibration):
+            calibration = np.asarray(calibration, dtype=np.float64)
+            points = np.vstack([support, scaler.transform(calibration) if scaler is not None else calibration])
+
+        n_components = min(n_components, len(support))
+        landmarks = KMeans(n_clusters=n_components, n_init=1, random_state=random_state).fit(points).cluster_centers_
+
+        decision, prob_up = _exact_scores(model, points)
+        gamma = float(model._gamma)
+        design = np.hstack([_rbf(points, landmarks, (landmarks * landmarks).sum(axis=1), gamma),
+                            np.ones((len(points), 1))])
+        gram = design.T @ design
+        gram[np.diag_indices_from(gram)] += ridge * np.trace(gram) / len(gram)
+        solution = np.linalg.solve(gram, design.T @ decision)
+
+        # Platt scaling of the exact model, recovered from its own outputs
+        prob_up = np.clip(prob_up, 1e-6, 1 - 1e-6)
+        platt_a, platt_b = np.polyfit(decision, np.log(prob_up / (1 - prob_up)), 1)
+
+        n_features = support.shape[1]
+        if scaler is not None:
+            mean = np.asarray(scaler.mean_ if scaler.with_mean else np.zeros(n_features), dtype=np.float64)
+            scale = np.asarray(scaler.scale_ if scaler.with_std else np.ones(n_features), dtype=np.float64)
+        else:
+            mean, scale = np.zeros(n_features), np.ones(n_features)
+
+        return cls(landmarks=landmarks, weights=solution[:-1], bias=solution[-1], gamma=gamma,
+                   platt_a=platt_a, platt_b=platt_b, mean=mean, scale=scale)
+
+    # ========================================
+    # Scoring
+    # ========================================
+
+    def decision_function(self, X: np.ndarray) -> np.ndarray:
+        """Approximate decision values for raw (unscaled) feature rows"""
+        Z = (np.atleast_2d(np.asarray(X, dtype=np.float64)) - self.mean) / self.scale
+        return _rbf(Z, self.landmarks, self.landmark_norms, self.gamma) @ self.weights + self.bias
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        """[P(class 0), P(class 1)] per row, like SVC.predict_proba"""
+        prob_up = _sigmoid(self.platt_a * self.decision_function(X) + self.platt_b)
+        return np.column_stack([1.0 - prob_up, prob_up])
+
+
+# ========================================
+# Fidelity
+# ========================================
+
+def fidelity_report(model, scaler, approx: ReducedSetSVM, X: np.ndarray, threshold: float = 0.5) -> Dict:
+    """
+    Compare an approximation with the exact SVC on raw feature rows
+
+    Args:
+        model: Exact SVC
+        scaler: Its scaler (None if inputs are pre-scaled)
+        approx: ReducedSetSVM built from it
+        X: Held-out raw feature rows (not used for fitting)
+        threshold: Confidence threshold used for BUY/SELL signals
+
+    Returns:
+        Dict with probability error, signal agreement and timings
+    """
+    X = np.asarray(X, dtype=np.float64)
+
+    started = time.perf_counter()
+    _, exact = _exact_scores(model, scaler.transform(X) if scaler is not None else X)
+    exact_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    fast = approx.predict_proba(X)[:, 1]
+    approx_seconds = time.perf_counter() - started
+
+    def signals(prob_up):
+        return np.where(prob_up >= threshold, 1, np.where(1 - prob_up >= threshold, -1, 0))
+
+    diff = np.abs(fast - exact)
+    return {
+        'rows': int(len(X)),
+        'support_vectors': int(len(model.support_vectors_)),
+        'components': approx.n_components,
+        'max_abs_error': float(diff.max()),
+        'mean_abs_error': float(diff.mean()),
+        'p95_abs_error': float(np.percentile(diff, 95)),
+        'direction_agreement': float(((fast >= 0.5) == (exact >= 0.5)).mean()),
+        'signal_agreement': float((signals(fast) == signals(exact)).mean()),
+        'threshold': float(threshold),
+        'exact_us_per_row': exact_seconds / len(X) * 1e6,
+        'approx_us_per_row': approx_seconds / len(X) * 1e6,
+        'speedup': exact_seconds / approx_seconds if approx_seconds > 0 else float('inf')
+    }
+
+
+def _split(X: np.ndarray):
+    """Alternate rows between fitting and evaluation"""
+    return X[0::2], X[1::2]
+
+
+def build_reduced(model_pkl: Union[str, Path], scaler_pkl: Optional[Union[str, Path]] = None,
+                  n_components: int = DEFAULT_COMPONENTS, calibration: Optional[np.ndarray] = None,
+                  threshold: float = 0.5, rng_seed: int = 0) -> ReducedSetSVM:
+    """
+    Fit, evaluate and export the reduced model for an SVM pickle
+
+    Half of `calibration` is used for fitting and half for the fidelity
+    report. Without calibration rows, the report uses random midpoints
+    between support vectors.
+    """
+    model = load_model(model_pkl)
+    scaler = load_model(scaler_pkl) if scaler_pkl is not None else None
+
+    if calibration is not None and len(calibration) >= 2:
+        fit_rows, eval_rows = _split(np.asarray(calibration, dtype=np.float64))
+    else:
+        rng = np.random.default_rng(rng_seed)
+        support = np.asarray(model.support_vectors_, dtype=np.float64)
+        pairs = rng.integers(0, len(support), size=(len(support), 2))
+        weights = rng.random((len(support), 1))
+        midpoints = weights * support[pairs[:, 0]] + (1 - weights) * support[pairs[:, 1]]
+        fit_rows, eval_rows = None, scaler.inverse_transform(midpoints) if scaler is not None else midpoints
+
+    approx = ReducedSetSVM.from_svc(model, scaler, n_components=n_components, calibration=fit_rows)
+    approx.report = fidelity_report(model, scaler, approx, eval_rows, threshold=threshold)
+
+    model_pkl = Path(model_pkl)
+    export_artifact(approx.to_dict(), _reduced_path(model_pkl))
+    return approx
+
+
+def _reduced_path(model_pkl: Path) -> Path:
+    return artifact_path(model_pkl.with_name(model_pkl.stem + REDUCED_SUFFIX + model_pkl.suffix))
+
+
+def load_reduced(model_pkl: Union[str, Path], scaler_pkl: Optional[Union[str, Path]] = None,
+                 calibration_loader: Optional[Callable[[], np.ndarray]] = None, **build_kwargs) -> ReducedSetSVM:
+    """
+    Load the reduced model for an SVM pickle, building it if missing or stale
+
+    Stale means older than the model or the scaler pickle.
+
+    Args:
+        model_pkl: Exact SVC pickle
+        scaler_pkl: Its scaler pickle
+        calibration_loader: Returns the calibration rows; only called when a build is needed
+        **build_kwargs: Passed to build_reduced (n_components, calibration, threshold)
+    """
+    model_pkl = Path(model_pkl)
+    path = _reduced_path(model_pkl)
+    skeleton = path / 'skeleton.pkl'
+    sources = [p for p in (model_pkl, scaler_pkl) if p is not None]
+    newest_source = max(Path(p).stat().st_mtime for p in sources)
+    if not skeleton.exists() or skeleton.stat().st_mtime < newest_source:
+        if calibration_loader is not None:
+            build_kwargs['calibration'] = calibration_loader()
+        return build_reduced(model_pkl, scaler_pkl, **build_kwargs)
+    return ReducedSetSVM.from_dict(load_artifact(path))
+
+
+# ========================================
+# models_svm helpers
+# ========================================
+
+def svm_feature_rows(symbol: str, feature_cols, limit: Optional[int] = None) -> np.ndarray:
+    """Historical feature rows for a symbol from the columnar dataset store"""
+    try:
+        from .dataset_store import load_dataset
+        from .daily_update import engineer_features
+    except ImportError:
+        from dataset_store import load_dataset
+        from daily_update import engineer_features
+
+    df = load_dataset(columns=['Symbol', 'Date', 'Open', 'High', 'Low', 'Close', 'Volume'], symbols=[symbol])
+    features = engineer_features(df.rename(columns={'Symbol': 'symbol'}))
+    # Zero-volume days in the early history produce infinite volume ratios
+    rows = features[feature_cols].replace([np.inf, -np.inf], np.nan).dropna().to_numpy(dtype=np.float64)
+    return rows[-limit:] if limit else rows
+
+
+def load_svm_models(models_dir: Union[str, Path] = PROJECT_DIR / 'models_svm',
+                    n_components: int = DEFAULT_COMPONENTS) -> Dict:
+    """
+    Exact and reduced models for models_svm/
+
+    Returns:
+        {'config': {...}, 'BTC': {'model', 'scaler', 'reduced', 'threshold'}, 'ETH': {...}}
+    """
+    models_dir = Path(models_dir)
+    config = load_model(models_dir / 'config.pkl')
+    loaded = {'config': config}
+    for symbol, name, threshold_key in [('BTC', 'bitcoin', 'btc_threshold'), ('ETH', 'ethereum', 'eth_threshold')]:
+        model_pkl = models_dir / f'{name}_svm_model.pkl'
+        scaler_pkl = models_dir / f'{name}_svm_scaler.pkl'
+        threshold = float(config[threshold_key])
+        loaded[symbol] = {
+            'model': load_model(model_pkl),
+            'scaler': load_model(scaler_pkl),
+            'reduced': load_reduced(
+                model_pkl, scaler_pkl, n_components=n_components, threshold=threshold,
+                calibration_loader=lambda symbol=symbol: svm_feature_rows(symbol, config['feature_cols'])),
+            'threshold': threshold
+        }
+    return loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build reduced SVMs and report fidelity")
+    parser.add_argument('command', choices=['report'])
+    parser.add_argument('--components', type=int, default=DEFAULT_COMPONENTS)
+    args = parser.parse_args()
+
+    config = load_model(PROJECT_DIR / 'models_svm' / 'config.pkl')
+    targets = [
+        ('BTC', PROJECT_DIR / 'models_svm' / 'bitcoin_svm_model.pkl',
+         PROJECT_DIR / 'models_svm' / 'bitcoin_svm_scaler.pkl', float(config['btc_threshold'])),
+        ('ETH', PROJECT_DIR / 'models_svm' / 'ethereum_svm_model.pkl',
+         PROJECT_DIR / 'models_svm' / 'ethereum_svm_scaler.pkl', float(config['eth_threshold'])),
+        (None, PROJECT_DIR.parent / 'prediction' / 'best_prediction_model_SVM.pkl',
+         PROJECT_DIR.parent / 'prediction' / 'scaler_predictions.pkl', 0.5)
+    ]
+    for symbol, model_pkl, scaler_pkl, threshold in targets:
+        calibration = svm_feature_rows(symbol, config['feature_cols']) if symbol else None
+        approx = build_reduced(model_pkl, scaler_pkl, n_components=args.components,
+                               calibration=calibration, threshold=threshold)
+        print(f"✓ {model_pkl.relative_to(PROJECT_DIR.parent)}")
+        print(json.dumps(approx.report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+"""
+Native Tree-Ensemble Inference
+==============================
+Scores the XGBoost classifiers without XGBoost, pandas or a DMatrix.
+
+`CompiledTreeEnsemble.from_xgb(model, scaler)` exports the booster into
+flat NumPy node arrays (feature, threshold, left, right, default-left,
+leaf value) and keeps the StandardScaler's mean and scale, so raw feature
+rows are scored directly.
+
+Scaled rows are rounded to float32 before the comparison, exactly like a
+DMatrix. Split thresholds are float32 training values, and binary or
+discrete features (Price_Direction, Volume_Spike, ...) sit exactly on
+them; folding the scaler into float64 thresholds flips those ties.
+
+Evaluation walks every tree at
+once, one vectorized step per depth level. Leaves point to themselves,
+so all trees can take the same number of steps.
+
+`predict_proba_one` reuses per-thread buffers and allocates nothing per
+call; `predict_proba` scores a whole matrix (backtests, backfills).
+
+The compiled arrays are plain NumPy, so they are exported as a
+memory-mapped artifact (see artifacts.py) next to the model pickle.
+"""
+
+import json
+import threading
+from pathlib import Path
+from typing import Optional, Union
+
+import numpy as np
+
+try:
+    from .artifacts import artifact_path, export_artifact, load_artifact, load_model
+except ImportError:
+    from artifacts import artifact_path, export_artifact, load_artifact, load_model
+
+NATIVE_SUFFIX = '.native'
+FORMAT_VERSION = 2  # Bumped when the compiled layout changes; older artifacts are rebuilt
+
+
+def _parse_float(value) -> float:
+    """XGBoost 2+ writes scalar params as '[4.2E-1]'"""
+    if isinstance(value, str):
+        value = value.strip('[]')
+    return float(value)
+
+
+class CompiledTreeEnsemble:
+    """Flat-array binary:logistic tree ensemble with its StandardScaler built in"""
+
+    def __init__(self, feature, threshold, left, right, default_left, value, roots,
+                 max_depth: int, base_margin: float, n_features: int, mean, scale,
+                 format_version: int = FORMAT_VERSION):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.default_left = default_left
+        self.value = value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.base_margin = float(base_margin)
+        self.n_features = int(n_features)
+        self.mean = mean
+        self.scale = scale
+        self.format_version = int(format_version)
+        self._local = threading.local()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop('_local', None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._local = threading.local()
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    def to_dict(self) -> dict:
+        """Plain arrays/scalars, so stored artifacts do not depend on the import path"""
+        return {name: getattr(self, name) for name in (
+            'feature', 'threshold', 'left', 'right', 'default_left', 'value', 'roots',
+            'max_depth', 'base_margin', 'n_features', 'mean', 'scale', 'format_version'
+        )}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'CompiledTreeEnsemble':
+        return cls(**data)
+
+    # ========================================
+    # Export
+    # ========================================
+
+    @classmethod
+    def from_xgb(cls, model, scaler=None) -> 'CompiledTreeEnsemble':
+        """
+        Compile a fitted XGBClassifier (binary:logistic, gbtree)
+
+        Args:
+            model: XGBClassifier or Booster
+            scaler: Optional fitted StandardScaler applied before the model
+        """
+        booster = model.get_booster() if hasattr(model, 'get_booster') else model
+        learner = json.loads(booster.save_raw('json'))['learner']
+        objective = learner['objective']['name']
+        if objective != 'binary:logistic':
+            raise ValueError(f"Unsupported objective '{objective}'")
+        gbm = learner['gradient_booster']
+        if gbm['name'] != 'gbtree':
+            raise ValueError(f"Unsupported booster '{gbm['name']}'")
+
+        trees = gbm['model']['trees']
+        best_iteration = getattr(model, 'best_iteration', None)
+        if best_iteration is not None:
+            # predict_proba stops at the early-stopping iteration
+            n_parallel = int(gbm['model']['gbtree_model_param'].get('num_parallel_tree', 1))
+            trees = trees[:(best_iteration + 1) * n_parallel]
+
+        n_features = int(learner['learner_model_param']['num_feature'])
+        if scaler is not None:
+            mean = np.asarray(getattr(scaler, 'mean_', None) if scaler.with_mean else np.zeros(n_features), dtype=np.float64)
+            scale = np.asarray(scaler.scale_ if scaler.with_std else np.ones(n_features), dtype=np.float64)
+            if np.any(scale <= 0):
+                raise ValueError("Scaler has non-positive scales")
+        else:
+            mean, scale = np.zeros(n_features), np.ones(n_features)
+
+        features, thresholds, lefts, rights, defaults, values, roots = [], [], [], [], [], [], []
+        offset, max_depth = 0, 0
+        for tree in trees:
+            if any(tree.get('split_type', [])):
+                raise ValueError("Categorical splits are not supported")
+            left = np.asarray(tree['left_children'], dtype=np.int64)
+            right = np.asarray(tree['right_children'], dtype=np.int64)
+            split_index = np.asarray(tree['split_indices'], dtype=np.int64)
+            condition = np.asarray(tree['split_conditions'], dtype=np.float32)
+            n = len(left)
+            node_ids = np.arange(n)
+            leaf = left == -1
+
+            # Leaves loop onto themselves and carry their value
+            features.append(np.where(leaf, 0, split_index))
+            thresholds.append(np.where(leaf, np.inf, condition).astype(np.float32))
+            lefts.append(np.where(leaf, node_ids, left) + offset)
+            rights.append(np.where(leaf, node_ids, right) + offset)
+            defaults.append(np.asarray(tree['default_left'], dtype=bool))
+            values.append(np.where(leaf, condition.astype(np.float64), 0.0))
+            roots.append(offset)
+
+            depth = np.zeros(n, dtype=np.int64)
+            for node in range(n):  # Children always come after their parent
+                if not leaf[node]:
+                    depth[left[node]] = depth[right[node]] = depth[node] + 1
+            max_depth = max(max_depth, int(depth.max()))
+            offset += n
+
+        base_score = _parse_float(learner['learner_model_param']['base_score'])
+        base_margin = np.log(base_score / (1 - base_score))
+
+        return cls(
+            feature=np.concatenate(features).astype(np.int32),
+            threshold=np.concatenate(thresholds),
+            left=np.concatenate(lefts).astype(np.int32),
+            right=np.concatenate(rights).astype(np.int32),
+            default_left=np.concatenate(defaults),
+            value=np.concatenate(values),
+            roots=np.asarray(roots, dtype=np.int32),
+            max_depth=max_depth,
+            base_margin=base_margin,
+            n_features=n_features,
+            mean=mean,
+            scale=scale
+        )
+
+    # ========================================
+    # Scoring
+    # ========================================
+
+    def _buffers(self):
+        buffers = getattr(self._local, 'buffers', None)
+        if buffers is None:
+            n = self.n_trees
+            buffers = {
+                'scaled64': np.empty(self.n_features, dtype=np.float64),
+                'scaled': np.empty(self.n_features, dtype=np.float32),
+                'nodes': np.empty(n, dtype=np.int32),
+                'feature': np.empty(n, dtype=np.int32),
+                'x': np.empty(n, dtype=np.float32),
+                'threshold': np.empty(n, dtype=np.float32),
+                'go_left': np.empty(n, dtype=bool),
+                'missing': np.empty(n, dtype=bool),
+                'default': np.empty(n, dtype=bool),
+                'child': np.empty(n, dtype=np.int32),
+                'leaf_values': np.empty(n, dtype=np.float64)
+            }
+            self._local.buffers = buffers
+        return buffers
+
+    def predict_margin_one(self, x: np.ndarray) -> float:
+        """Raw margin for one unscaled feature row (no allocation per call)"""
+        b = self._buffers()
+        # Same arithmetic as StandardScaler.transform, then DMatrix's float32 cast
+        np.subtract(x, self.mean, out=b['scaled64'])
+        np.divide(b['scaled64'], self.scale, out=b['scaled64'])
+        np.copyto(b['scaled'], b['scaled64'], casting='same_kind')
+        nodes = b['nodes']
+        np.copyto(nodes, self.roots)
+        for _ in range(self.max_depth):
+            np.take(self.feature, nodes, out=b['feature'])
+            np.take(b['scaled'], b['feature'], out=b['x'])
+            np.take(self.threshold, nodes, out=b['threshold'])
+            np.less(b['x'], b['threshold'], out=b['go_left'])
+            # Missing values follow the learned default direction
+            np.isnan(b['x'], out=b['missing'])
+            np.take(self.default_left, nodes, out=b['default'])
+            np.logical_and(b['missing'], b['default'], out=b['missing'])
+            np.logical_or(b['go_left'], b['missing'], out=b['go_left'])
+            np.take(self.right, nodes, out=b['child'])
+            np.take(self.left, nodes, out=nodes)
+            np.copyto(nodes, b['child'], where=~b['go_left'])
+        np.take(self.value, nodes, out=b['leaf_values'])
+        return float(b['leaf_values'].sum()) + self.base_margin
+
+    def predict_proba_one(self, x: np.ndarray) -> float:
+        """Probability of class 1 for one unscaled feature row"""
+        margin = self.predict_margin_one(x)
+        return 1.0 / (1.0 + np.exp(-margin))
+
+    def predict_margin(self, X: np.ndarray) -> np.ndarray:
+        """Raw margins for a matrix of unscaled feature rows"""
+        X = ((np.asarray(X, dtype=np.float64) - self.mean) / self.scale).astype(np.float32)
+        rows = np.arange(len(X))[:, None]
+        nodes = np.broadcast_to(self.roots, (len(X), self.n_trees)).copy()
+        for _ in range(self.max_depth):
+            x = X[rows, self.feature[nodes]]
+            go_left = (x < self.threshold[nodes]) | (np.isnan(x) & self.default_left[nodes])
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return self.value[nodes].sum(axis=1) + self.base_margin
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        """[P(class 0), P(class 1)] per row, like XGBClassifier.predict_proba"""
+        prob_up = 1.0 / (1.0 + np.exp(-self.predict_margin(X)))
+        return np.column_stack([1.0 - prob_up, prob_up])
+
+
+def load_compiled(model_pkl: Union[str, Path], scaler_pkl: Optional[Union[str, Path]] = None) -> CompiledTreeEnsemble:
+    """
+    Load the compiled ensemble for a model (+ scaler) pickle
+
+    The compiled arrays are cached as a memory-mapped artifact and rebuilt
+    whenever the model or scaler pickle is newer.
+    """
+    model_pkl = Path(model_pkl)
+    path = artifact_path(model_pkl.with_name(model_pkl.stem + NATIVE_SUFFIX + model_pkl.suffix))
+    skeleton = path / 'skeleton.pkl'
+    sources = [p for p in (model_pkl, scaler_pkl) if p is not None]
+    newest_source = max(Path(p).stat().st_mtime for p in sources)
+    if skeleton.exists() and skeleton.stat().st_mtime >= newest_source:
+        data = load_artifact(path)
+        if data.get('format_version') == FORMAT_VERSION:
+            return CompiledTreeEnsemble.from_dict(data)
+    scaler = load_model(scaler_pkl) if scaler_pkl is not None else None
+    export_artifact(CompiledTreeEnsemble.from_xgb(load_model(model_pkl), scaler).to_dict(), path)
+    return CompiledTreeEnsemble.from_dict(load_artifact(path))
@@ -11,16 +11,48 @@ Date: 2025-12-13
 
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response
 from pydantic import BaseModel, Field
 from typing import Optional, List
+from contextlib import asynccontextmanager
 from datetime import datetime
+import asyncio
 import sys
 from pathlib import Path
 
 # Add parent directories to path
 sys.path.append(str(Path(__file__).parent.parent.parent))
 
-from routers import crypto, rag, sentiment
+from routers import crypto, rag, sentiment, clients
+from services.metrics import MetricsMiddleware, REGISTRY, CONTENT_TYPE
+from services.profiling import ProfilingMiddleware, PROFILING_MODE
+from services.registry import STARTUP_MODE, warm_up, readiness
+from services.shared_state import get_shared_state
+from services.scheduler import SCHEDULER_ENABLED, get_scheduler
+from services.serialization import FastJSONResponse, CompressionMiddleware
+from services.health import get_health_monitor
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start and stop background tasks (services load per STARTUP_MODE, see services/registry.py)"""
+    warmup_task = None
+    if STARTUP_MODE == "eager":
+        await warm_up()
+    elif STARTUP_MODE == "background":
+        warmup_task = asyncio.create_task(warm_up())
+    if STARTUP_MODE != "lazy":
+        crypto.price_poller.start()  # In lazy mode the first /prices request starts it
+    if SCHEDULER_ENABLED:
+        get_scheduler().start()
+    get_health_monitor().start()
+    yield
+    await get_health_monitor().stop()
+    if SCHEDULER_ENABLED:
+        await get_scheduler().stop()
+    if warmup_task is not None and not warmup_task.done():
+        warmup_task.cancel()
+    await crypto.price_poller.stop()
+    get_shared_state().resign('price_poller')  # Let another worker take over polling now
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -28,7 +60,9 @@ app = FastAPI(
     description="REST API for Crypto Predictions, Sentiment Analysis and RAG Chat Assistant",
     version="2.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=FastJSONResponse,  # orjson, see services/serialization.py
+    lifespan=lifespan
 )
 
 # CORS middleware for React frontend
@@ -40,10 +74,21 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# gzip/brotli for large responses (streams pass through uncompressed)
+app.add_middleware(CompressionMiddleware)
+
+# Opt-in request profiler (PROFILING=header|all), see services/profiling.py
+if PROFILING_MODE != "off":
+    app.add_middleware(ProfilingMiddleware)
+
+# Request count/latency per route (outermost, so CORS preflights are counted too)
+app.add_middleware(MetricsMiddleware)
+
 # Include routers
 app.include_router(crypto.router, prefix="/api/crypto", tags=["Crypto Predictions"])
 app.include_router(rag.router, prefix="/api/rag", tags=["RAG Chat Assistant"])
 app.include_router(sentiment.router, prefix="/api/sentiment", tags=["Sentiment Analysis"])
+app.include_router(clients.router, prefix="/api/clients", tags=["Client Segmentation"])
 
 @app.get("/")
 async def root():
@@ -55,24 +100,55 @@ async def root():
         "endpoints": {
             "crypto": "/api/crypto",
             "rag": "/api/rag",
+            "sentiment": "/api/sentiment",
+            "clients": "/api/clients",
             "docs": "/docs",
-            "health": "/health"
+            "health": "/health",
+            "ready": "/ready",
+            "scheduler": "/scheduler",
+            "metrics": "/metrics"
         },
         "timestamp": datetime.now().isoformat()
     }
 
 @app.get("/health")
 async def health_check():
-    """Health check endpoint"""
+    """
+    Liveness: the process is up and serving (always 200)
+
+    Also returns the cached dependency checks (see services/health.py);
+    nothing is probed by this request.
+    """
+    dependencies = get_health_monitor().report()
     return {
         "status": "healthy",
-        "timestamp": datetime.now().isoformat(),
-        "services": {
-            "crypto_model": "loaded",
-            "rag_assistant": "loaded"
-        }
+        "dependencies": dependencies["status"],
+        "checks": dependencies["checks"],
+        "timestamp": datetime.now().isoformat()
     }
 
+@app.get("/ready")
+async def ready_check():
+    """Readiness: 200 once the warm-up services have loaded and no critical dependency check fails"""
+    report = readiness()
+    monitor = get_health_monitor()
+    report["ready"] = report["ready"] and monitor.critical_ok
+    report["dependencies"] = monitor.report()
+    report["timestamp"] = datetime.now().isoformat()
+    return FastJSONResponse(report, status_code=200 if report["ready"] else 503)
+
+@app.get("/scheduler")
+async def scheduler_status():
+    """Scheduled jobs: last and next run, last error, median duration"""
+    if not SCHEDULER_ENABLED:
+        return {"enabled": False, "jobs": {}}
+    return {"enabled": True, "jobs": get_scheduler().status()}
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint: request, stage latency and cache metrics"""
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
 if __name__ == "__main__":
     import uvicorn
     print("\n" + "="*60)
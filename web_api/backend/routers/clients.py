@@ -7,13 +7,17 @@ Endpoints for customer risk profiling and segmentation
 from fastapi import APIRouter, HTTPException, UploadFile, File
 from pydantic import BaseModel, Field
 from typing import Optional, List, Dict
-import pandas as pd
 import io
 
-from services.client_service import ClientService
+from services.registry import load_service
+from services.serialization import RESPONSE_FORMATS, bulk_response
 
 router = APIRouter()
-client_service = ClientService()
+
+def _validate_format(response_format: str) -> str:
+    if response_format not in RESPONSE_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Format must be one of {list(RESPONSE_FORMATS)}")
+    return response_format
 
 # Request/Response Models
 class ClientInput(BaseModel):
@@ -49,26 +53,32 @@ async def predict_client_segment(client: ClientInput):
         Segment classification with risk score and recommendations
     """
     try:
-        prediction = client_service.predict_single_client(client.dict())
+        service = await load_service("clients")
+        prediction = service.predict_single_client(client.dict())
         return prediction
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Prediction error: {str(e)}")
 
 @router.post("/predict/batch", response_model=BatchPredictionResponse)
-async def predict_batch_clients(batch: BatchClientInput):
+async def predict_batch_clients(batch: BatchClientInput, format: str = 'records'):
     """
     Predict segments for multiple clients
     
     Args:
         batch: List of client data
+        format: 'records' (default) or 'columnar' (see services/serialization.py)
     
     Returns:
         Predictions for all clients
     """
+    _validate_format(format)
     try:
-        predictions = client_service.predict_batch_clients(
+        service = await load_service("clients")
+        predictions = service.predict_batch_clients(
             [client.dict() for client in batch.clients]
         )
+        if format == 'columnar':
+            return bulk_response(predictions, format, total=len(predictions))
         return {
             "total": len(predictions),
             "predictions": predictions
@@ -77,7 +87,7 @@ async def predict_batch_clients(batch: BatchClientInput):
         raise HTTPException(status_code=500, detail=f"Batch prediction error: {str(e)}")
 
 @router.post("/predict/csv")
-async def predict_from_csv(file: UploadFile = File(...)):
+async def predict_from_csv(file: UploadFile = File(...), format: str = 'records'):
     """
     Upload CSV file and predict segments for all clients
     
@@ -86,7 +96,14 @@ async def predict_from_csv(file: UploadFile = File(...)):
     - freq_trading
     - volatilite_portefeuille
     - periode_detention_moy
+
+    Pass ?format=columnar for large files: one array per field instead of
+    one object per client (see services/serialization.py)
     """
+    import pandas as pd  # deferred so importing the router stays cheap
+
+    _validate_format(format)
+
     try:
         # Read CSV
         contents = await file.read()
@@ -103,8 +120,11 @@ async def predict_from_csv(file: UploadFile = File(...)):
             )
         
         # Predict
-        predictions = client_service.predict_from_dataframe(df)
+        service = await load_service("clients")
+        predictions = service.predict_from_dataframe(df)
         
+        if format == 'columnar':
+            return bulk_response(predictions, format, total=len(predictions), file_name=file.filename)
         return {
             "total": len(predictions),
             "predictions": predictions,
@@ -161,7 +181,8 @@ async def get_client_statistics():
     Get model statistics and performance metrics
     """
     try:
-        stats = client_service.get_statistics()
+        service = await load_service("clients")
+        stats = service.get_statistics()
         return stats
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Stats error: {str(e)}")
@@ -172,7 +193,8 @@ async def get_recommendations(client: ClientInput):
     Get personalized recommendations for a client profile
     """
     try:
-        recommendations = client_service.get_recommendations(client.dict())
+        service = await load_service("clients")
+        recommendations = service.get_recommendations(client.dict())
         return recommendations
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Recommendations error: {str(e)}")
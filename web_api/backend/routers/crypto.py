@@ -4,18 +4,53 @@ Crypto Price Prediction API Router
 Endpoints for Bitcoin and Ethereum price predictions
 """
 
-from fastapi import APIRouter, HTTPException, BackgroundTasks
+from fastapi import APIRouter, HTTPException, BackgroundTasks, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from typing import Optional, List, Dict
 from datetime import datetime, date
+import asyncio
+import os
 import sys
 from pathlib import Path
 
 # Import crypto service
-from services.crypto_service import CryptoService
+from services.registry import get_crypto_service, load_service
+from services.price_stream import PriceCache, PricePoller, sse_price_events
+from services.metrics import register_cache, REGISTRY
+from services.shared_state import get_shared_state
+from services.serialization import RESPONSE_FORMATS, bulk_response
 
 router = APIRouter()
-crypto_service = CryptoService()
+# One upstream poller shared by every dashboard
+PRICE_POLL_INTERVAL = float(os.getenv("PRICE_POLL_INTERVAL", "10"))
+
+
+def _poll_prices():
+    """
+    Only the leader worker calls the upstream and publishes to shared state;
+    the other workers' pollers read the leader's last quotes from there
+    """
+    state = get_shared_state()
+    if state.lead('price_poller', ttl=PRICE_POLL_INTERVAL * 3):
+        prices = get_crypto_service().get_current_prices()
+        state.cache_set('prices', 'latest', prices)
+        return prices
+    return state.cache_get('prices', 'latest') or {}
+
+
+price_cache = PriceCache()
+price_poller = PricePoller(_poll_prices, price_cache, interval=PRICE_POLL_INTERVAL)
+register_cache('price_cache', hits=lambda: price_cache.hits, misses=lambda: price_cache.misses,
+               entries=lambda: len(price_cache.snapshot_symbols()))
+REGISTRY.gauge("price_stream_subscribers", "Connected SSE price clients").set_function(
+    lambda: price_cache.subscriber_count)
+REGISTRY.gauge("price_poller_polls", "Upstream price polls").set_function(lambda: price_poller.polls)
+REGISTRY.gauge("price_poller_errors", "Failed upstream price polls").set_function(lambda: price_poller.errors)
+
+# Per-endpoint SVM inference mode defaults (overridable per request with ?mode=)
+SVM_PREDICTIONS_MODE = os.getenv("SVM_PREDICTIONS_MODE", "exact")
+SVM_BACKTEST_MODE = os.getenv("SVM_BACKTEST_MODE", "approx")
 
 # Request/Response Models
 class PredictionResponse(BaseModel):
@@ -54,33 +89,58 @@ class PredictionsResponse(BaseModel):
     BTC: CryptoPrediction
     ETH: CryptoPrediction
 
+def _validate_timeframe(timeframe: str) -> str:
+    from services.crypto_service import TIMEFRAMES  # deferred: pulls in pandas
+    if timeframe not in TIMEFRAMES:
+        raise HTTPException(status_code=400, detail=f"Timeframe must be one of {list(TIMEFRAMES)}")
+    return timeframe
+
+def _validate_svm_mode(mode: str) -> str:
+    from services.crypto_service import SVM_MODES
+    if mode not in SVM_MODES:
+        raise HTTPException(status_code=400, detail=f"Mode must be one of {list(SVM_MODES)}")
+    return mode
+
+def _validate_format(response_format: str) -> str:
+    if response_format not in RESPONSE_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Format must be one of {list(RESPONSE_FORMATS)}")
+    return response_format
+
 @router.get("/predictions", response_model=PredictionsResponse)
-async def get_current_predictions():
+async def get_current_predictions(timeframe: str = '1d'):
     """
     Get current price predictions for BTC and ETH
     
+    Args:
+        timeframe: Candle timeframe (1d, 4h, 1h) - default 1d
+    
     Returns latest predictions with confidence scores
     """
+    _validate_timeframe(timeframe)
     try:
-        predictions = crypto_service.get_current_predictions()
+        service = await load_service("crypto")
+        predictions = await asyncio.to_thread(service.get_current_predictions, timeframe=timeframe)
         return predictions
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Prediction error: {str(e)}")
 
 @router.get("/predictions/{symbol}", response_model=CryptoPrediction)
-async def get_prediction_by_symbol(symbol: str):
+async def get_prediction_by_symbol(symbol: str, timeframe: str = '1d'):
     """
     Get prediction for specific cryptocurrency
     
     Args:
         symbol: BTC or ETH
+        timeframe: Candle timeframe (1d, 4h, 1h) - default 1d
     """
     symbol = symbol.upper()
     if symbol not in ['BTC', 'ETH']:
         raise HTTPException(status_code=400, detail="Symbol must be BTC or ETH")
+    _validate_timeframe(timeframe)
     
     try:
-        predictions = crypto_service.get_current_predictions()
+        service = await load_service("crypto")
+        predictions = await asyncio.to_thread(service.get_current_predictions, timeframe=timeframe)
         if symbol in predictions:
             return predictions[symbol]
         raise HTTPException(status_code=404, detail=f"No prediction found for {symbol}")
@@ -97,7 +157,8 @@ async def refresh_predictions(background_tasks: BackgroundTasks):
     Fetches latest data and generates new predictions
     """
     try:
-        background_tasks.add_task(crypto_service.refresh_predictions)
+        service = await load_service("crypto")
+        background_tasks.add_task(service.refresh_predictions)
         return {
             "status": "refresh_initiated",
             "message": "Predictions are being updated in the background",
@@ -110,22 +171,29 @@ async def refresh_predictions(background_tasks: BackgroundTasks):
 async def get_predictions_history(
     symbol: Optional[str] = None,
     limit: int = 30,
-    days: Optional[int] = None
+    days: Optional[int] = None,
+    format: str = 'records'
 ):
     """
     Get historical predictions
-    
+
     Args:
         symbol: Filter by BTC or ETH (optional)
         limit: Maximum number of records (default 30)
         days: Filter by last N days (optional)
+        format: 'records' (default) or 'columnar' (see services/serialization.py)
     """
+    _validate_format(format)
     try:
-        history = crypto_service.get_predictions_history(
+        service = await load_service("crypto")
+        history = await asyncio.to_thread(
+            service.get_predictions_history,
             symbol=symbol.upper() if symbol else None,
             limit=limit,
             days=days
         )
+        if format == 'columnar':
+            return bulk_response(history, format, total=len(history))
         return {
             "total": len(history),
             "predictions": history
@@ -133,22 +201,108 @@ async def get_predictions_history(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"History error: {str(e)}")
 
+@router.get("/candles/{symbol}")
+async def get_candles(symbol: str, timeframe: str = '1h', limit: int = 200):
+    """
+    Get OHLCV candles resampled from minute data
+    
+    Args:
+        symbol: BTC or ETH
+        timeframe: 1m, 1h, 4h or 1d (default 1h)
+        limit: Maximum number of most recent candles (default 200)
+    """
+    symbol = symbol.upper()
+    if symbol not in ['BTC', 'ETH']:
+        raise HTTPException(status_code=400, detail="Symbol must be BTC or ETH")
+    _validate_timeframe(timeframe)
+    
+    try:
+        service = await load_service("crypto")
+        candles = await asyncio.to_thread(service.get_candles, symbol, timeframe=timeframe, limit=limit)
+        return {"symbol": symbol, "timeframe": timeframe, "total": len(candles), "candles": candles}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Candles error: {str(e)}")
+
 @router.get("/prices/current")
 async def get_current_prices():
-    """Get current market prices for BTC and ETH"""
+    """Get current market prices for BTC and ETH (served from the shared tick cache)"""
     try:
-        prices = crypto_service.get_current_prices()
-        return prices
+        price_poller.start()
+        if price_cache.version == 0:
+            # Cold cache: poll once instead of waiting for the next tick
+            await price_poller.poll_once()
+        return price_cache.snapshot()["prices"]
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Price fetch error: {str(e)}")
 
+@router.get("/prices/stream")
+async def stream_prices(request: Request):
+    """
+    Stream live prices as Server-Sent Events
+
+    Sends the current snapshot on connect, then a `prices` event every
+    time the shared cache changes. All clients share one upstream poller.
+    """
+    price_poller.start()
+    return StreamingResponse(
+        sse_price_events(price_cache, is_disconnected=request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/svm/predictions")
+async def get_svm_predictions(mode: Optional[str] = None):
+    """
+    Get current SVM predictions for BTC and ETH
+    
+    Args:
+        mode: 'exact' (libsvm) or 'approx' (reduced-set model) - default from SVM_PREDICTIONS_MODE
+    """
+    mode = _validate_svm_mode(mode or SVM_PREDICTIONS_MODE)
+    try:
+        service = await load_service("crypto")
+        return await asyncio.to_thread(service.get_svm_predictions, mode=mode)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"SVM prediction error: {str(e)}")
+
+@router.get("/svm/backtest/{symbol}")
+async def backtest_svm(symbol: str, days: int = 365, mode: Optional[str] = None):
+    """
+    Score every daily candle of a range with the SVM
+    
+    Args:
+        symbol: BTC or ETH
+        days: Number of most recent days to score (default 365)
+        mode: 'exact' or 'approx' - default from SVM_BACKTEST_MODE
+    """
+    symbol = symbol.upper()
+    if symbol not in ['BTC', 'ETH']:
+        raise HTTPException(status_code=400, detail="Symbol must be BTC or ETH")
+    mode = _validate_svm_mode(mode or SVM_BACKTEST_MODE)
+    
+    try:
+        service = await load_service("crypto")
+        return await asyncio.to_thread(service.backtest_svm, symbol, days=days, mode=mode)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"SVM backtest error: {str(e)}")
+
+@router.get("/svm/fidelity")
+async def get_svm_fidelity():
+    """Fidelity report of the approximate SVMs against the exact models"""
+    try:
+        service = await load_service("crypto")
+        return await asyncio.to_thread(service.get_svm_fidelity)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"SVM fidelity error: {str(e)}")
+
 @router.get("/stats")
 async def get_statistics():
     """
     Get prediction statistics and model performance
     """
     try:
-        stats = crypto_service.get_statistics()
+        service = await load_service("crypto")
+        stats = await asyncio.to_thread(service.get_statistics)
         return stats
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Stats error: {str(e)}")
@@ -4,16 +4,14 @@ RAG Chat API Router
 Endpoints for intelligent Q&A about crypto models using RAG
 """
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 from pydantic import BaseModel, Field
 from typing import Optional, List, Dict
 
-from services.rag_service import RAGService
-from services.crypto_service import CryptoService
+from services.registry import load_service
+from services.cancellation import run_cancellable
 
 router = APIRouter()
-crypto_service = CryptoService()
-rag_service = RAGService(crypto_service=crypto_service)
 
 # Request/Response Models
 class ChatRequest(BaseModel):
@@ -35,6 +33,7 @@ class ChatResponse(BaseModel):
     answer: str
     sources: List[Source]
     confidence: float
+    degraded: bool = False  # True: LLM unavailable, answer lists the retrieved sources only
     metrics: Metrics
 
 class StatsResponse(BaseModel):
@@ -45,7 +44,7 @@ class StatsResponse(BaseModel):
     collection_name: str
 
 @router.post("/chat", response_model=ChatResponse)
-async def chat_with_assistant(request: ChatRequest):
+async def chat_with_assistant(request: ChatRequest, http_request: Request):
     """
     Ask a question about crypto prediction models
     
@@ -57,11 +56,14 @@ async def chat_with_assistant(request: ChatRequest):
     
     Returns:
         Answer with sources and performance metrics
+    
+    The generation is aborted if the client disconnects or
+    LLM_REQUEST_DEADLINE passes (see services/cancellation.py)
     """
     try:
-        response = rag_service.ask_question(
-            question=request.question
-        )
+        # Worker thread: the LLM call blocks, and the gateway queues it behind a slot
+        service = await load_service("rag")
+        response = await run_cancellable(http_request, service.ask_question, question=request.question)
         return response
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Chat error: {str(e)}")
@@ -74,7 +76,8 @@ async def clear_chat_history():
     Removes all previous conversation context
     """
     try:
-        result = rag_service.clear_history()
+        service = await load_service("rag")
+        result = service.clear_history()
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error clearing history: {str(e)}")
@@ -87,7 +90,8 @@ async def get_rag_stats():
     Returns information about the knowledge base and system status
     """
     try:
-        stats = rag_service.get_stats()
+        service = await load_service("rag")
+        stats = service.get_stats()
         return stats
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error getting stats: {str(e)}")
@@ -96,7 +100,8 @@ async def get_rag_stats():
 async def health_check():
     """Check RAG service health"""
     try:
-        stats = rag_service.get_stats()
+        service = await load_service("rag")
+        stats = service.get_stats()
         return {
             "status": "healthy",
             "model": stats["model"],
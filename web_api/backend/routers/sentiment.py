@@ -4,18 +4,19 @@ Sentiment Analysis Router
 REST API endpoints for crypto sentiment analysis.
 """
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 from pydantic import BaseModel, Field
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 
-from services.sentiment_service import SentimentService
+from services.registry import load_service
+from services.cancellation import run_cancellable
+from services.health import get_health_monitor
+from services.news_store import get_news_store
+from services.config import OLLAMA_MODEL
 
 router = APIRouter()
 
-# Initialize service
-sentiment_service = SentimentService()
-
 # ========================================
 # Request/Response Models
 # ========================================
@@ -26,12 +27,13 @@ class TechnicalPrediction(BaseModel):
     pct_change: float = Field(..., description="Expected price change percentage")
     current_price: float = Field(..., description="Current price")
     predicted_price: float = Field(..., description="Predicted price")
-    rsi: Optional[float] = Field(50, description="RSI indicator value")
+    rsi: Optional[float] = Field(None, description="RSI indicator value (left out of the analysis when unknown)")
 
 class SentimentRequest(BaseModel):
     """Request for sentiment analysis"""
     crypto: str = Field(..., description="Cryptocurrency name (Bitcoin or Ethereum)")
-    technical: TechnicalPrediction = Field(..., description="Technical analysis data")
+    technical: Optional[TechnicalPrediction] = Field(
+        None, description="Technical analysis data (default: the model's current prediction)")
 
 class SentimentAnalysis(BaseModel):
     """Sentiment analysis results"""
@@ -40,6 +42,7 @@ class SentimentAnalysis(BaseModel):
     confidence: float
     key_factors: List[str]
     reasoning: str
+    degraded: bool = False  # True: LLM unavailable, keyword-based estimate
 
 class CombinedSignal(BaseModel):
     """Combined technical + sentiment signal"""
@@ -57,6 +60,7 @@ class Recommendation(BaseModel):
     aligned: bool
     reasoning: str
     timestamp: str
+    degraded: bool = False  # True: LLM unavailable, templated reasoning
 
 class SentimentResponse(BaseModel):
     """Full sentiment analysis response"""
@@ -67,64 +71,121 @@ class SentimentResponse(BaseModel):
     recommendation: Recommendation
     news_count: int
     timestamp: str
+    agent: Optional[Dict[str, Any]] = None  # Run key and per-step source/seconds (services/sentiment_agent.py)
+
+class SentimentBatchRequest(BaseModel):
+    """Request for the news sentiment of several coins"""
+    cryptos: List[str] = Field(..., min_length=1, max_length=50, description="Cryptocurrency names")
+
+class CoinSentiment(BaseModel):
+    """News sentiment of one coin"""
+    crypto: str
+    sentiment: SentimentAnalysis
+    news_count: int
+
+class SentimentBatchResponse(BaseModel):
+    """News sentiment of several coins"""
+    results: List[CoinSentiment]
+    timestamp: str
 
 # ========================================
 # Endpoints
 # ========================================
 
 @router.post("/analyze", response_model=SentimentResponse)
-async def analyze_sentiment(request: SentimentRequest):
+async def analyze_sentiment(request: SentimentRequest, http_request: Request):
     """
     Analyze crypto sentiment and combine with technical analysis
     
-    - Fetches recent news articles
+    - Fetches recent news articles and the technical signal in parallel
     - Uses Ollama LLM for sentiment analysis
     - Combines with technical signals
     - Generates trading recommendation
+    
+    Steps are checkpointed: retrying a request after an LLM failure resumes
+    at the failed step (services/sentiment_agent.py)
+    
+    LLM calls are aborted if the client disconnects or LLM_REQUEST_DEADLINE
+    passes (see services/cancellation.py)
     """
     try:
-        result = sentiment_service.analyze_crypto(
+        # Worker thread: the LLM calls block, and the gateway queues them behind a slot
+        service = await load_service("sentiment")
+        result = await run_cancellable(
+            http_request,
+            service.analyze_crypto,
             crypto_name=request.crypto,
-            technical_prediction=request.technical.dict()
+            technical_prediction=request.technical.dict() if request.technical else None
         )
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Sentiment analysis failed: {str(e)}")
 
+@router.post("/analyze/batch", response_model=SentimentBatchResponse)
+async def analyze_sentiment_batch(request: SentimentBatchRequest, http_request: Request):
+    """
+    News sentiment of several coins (an "all coins" view), without technical signals
+    
+    - Coins are packed SENTIMENT_BATCH_SIZE per LLM prompt instead of one prompt each
+    - Coins a batched reply misses or mangles are analyzed one by one
+    """
+    try:
+        service = await load_service("sentiment")
+        results = await run_cancellable(http_request, service.analyze_sentiments,
+                                        crypto_names=request.cryptos)
+        return {"results": list(results.values()), "timestamp": datetime.now().isoformat()}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Sentiment analysis failed: {str(e)}")
+
+@router.get("/latest/{crypto}", response_model=SentimentResponse)
+async def get_latest_sentiment(crypto: str):
+    """
+    Latest analysis computed by the scheduled sentiment refresh (no LLM call)
+    """
+    service = await load_service("sentiment")
+    result = service.get_latest(crypto)
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"No scheduled analysis for {crypto} yet")
+    return result
+
+@router.get("/news/{crypto}")
+async def get_news_history(crypto: str, since: Optional[int] = None, until: Optional[int] = None,
+                           limit: int = 100):
+    """
+    Stored news for a coin, oldest first, for backtesting sentiment
+    
+    - since / until: published_on window in unix seconds (until exclusive)
+    - Served from the article store; never calls the news API
+    """
+    store = get_news_store()
+    coin = crypto.lower()
+    articles = store.between(coin, since=since, until=until, limit=min(max(limit, 1), 1000))
+    return {
+        "crypto": crypto,
+        "watermark": store.watermark(coin),
+        "count": len(articles),
+        "articles": articles
+    }
+
 @router.post("/clear-cache")
 async def clear_cache():
     """Clear the news cache"""
     try:
-        sentiment_service.clear_cache()
+        service = await load_service("sentiment")
+        service.clear_cache()
         return {"status": "success", "message": "News cache cleared"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to clear cache: {str(e)}")
 
 @router.get("/health")
 async def health_check():
-    """Health check endpoint"""
-    try:
-        # Test Ollama connection
-        test_response = requests.post(
-            sentiment_service.ollama_url,
-            json={
-                "model": sentiment_service.ollama_model,
-                "prompt": "Say OK",
-                "stream": False,
-                "options": {"num_predict": 5}
-            },
-            timeout=5
-        )
-        ollama_status = "ok" if test_response.status_code == 200 else "error"
-    except:
-        ollama_status = "error"
-    
+    """Health check endpoint (cached Ollama check from services/health.py, no generation)"""
+    ollama = get_health_monitor().results["ollama"]
     return {
         "status": "healthy",
         "service": "sentiment_analysis",
-        "ollama": ollama_status,
-        "model": sentiment_service.ollama_model,
+        "ollama": ollama["status"],
+        "ollama_check": ollama,
+        "model": OLLAMA_MODEL,
         "timestamp": datetime.now().isoformat()
     }
-
-import requests
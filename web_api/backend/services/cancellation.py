@@ -0,0 +1,94 @@
+"""
+Request Cancellation
+====================
+Request-scoped cancellation for blocking service calls (LLM generations).
+
+`run_cancellable(request, func, ...)` runs a service call in a worker
+thread with a `Cancellation` token in a context variable (asyncio.to_thread
+copies it into the thread). While the call runs, the handler watches the
+connection: if the client disconnects or the deadline passes, the token is
+cancelled. The LLM gateway reads the token through `current_cancellation()`:
+a queued request leaves the queue, and a running generation is aborted at
+the next streamed token, which closes the connection to Ollama and frees
+the slot.
+
+Settings:
+    LLM_REQUEST_DEADLINE=90     seconds a chat/sentiment request may spend on the LLM (0 = none)
+"""
+
+import asyncio
+import os
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable, Optional
+
+LLM_REQUEST_DEADLINE = float(os.getenv("LLM_REQUEST_DEADLINE", "90"))
+DISCONNECT_POLL_INTERVAL = 0.25  # Seconds between client-disconnect checks
+
+
+class LLMCancelled(Exception):
+    """The caller went away or ran out of time; the LLM work was dropped"""
+
+    def __init__(self, reason: str):
+        super().__init__(f"LLM request cancelled ({reason})")
+        self.reason = reason
+
+
+class Cancellation:
+    """Thread-safe cancellation flag with an optional deadline"""
+
+    def __init__(self, deadline_seconds: Optional[float] = None):
+        self._event = threading.Event()
+        self.reason: Optional[str] = None
+        self.deadline = time.monotonic() + deadline_seconds if deadline_seconds else None
+
+    def cancel(self, reason: str):
+        if not self._event.is_set():
+            self.reason = reason
+            self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        if not self._event.is_set() and self.deadline is not None and time.monotonic() >= self.deadline:
+            self.cancel("deadline")
+        return self._event.is_set()
+
+    def check(self):
+        if self.cancelled:
+            raise LLMCancelled(self.reason)
+
+
+_current: ContextVar[Optional[Cancellation]] = ContextVar("llm_cancellation", default=None)
+
+
+def current_cancellation() -> Optional[Cancellation]:
+    """The token of the request being served by this thread/task, if any"""
+    return _current.get()
+
+
+async def run_cancellable(request, func: Callable, *args, deadline_seconds: Optional[float] = LLM_REQUEST_DEADLINE,
+                          **kwargs):
+    """
+    Run a blocking service call in a worker thread, cancelled on client disconnect or deadline
+
+    Args:
+        request: The Starlette request (polled for disconnects)
+        func: Blocking callable, e.g. RAGService.ask_question
+        deadline_seconds: Deadline for the whole call (None/0 = none)
+
+    Returns:
+        The callable's result (services return degraded answers when their LLM call is cancelled)
+    """
+    cancellation = Cancellation(deadline_seconds)
+    token = _current.set(cancellation)
+    try:
+        task = asyncio.ensure_future(asyncio.to_thread(func, *args, **kwargs))
+    finally:
+        _current.reset(token)
+
+    while not task.done():
+        await asyncio.wait({task}, timeout=DISCONNECT_POLL_INTERVAL)
+        if not task.done() and not cancellation.cancelled and await request.is_disconnected():
+            cancellation.cancel("client_disconnected")
+    return task.result()
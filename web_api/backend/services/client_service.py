@@ -16,6 +16,15 @@ project_root = Path(__file__).parent.parent.parent.parent
 client_path = project_root / "client_segmentation"
 sys.path.append(str(client_path))
 
+FEATURE_COLUMNS = ['montant_investi', 'freq_trading', 'volatilite_portefeuille', 'periode_detention_moy']
+
+# Simulated class probabilities per segment (until the trained model is wired in)
+SEGMENT_PROBABILITIES = {
+    "Prudent": {"Prudent": 0.85, "Équilibré": 0.12, "Aventurier": 0.03},
+    "Équilibré": {"Prudent": 0.15, "Équilibré": 0.75, "Aventurier": 0.10},
+    "Aventurier": {"Prudent": 0.05, "Équilibré": 0.15, "Aventurier": 0.80},
+}
+
 class ClientService:
     def __init__(self):
         self.client_path = client_path
@@ -75,15 +84,8 @@ class ClientService:
         segment, risk_score = self._rule_based_prediction(client_data)
         
         # Generate probabilities (simulated for now)
-        if segment == "Prudent":
-            probs = {"Prudent": 0.85, "Équilibré": 0.12, "Aventurier": 0.03}
-            confidence = 0.85
-        elif segment == "Équilibré":
-            probs = {"Prudent": 0.15, "Équilibré": 0.75, "Aventurier": 0.10}
-            confidence = 0.75
-        else:  # Aventurier
-            probs = {"Prudent": 0.05, "Équilibré": 0.15, "Aventurier": 0.80}
-            confidence = 0.80
+        probs = dict(SEGMENT_PROBABILITIES[segment])
+        confidence = probs[segment]
         
         # Get recommendations
         recommendations = self._get_recommendations(segment, client_data)
@@ -175,13 +177,50 @@ class ClientService:
         return predictions
     
     def predict_from_dataframe(self, df):
-        """Predict from pandas DataFrame"""
+        """
+        Predict from pandas DataFrame
+        
+        Same output as predict_single_client per row (plus client_id and the
+        original columns), but the risk score is computed column-wise and
+        the recommendation lists are built once per distinct combination, so
+        a 50k-row upload no longer builds 50k single-row DataFrames.
+        """
+        volatility = df['volatilite_portefeuille'].to_numpy(dtype=np.float64)
+        freq = df['freq_trading'].to_numpy(dtype=np.float64)
+        holding = df['periode_detention_moy'].to_numpy(dtype=np.float64)
+        
+        # Same formula and thresholds as _rule_based_prediction
+        raw_scores = np.minimum(volatility / 0.5 * 4 + freq / 50 * 3 + (100 - holding) / 100 * 3, 10.0)
+        segments = np.where(raw_scores < 3.5, "Prudent", np.where(raw_scores < 7.0, "Équilibré", "Aventurier"))
+        high_volatility = volatility > 0.4
+        high_frequency = freq > 40
+        short_holding = holding < 20
+        
+        recommendation_cache = {}
         clients_data = df.to_dict('records')
-        predictions = self.predict_batch_clients(clients_data)
-        
-        # Add original data
-        for i, pred in enumerate(predictions):
-            pred.update(clients_data[i])
+        predictions = []
+        for i, client_data in enumerate(clients_data):
+            segment = str(segments[i])
+            key = (segment, bool(high_volatility[i]), bool(high_frequency[i]), bool(short_holding[i]))
+            recommendations = recommendation_cache.get(key)
+            if recommendations is None:
+                recommendations = recommendation_cache[key] = self._get_recommendations(segment, {
+                    'volatilite_portefeuille': 1.0 if key[1] else 0.0,
+                    'freq_trading': 100.0 if key[2] else 0.0,
+                    'periode_detention_moy': 0.0 if key[3] else 100.0
+                })
+            pred = {
+                "segment": segment,
+                "risk_score": round(float(raw_scores[i]), 2),
+                "confidence": SEGMENT_PROBABILITIES[segment][segment],
+                "probabilities": dict(SEGMENT_PROBABILITIES[segment]),
+                "recommendations": list(recommendations),
+                "features": {column: client_data[column] for column in FEATURE_COLUMNS},
+                "client_id": i + 1
+            }
+            # Add original data
+            pred.update(client_data)
+            predictions.append(pred)
         
         return predictions
     
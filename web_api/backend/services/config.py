@@ -0,0 +1,16 @@
+"""
+Backend Configuration
+=====================
+Upstream endpoints, overridable through environment variables so the API
+can run against local stubs (benchmarks, offline development).
+"""
+
+import os
+
+# Ollama server (RAG answers and sentiment analysis)
+OLLAMA_BASE_URL = os.getenv("OLLAMA_URL", "http://localhost:11434").rstrip("/")
+OLLAMA_GENERATE_URL = f"{OLLAMA_BASE_URL}/api/generate"
+OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3.2")
+
+# CryptoCompare news feed
+NEWS_API_URL = os.getenv("NEWS_API_URL", "https://min-api.cryptocompare.com/data/v2/news/")
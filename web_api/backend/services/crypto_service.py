@@ -4,12 +4,11 @@ Crypto Price Prediction Service
 Business logic for cryptocurrency predictions
 """
 
+import os
 import sys
 from pathlib import Path
 import pandas as pd
-import pickle
 from datetime import datetime, timedelta
-import yfinance as yf
 import numpy as np
 import threading
 
@@ -17,57 +16,141 @@ import threading
 project_root = Path(__file__).parent.parent.parent.parent
 crypto_path = project_root / "crypto_price_prediction"
 sys.path.append(str(crypto_path))
+sys.path.append(str(project_root))
+
+from crypto_price_prediction.scripts.market_data import MarketDataFetcher
+from crypto_price_prediction.scripts.candles import CandleStore, TIMEFRAMES
+from crypto_price_prediction.scripts.artifacts import load_model
+from crypto_price_prediction.scripts.tree_inference import load_compiled
+from crypto_price_prediction.scripts.history_store import (
+    history_watermarks, load_history, upsert_history
+)
+from crypto_price_prediction.scripts.daily_update import FEATURE_LOOKBACK_DAYS
+from services.metrics import stage_timer, register_cache
+from services.shared_state import get_shared_state
+
+TICKERS = {'BTC-USD': 'BTC', 'ETH-USD': 'ETH'}
+INTRADAY_DAYS = 29       # Yahoo keeps ~30 days of 1m candles
+INTRADAY_CHUNK_DAYS = 7  # and serves at most 8 days per 1m request
+# Minutes kept in memory: the backfill window plus the feature warm-up in 4h bars (the coarsest intraday timeframe)
+INTRADAY_RETENTION = pd.Timedelta(days=INTRADAY_DAYS) + FEATURE_LOOKBACK_DAYS * pd.Timedelta(hours=4)
+INFERENCE_BACKEND = os.getenv('INFERENCE_BACKEND', 'native')  # 'native' or 'xgboost'
+SVM_MODES = ('exact', 'approx')
+REFRESH_PROBE_DAYS = 5  # Daily candles fetched to find the latest close
 
 class CryptoService:
-    def __init__(self):
+    def __init__(self, fetcher=None):
         self.models_path = crypto_path / "models"
         self.output_path = crypto_path / "output"
-        self._refresh_lock = threading.Lock()  # Verrou pour éviter écritures simultanées
+        self.shared_state = get_shared_state()  # Refresh lock shared by every worker
+        self.fetcher = fetcher or MarketDataFetcher()
+        self.candle_store = CandleStore(retention=INTRADAY_RETENTION)
+        self._svm = None  # Loaded on first SVM request
+        self._svm_lock = threading.Lock()
+        register_cache('candle_store',
+                       hits=lambda: self.candle_store.cache_hits,
+                       misses=lambda: self.candle_store.cache_misses)
         self.load_models()
         
     def load_models(self):
-        """Load trained models and scalers"""
+        """Load trained models and scalers (memory-mapped, shared across workers)"""
         try:
-            with open(self.models_path / 'bitcoin_best_model.pkl', 'rb') as f:
-                self.btc_model = pickle.load(f)
-            with open(self.models_path / 'bitcoin_scaler.pkl', 'rb') as f:
-                self.btc_scaler = pickle.load(f)
-            with open(self.models_path / 'ethereum_best_model.pkl', 'rb') as f:
-                self.eth_model = pickle.load(f)
-            with open(self.models_path / 'ethereum_scaler.pkl', 'rb') as f:
-                self.eth_scaler = pickle.load(f)
-            with open(self.models_path / 'feature_columns.pkl', 'rb') as f:
-                self.feature_cols = pickle.load(f)
+            self.btc_model = load_model(self.models_path / 'bitcoin_best_model.pkl')
+            self.btc_scaler = load_model(self.models_path / 'bitcoin_scaler.pkl')
+            self.eth_model = load_model(self.models_path / 'ethereum_best_model.pkl')
+            self.eth_scaler = load_model(self.models_path / 'ethereum_scaler.pkl')
+            self.feature_cols = load_model(self.models_path / 'feature_columns.pkl')
             print("✓ Crypto models loaded successfully")
         except Exception as e:
             print(f"✗ Error loading crypto models: {e}")
             raise
+        
+        # Compiled trees with the scaler built in (no pandas/DMatrix per request)
+        self.native_models = {}
+        if INFERENCE_BACKEND == 'native':
+            try:
+                self.native_models = {
+                    'BTC': load_compiled(self.models_path / 'bitcoin_best_model.pkl',
+                                         self.models_path / 'bitcoin_scaler.pkl'),
+                    'ETH': load_compiled(self.models_path / 'ethereum_best_model.pkl',
+                                         self.models_path / 'ethereum_scaler.pkl')
+                }
+                print("✓ Native tree inference enabled")
+            except Exception as e:
+                print(f"⚠ Native inference unavailable, using XGBoost: {e}")
+    
+    def predict_up_probability(self, symbol, features):
+        """
+        Probability that the next candle closes higher
+        
+        Args:
+            symbol: 'BTC' or 'ETH'
+            features: Unscaled feature values in feature_cols order
+        """
+        x = np.asarray(features, dtype=np.float64)
+        native = self.native_models.get(symbol)
+        if native is not None:
+            with stage_timer('predict'):  # Scaler is applied inside the compiled model
+                return native.predict_proba_one(x)
+        
+        if symbol == 'BTC':
+            model, scaler = self.btc_model, self.btc_scaler
+        else:
+            model, scaler = self.eth_model, self.eth_scaler
+        with stage_timer('scaler'):
+            x_scaled = scaler.transform(x.reshape(1, -1))
+        with stage_timer('predict'):
+            return float(model.predict_proba(x_scaled)[0, 1])
     
     def fetch_live_data(self, days_back=365):
-        """Fetch live cryptocurrency data"""
+        """Fetch live cryptocurrency data (single batched request)"""
         end_date = datetime.now().date()
         start_date = end_date - timedelta(days=days_back)
         
-        all_data = []
-        for ticker, symbol in [('BTC-USD', 'BTC'), ('ETH-USD', 'ETH')]:
-            df = yf.download(ticker, start=start_date, end=end_date, progress=False)
-            
-            if isinstance(df.columns, pd.MultiIndex):
-                df.columns = df.columns.get_level_values(0)
-            
-            df = df.reset_index()
-            df = df.loc[:, ~df.columns.duplicated()]
-            
-            if 'Adj Close' not in df.columns:
-                df['Adj Close'] = df['Close']
-            
-            df = df[['Date', 'Adj Close', 'Open', 'High', 'Low', 'Close', 'Volume']]
-            df = df.dropna(subset=['Close', 'High', 'Low', 'Open'])
-            df['symbol'] = symbol
-            all_data.append(df)
+        with stage_timer('data_fetch'):
+            result = self.fetcher.fetch_history(list(TICKERS), start=start_date, end=end_date)
+        if result.errors:
+            print(f"⚠ Market data partially unavailable: {result.errors}")
+        if not result.frames:
+            raise ValueError(f"Failed to fetch market data: {result.errors}")
+        
+        return result.combined(TICKERS)
+    
+    def update_intraday(self, days_back=INTRADAY_DAYS):
+        """
+        Pull minute candles newer than the store's watermark
         
-        return pd.concat(all_data, ignore_index=True)
+        The first call backfills `days_back` days; later calls only fetch
+        the minutes since the last stored candle.
+        """
+        now = pd.Timestamp.now('UTC').tz_localize(None).floor('min')
+        watermarks = [self.candle_store.watermark(symbol) for symbol in TICKERS.values()]
+        if any(w is None for w in watermarks):
+            start = now - pd.Timedelta(days=days_back)
+        else:
+            start = min(watermarks)  # Re-fetch the last (possibly still forming) minute
+        
+        added = 0
+        while start < now:
+            end = min(start + pd.Timedelta(days=INTRADAY_CHUNK_DAYS), now + pd.Timedelta(minutes=1))
+            with stage_timer('data_fetch'):
+                result = self.fetcher.fetch_history(list(TICKERS), start=start, end=end, interval='1m')
+            if result.errors:
+                print(f"⚠ Intraday data partially unavailable: {result.errors}")
+            for ticker, df in result.frames.items():
+                added += self.candle_store.append(TICKERS[ticker], df)
+            start = end
+        return added
+    
+    def get_candles(self, symbol, timeframe='1h', limit=200):
+        """Get resampled OHLCV candles for a symbol"""
+        self.update_intraday()
+        bars = self.candle_store.bars(symbol, timeframe)
+        bars = bars.tail(limit)
+        bars['Date'] = bars['Date'].dt.strftime('%Y-%m-%d %H:%M')
+        return bars.to_dict('records')
     
+    @stage_timer('feature_engineering')
     def engineer_features(self, df):
         """Apply feature engineering (simplified version)"""
         # Import the full feature engineering from the crypto project
@@ -76,11 +159,76 @@ class CryptoService:
         )
         return engineer_features(df)
     
-    def get_current_predictions(self):
-        """Generate current predictions"""
+    def predict_row(self, symbol, row, timeframe='1d'):
+        """
+        Prediction payload for one engineered feature row
+        
+        Args:
+            symbol: 'BTC' or 'ETH'
+            row: Row of engineer_features() output (the candle being scored)
+            timeframe: Only used to format the timestamp
+        """
+        prob_up = self.predict_up_probability(symbol, row[self.feature_cols].values)
+        prob_down = 1.0 - prob_up
+        
+        # Calculate predicted price change
+        current_price = float(row['Close'])
+        # Use probability to estimate price change (simplified)
+        if prob_up >= 0.70:
+            prediction, signal = "up", "BUY"
+            confidence = prob_up
+            price_change_percent = 2.5  # Estimated increase
+        elif prob_down >= 0.70:
+            prediction, signal = "down", "SELL"
+            confidence = prob_down
+            price_change_percent = -2.5  # Estimated decrease
+        else:
+            prediction, signal = "neutral", "HOLD"
+            confidence = max(prob_up, prob_down)
+            price_change_percent = 0.5  # Small increase
+        
+        predicted_price = current_price * (1 + price_change_percent / 100)
+        price_change_amount = predicted_price - current_price
+        
+        # Generate recommendation
+        if signal == "BUY":
+            recommendation = f"Strong upward momentum detected. Consider buying {symbol}."
+        elif signal == "SELL":
+            recommendation = f"Downward trend anticipated. Consider selling or avoiding {symbol}."
+        else:
+            recommendation = f"Market uncertainty. Hold position and monitor {symbol} closely."
+        
+        return {
+            "current_price": current_price,
+            "next_day_prediction": predicted_price,
+            "predicted_change_percent": price_change_percent,
+            "predicted_change_amount": price_change_amount,
+            "trend": prediction,
+            "signal": signal,
+            "confidence": float(confidence),
+            "recommendation": recommendation,
+            "prob_up": float(prob_up),
+            "rsi": float(row['RSI_14']) if pd.notna(row.get('RSI_14')) else None,
+            "timestamp": row['Date'].strftime('%Y-%m-%d' if timeframe == '1d' else '%Y-%m-%d %H:%M')
+        }
+    
+    def get_current_predictions(self, timeframe='1d'):
+        """
+        Generate current predictions
+        
+        Args:
+            timeframe: '1d' uses a year of daily candles; intraday timeframes
+                ('1h', '4h') are resampled from the minute candle store
+        """
+        if timeframe not in TIMEFRAMES:
+            raise ValueError(f"Unsupported timeframe '{timeframe}'. Use one of {list(TIMEFRAMES)}")
         try:
             # Fetch and process data
-            df = self.fetch_live_data()
+            if timeframe == '1d':
+                df = self.fetch_live_data()
+            else:
+                self.update_intraday()
+                df = self.candle_store.frame(timeframe)
             df = self.engineer_features(df)
             
             result = {}
@@ -88,57 +236,7 @@ class CryptoService:
                 symbol_data = df[df['symbol'] == symbol]
                 if len(symbol_data) == 0:
                     continue
-                
-                latest = symbol_data.iloc[-1]
-                X_latest = latest[self.feature_cols].values.reshape(1, -1)
-                
-                if symbol == 'BTC':
-                    model, scaler = self.btc_model, self.btc_scaler
-                else:
-                    model, scaler = self.eth_model, self.eth_scaler
-                
-                X_scaled = scaler.transform(X_latest)
-                pred_proba = model.predict_proba(X_scaled)[0]
-                prob_down, prob_up = pred_proba[0], pred_proba[1]
-                
-                # Calculate predicted price change
-                current_price = float(latest['Close'])
-                # Use probability to estimate price change (simplified)
-                if prob_up >= 0.70:
-                    prediction, signal = "up", "BUY"
-                    confidence = prob_up
-                    price_change_percent = 2.5  # Estimated increase
-                elif prob_down >= 0.70:
-                    prediction, signal = "down", "SELL"
-                    confidence = prob_down
-                    price_change_percent = -2.5  # Estimated decrease
-                else:
-                    prediction, signal = "neutral", "HOLD"
-                    confidence = max(prob_up, prob_down)
-                    price_change_percent = 0.5  # Small increase
-                
-                predicted_price = current_price * (1 + price_change_percent / 100)
-                price_change_amount = predicted_price - current_price
-                
-                # Generate recommendation
-                if signal == "BUY":
-                    recommendation = f"Strong upward momentum detected. Consider buying {symbol}."
-                elif signal == "SELL":
-                    recommendation = f"Downward trend anticipated. Consider selling or avoiding {symbol}."
-                else:
-                    recommendation = f"Market uncertainty. Hold position and monitor {symbol} closely."
-                
-                result[symbol] = {
-                    "current_price": current_price,
-                    "next_day_prediction": predicted_price,
-                    "predicted_change_percent": price_change_percent,
-                    "predicted_change_amount": price_change_amount,
-                    "trend": prediction,
-                    "signal": signal,
-                    "confidence": float(confidence),
-                    "recommendation": recommendation,
-                    "timestamp": latest['Date'].strftime('%Y-%m-%d')
-                }
+                result[symbol] = self.predict_row(symbol, symbol_data.iloc[-1], timeframe)
             
             return result
         except Exception as e:
@@ -146,55 +244,79 @@ class CryptoService:
             raise
     
     def refresh_predictions(self):
-        """Refresh predictions and save to history"""
-        # Utiliser un verrou pour éviter les écritures simultanées
-        with self._refresh_lock:
-            predictions = self.get_current_predictions()
+        """
+        Score daily candles newer than the stored history and append them
+        
+        The latest upstream candle per symbol is probed first (a few days of
+        data); if no symbol has a candle newer than its watermark the call
+        returns a 'no-op' result without fetching history or computing
+        features. Otherwise only FEATURE_LOOKBACK_DAYS of warm-up plus the
+        new candles are fetched, and every new candle gets a history row.
+        """
+        # Verrou partagé entre workers pour éviter les écritures simultanées
+        with self.shared_state.lock('refresh_predictions', ttl=600):
+            watermarks = history_watermarks(list(TICKERS.values()))
+            probe = self.fetch_live_data(days_back=REFRESH_PROBE_DAYS)
+            latest_candles = {symbol: probe.loc[probe['symbol'] == symbol, 'Date'].max()
+                              for symbol in watermarks}
+            pending = [symbol for symbol, latest in latest_candles.items()
+                       if pd.notna(latest) and (watermarks[symbol] is None or latest > watermarks[symbol])]
             
-            # Save to CSV
-            history_file = self.output_path / 'predictions_history.csv'
-            rows = []
-            for symbol, data in predictions.items():
-                rows.append({
-                    'date': data['timestamp'],
-                    'symbol': symbol,
-                    'price': data['current_price'],
-                    'prediction': data['next_day_prediction'],
-                    'signal': data['signal'],
-                    'confidence': data['confidence']
-                })
+            def _dates(values):
+                return {symbol: value.strftime('%Y-%m-%d') if value is not None and pd.notna(value) else None
+                        for symbol, value in values.items()}
             
-            df_new = pd.DataFrame(rows)
+            if not pending:
+                return {
+                    "status": "no-op",
+                    "added": 0,
+                    "watermarks": _dates(watermarks),
+                    "latest_candles": _dates(latest_candles)
+                }
             
-            if history_file.exists():
-                try:
-                    df_history = pd.read_csv(history_file)
-                    # Check if the file is not empty
-                    if not df_history.empty:
-                        df_history = pd.concat([df_history, df_new], ignore_index=True)
-                        df_history = df_history.drop_duplicates(subset=['date', 'symbol'], keep='last')
-                    else:
-                        df_history = df_new
-                except (pd.errors.EmptyDataError, pd.errors.ParserError):
-                    # If file is corrupted or empty, start fresh
-                    df_history = df_new
-            else:
-                df_history = df_new
+            # Enough history to warm up the rolling/EWM features of the oldest new candle
+            # (a symbol without history only gets its latest candle scored)
+            today = pd.Timestamp(datetime.now().date())
+            gap = max((today - watermarks[symbol]).days if watermarks[symbol] is not None else 0
+                      for symbol in pending)
+            days_back = gap + FEATURE_LOOKBACK_DAYS
+            df = self.engineer_features(self.fetch_live_data(days_back=days_back))
+            
+            rows, predictions = [], {}
+            for symbol in pending:
+                symbol_data = df[df['symbol'] == symbol]
+                if watermarks[symbol] is None:
+                    new_rows = symbol_data.tail(1)
+                else:
+                    new_rows = symbol_data[symbol_data['Date'] > watermarks[symbol]]
+                for _, row in new_rows.iterrows():
+                    data = self.predict_row(symbol, row)
+                    predictions[symbol] = data
+                    rows.append({
+                        'date': data['timestamp'],
+                        'symbol': symbol,
+                        'price': data['current_price'],
+                        'prediction': data['next_day_prediction'],
+                        'signal': data['signal'],
+                        'confidence': data['confidence'],
+                        'prob_up': data['prob_up'],
+                        'prob_down': 1.0 - data['prob_up']
+                    })
             
-            df_history.to_csv(history_file, index=False)
-            return predictions
+            if rows:
+                upsert_history(pd.DataFrame(rows))
+            return {
+                "status": "updated",
+                "added": len(rows),
+                "watermarks": _dates(watermarks),
+                "latest_candles": _dates(latest_candles),
+                "predictions": predictions
+            }
     
     def get_predictions_history(self, symbol=None, limit=30, days=None):
         """Get historical predictions"""
-        history_file = self.output_path / 'predictions_history.csv'
-        if not history_file.exists():
-            return []
-        
-        try:
-            df = pd.read_csv(history_file)
-            if df.empty:
-                return []
-        except (pd.errors.EmptyDataError, pd.errors.ParserError):
+        df = load_history()
+        if df.empty:
             return []
         
         if symbol:
@@ -209,23 +331,123 @@ class CryptoService:
         
         return df.to_dict('records')
     
+    # ========================================
+    # SVM models (exact or reduced-set approximation)
+    # ========================================
+    
+    @property
+    def svm_models(self):
+        """Exact + reduced SVMs from models_svm/ (the reduced ones are built on first use)"""
+        with self._svm_lock:
+            if self._svm is None:
+                from crypto_price_prediction.scripts.svm_inference import load_svm_models
+                self._svm = load_svm_models(crypto_path / "models_svm")
+                print("✓ SVM models loaded")
+            return self._svm
+    
+    def score_svm(self, symbol, X, mode='exact'):
+        """
+        P(up) for raw SVM feature rows
+        
+        Args:
+            symbol: 'BTC' or 'ETH'
+            X: Unscaled rows in the SVM feature order
+            mode: 'exact' (libsvm) or 'approx' (reduced-set model)
+        """
+        if mode not in SVM_MODES:
+            raise ValueError(f"Unsupported SVM mode '{mode}'. Use one of {list(SVM_MODES)}")
+        entry = self.svm_models[symbol]
+        X = np.asarray(X, dtype=np.float64)
+        with stage_timer(f'svm_predict_{mode}'):
+            if mode == 'approx':
+                return entry['reduced'].predict_proba(X)[:, 1]
+            return entry['model'].predict_proba(entry['scaler'].transform(X))[:, 1]
+    
+    @staticmethod
+    def _svm_signal(prob_up, threshold):
+        if prob_up >= threshold:
+            return "BUY"
+        if 1 - prob_up >= threshold:
+            return "SELL"
+        return "HOLD"
+    
+    def get_svm_predictions(self, mode='exact'):
+        """Latest-candle SVM predictions for BTC and ETH"""
+        df = self.engineer_features(self.fetch_live_data())
+        feature_cols = self.svm_models['config']['feature_cols']
+        result = {}
+        for symbol in ['BTC', 'ETH']:
+            symbol_data = df[df['symbol'] == symbol]
+            if len(symbol_data) == 0:
+                continue
+            latest = symbol_data.iloc[-1]
+            threshold = self.svm_models[symbol]['threshold']
+            prob_up = float(self.score_svm(symbol, [latest[feature_cols].values], mode=mode)[0])
+            result[symbol] = {
+                "current_price": float(latest['Close']),
+                "probability_up": prob_up,
+                "signal": self._svm_signal(prob_up, threshold),
+                "confidence": max(prob_up, 1 - prob_up),
+                "threshold": threshold,
+                "mode": mode,
+                "timestamp": latest['Date'].strftime('%Y-%m-%d')
+            }
+        return result
+    
+    def backtest_svm(self, symbol, days=365, mode='approx'):
+        """
+        Score every daily candle of the last `days` days with the SVM
+        
+        Returns per-day probabilities and signals plus hit rate of the
+        confident (BUY/SELL) signals against the next day's close.
+        """
+        df = self.engineer_features(self.fetch_live_data(days_back=days + 60))  # Warm-up for MA_50
+        df = df[df['symbol'] == symbol].tail(days).reset_index(drop=True)
+        feature_cols = self.svm_models['config']['feature_cols']
+        threshold = self.svm_models[symbol]['threshold']
+        
+        started = datetime.now()
+        prob_up = self.score_svm(symbol, df[feature_cols].values, mode=mode)
+        scoring_ms = (datetime.now() - started).total_seconds() * 1000
+        
+        went_up = (df['Close'].shift(-1) > df['Close']).values
+        has_outcome = df['Close'].shift(-1).notna().values
+        rows, hits, trades = [], 0, 0
+        for i in range(len(df)):
+            signal = self._svm_signal(prob_up[i], threshold)
+            correct = None
+            if signal != "HOLD" and has_outcome[i]:
+                correct = bool(went_up[i]) == (signal == "BUY")
+                trades += 1
+                hits += correct
+            rows.append({
+                "date": df['Date'].iloc[i].strftime('%Y-%m-%d'),
+                "close": float(df['Close'].iloc[i]),
+                "probability_up": float(prob_up[i]),
+                "signal": signal,
+                "correct": correct
+            })
+        
+        return {
+            "symbol": symbol,
+            "mode": mode,
+            "threshold": threshold,
+            "scoring_ms": scoring_ms,
+            "trades": trades,
+            "hit_rate": hits / trades if trades else None,
+            "coverage": trades / len(df) if len(df) else 0.0,
+            "rows": rows
+        }
+    
+    def get_svm_fidelity(self):
+        """Fidelity of the reduced SVMs against the exact models"""
+        return {symbol: self.svm_models[symbol]['reduced'].report for symbol in ['BTC', 'ETH']}
+    
     def get_current_prices(self):
         """Get current market prices"""
-        prices = {}
-        for ticker, symbol in [('BTC-USD', 'BTC'), ('ETH-USD', 'ETH')]:
-            try:
-                data = yf.Ticker(ticker)
-                info = data.info
-                prices[symbol] = {
-                    "current_price": info.get('currentPrice', info.get('regularMarketPrice', 0)),
-                    "previous_close": info.get('previousClose', 0),
-                    "volume": info.get('volume', 0),
-                    "market_cap": info.get('marketCap', 0)
-                }
-            except:
-                prices[symbol] = {"error": "Unable to fetch price"}
-        
-        return prices
+        with stage_timer('quote_fetch'):
+            quotes = self.fetcher.fetch_quotes(list(TICKERS))
+        return {symbol: quotes[ticker] for ticker, symbol in TICKERS.items()}
     
     def get_statistics(self):
         """Get model statistics"""
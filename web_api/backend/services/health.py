@@ -0,0 +1,187 @@
+"""
+Health Checks
+=============
+Dependency checks run in the background on an interval; /health, /ready and
+/api/sentiment/health serve the cached results, so a probe never costs a
+model load, a vector search or an LLM generation.
+
+Checks (each reports status, latency_ms, checked_at and details):
+
+    model_registry   model files on disk + crypto service load state   (critical)
+    chroma           document count, only once the RAG service is loaded
+    ollama           GET /api/tags: reachable, model pulled, circuit state
+    data_store       age of the newest stored prediction per coin
+
+Statuses: ok, degraded (working but stale/partial), error, not_loaded
+(service not built yet; checks never build services), pending (no run yet).
+A critical check in error makes /ready return 503.
+
+Settings:
+    HEALTH_CHECK_INTERVAL=30         seconds between runs (0 disables the loop)
+    HEALTH_CHECK_TIMEOUT=5           seconds before a check counts as failed
+    HEALTH_HISTORY_MAX_AGE_DAYS=2    predictions older than this are stale
+"""
+
+import asyncio
+import os
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Optional
+
+import requests
+
+from services.config import OLLAMA_BASE_URL, OLLAMA_MODEL
+from services.metrics import REGISTRY
+
+HEALTH_CHECK_INTERVAL = float(os.getenv("HEALTH_CHECK_INTERVAL", "30"))
+HEALTH_CHECK_TIMEOUT = float(os.getenv("HEALTH_CHECK_TIMEOUT", "5"))
+HEALTH_HISTORY_MAX_AGE_DAYS = float(os.getenv("HEALTH_HISTORY_MAX_AGE_DAYS", "2"))
+
+MODELS_PATH = Path(__file__).parent.parent.parent.parent / "crypto_price_prediction" / "models"
+MODEL_FILES = ['bitcoin_best_model.pkl', 'bitcoin_scaler.pkl', 'ethereum_best_model.pkl',
+               'ethereum_scaler.pkl', 'feature_columns.pkl']
+
+CHECK_UP = REGISTRY.gauge("health_check_up", "1 if the dependency check passes (ok or degraded)", ["check"])
+CHECK_LATENCY = REGISTRY.gauge("health_check_latency_seconds", "Duration of the last dependency check", ["check"])
+
+
+# ============================================================================
+# CHECKS
+# ============================================================================
+
+def check_model_registry() -> Dict:
+    """Model files present, and the crypto service loaded them"""
+    from services.registry import SERVICES
+    missing = [name for name in MODEL_FILES if not (MODELS_PATH / name).exists()]
+    service = SERVICES["crypto"].status()
+    if missing or service["state"] == "failed":
+        status = "error"
+    elif service["state"] != "ready":
+        status = "not_loaded"
+    else:
+        status = "ok"
+    return {"status": status, "details": {"missing_files": missing, "service": service}}
+
+
+def check_chroma() -> Dict:
+    """Document count of the RAG collection (skipped until the service is loaded)"""
+    from services.registry import SERVICES
+    rag = SERVICES["rag"]
+    instance = rag.peek()
+    if instance is None:
+        return {"status": "error" if rag.state == "failed" else "not_loaded", "details": {"service": rag.status()}}
+    count = instance.collection.count()
+    return {"status": "ok" if count else "degraded", "details": {"documents": count}}
+
+
+def check_ollama() -> Dict:
+    """Ollama's model list (no generation), the configured model and the LLM circuit"""
+    from services.llm_gateway import get_llm_gateway, LLM_CONNECT_TIMEOUT
+    circuit = get_llm_gateway().breaker.state
+    response = requests.get(f"{OLLAMA_BASE_URL}/api/tags", timeout=(LLM_CONNECT_TIMEOUT, HEALTH_CHECK_TIMEOUT))
+    response.raise_for_status()
+    models = [model.get("name", "") for model in response.json().get("models", [])]
+    model_pulled = any(name == OLLAMA_MODEL or name.split(":")[0] == OLLAMA_MODEL for name in models)
+    return {
+        "status": "ok" if model_pulled and circuit == "closed" else "degraded",
+        "details": {"model": OLLAMA_MODEL, "model_pulled": model_pulled, "models": len(models), "circuit": circuit}
+    }
+
+
+def check_data_store() -> Dict:
+    """Age of the newest stored prediction per coin (the daily refresh keeps it under a day)"""
+    import pandas as pd
+    from crypto_price_prediction.scripts.history_store import history_watermarks
+    today = pd.Timestamp.now('UTC').tz_localize(None).normalize()
+    ages = {symbol: (None if latest is None or pd.isna(latest) else int((today - latest).days))
+            for symbol, latest in history_watermarks(['BTC', 'ETH']).items()}
+    stale = [symbol for symbol, age in ages.items() if age is None or age > HEALTH_HISTORY_MAX_AGE_DAYS]
+    return {"status": "degraded" if stale else "ok", "details": {"prediction_age_days": ages, "stale": stale}}
+
+
+DEFAULT_CHECKS = {
+    "model_registry": check_model_registry,
+    "chroma": check_chroma,
+    "ollama": check_ollama,
+    "data_store": check_data_store,
+}
+CRITICAL_CHECKS = {"model_registry"}
+
+
+# ============================================================================
+# MONITOR
+# ============================================================================
+
+class HealthMonitor:
+    """Runs the checks concurrently on an interval and keeps the last result of each"""
+
+    def __init__(self, checks: Dict[str, Callable[[], Dict]] = None, critical: Iterable[str] = CRITICAL_CHECKS,
+                 interval: float = HEALTH_CHECK_INTERVAL, timeout: float = HEALTH_CHECK_TIMEOUT):
+        self.checks = checks or DEFAULT_CHECKS
+        self.critical = set(critical)
+        self.interval = interval
+        self.timeout = timeout
+        self.results: Dict[str, Dict] = {name: {"status": "pending"} for name in self.checks}
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self, name: str, check: Callable[[], Dict]):
+        started = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(asyncio.to_thread(check), self.timeout)
+        except asyncio.TimeoutError:
+            result = {"status": "error", "error": f"timed out after {self.timeout:g}s"}
+        except Exception as e:
+            result = {"status": "error", "error": str(e)}
+        latency = time.perf_counter() - started
+        result["latency_ms"] = round(latency * 1000, 1)
+        result["checked_at"] = datetime.now(timezone.utc).isoformat()
+        self.results[name] = result
+        CHECK_UP.set(0 if result["status"] == "error" else 1, check=name)
+        CHECK_LATENCY.set(latency, check=name)
+
+    async def run_once(self):
+        await asyncio.gather(*(self._run(name, check) for name, check in self.checks.items()))
+
+    async def _loop(self):
+        while True:
+            await self.run_once()
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.get_running_loop().create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    @property
+    def critical_ok(self) -> bool:
+        return all(self.results[name]["status"] != "error" for name in self.critical if name in self.results)
+
+    def report(self) -> Dict:
+        """Cached results: overall 'ok', 'degraded' (non-critical failure or staleness) or 'error'"""
+        statuses = {result["status"] for result in self.results.values()}
+        if not self.critical_ok:
+            overall = "error"
+        elif statuses & {"error", "degraded"}:
+            overall = "degraded"
+        else:
+            overall = "ok"
+        return {"status": overall, "checks": self.results}
+
+
+_monitor: Optional[HealthMonitor] = None
+
+
+def get_health_monitor() -> HealthMonitor:
+    global _monitor
+    if _monitor is None:
+        _monitor = HealthMonitor()
+    return _monitor
@@ -0,0 +1,396 @@
+"""
+LLM Gateway
+===========
+Single entry point for Ollama generations, shared by the RAG and sentiment
+services.
+
+- bounded concurrency: at most LLM_MAX_CONCURRENCY generations in flight;
+  the others wait in a queue
+- priority: the queue is ordered by priority, then arrival, so interactive
+  chat (PRIORITY_INTERACTIVE) overtakes queued sentiment work (PRIORITY_BATCH)
+- coalescing: an identical request (model, prompt and options) already
+  queued or running is not sent again; the new caller waits for its result.
+  A higher-priority caller joining a queued request raises its priority
+- circuit breaker: after LLM_BREAKER_FAILURES consecutive failures
+  (connection errors, timeouts, 5xx) the circuit opens and every call,
+  queued ones included, fails at once with LLMUnavailable so callers can
+  serve a degraded answer. After LLM_BREAKER_COOLDOWN seconds the next
+  caller probes /api/tags; if Ollama answers, its request is the
+  half-open trial that closes the circuit again
+- metrics: llm_queue_wait_seconds{caller}, llm_requests_total{caller,outcome}
+  (generated / coalesced / error / queue_timeout / rejected / cancelled),
+  llm_cancellations_total{caller,reason,stage}, llm_in_flight,
+  llm_queue_depth and llm_circuit_state (0 closed, 1 half-open, 2 open)
+- cancellation: generations are streamed from Ollama, so a request whose
+  callers all disconnected or passed their deadline (services/cancellation.py)
+  is dropped from the queue, or its connection closed at the next token,
+  which stops the generation on the Ollama host and frees the slot
+
+Settings:
+    LLM_MAX_CONCURRENCY=2     generations sent to Ollama at once
+    LLM_QUEUE_TIMEOUT=120     max seconds a request waits for a slot
+    LLM_CONNECT_TIMEOUT=3     seconds to open a connection to Ollama
+    LLM_READ_TIMEOUT=60       seconds to wait for a generation
+    LLM_BREAKER_FAILURES=3    consecutive failures that open the circuit
+    LLM_BREAKER_COOLDOWN=30   seconds the circuit stays open before a probe
+
+Usage:
+    from services.llm_gateway import get_llm_gateway, PRIORITY_INTERACTIVE
+
+    text = get_llm_gateway().generate(prompt, options={"temperature": 0.7},
+                                      caller="rag_chat", priority=PRIORITY_INTERACTIVE)
+"""
+
+import hashlib
+import heapq
+import itertools
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from typing import Callable, Dict, List, Optional, Union
+
+import requests
+
+from services.config import OLLAMA_BASE_URL, OLLAMA_GENERATE_URL, OLLAMA_MODEL
+from services.cancellation import Cancellation, LLMCancelled, current_cancellation
+from services.metrics import REGISTRY, stage_timer
+
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "2"))
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "120"))
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "3"))
+LLM_READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", "60"))
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "3"))
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))
+
+# Lower runs first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 10
+
+QUEUE_WAIT = REGISTRY.histogram("llm_queue_wait_seconds", "Time an LLM request waited for a slot", ["caller"])
+REQUESTS = REGISTRY.counter("llm_requests_total", "LLM gateway requests", ["caller", "outcome"])
+CANCELLATIONS = REGISTRY.counter("llm_cancellations_total", "LLM requests dropped by their caller",
+                                 ["caller", "reason", "stage"])
+
+CANCEL_POLL_INTERVAL = 0.25  # Seconds between cancellation checks while waiting
+
+
+class LLMQueueTimeout(Exception):
+    """No generation slot became free within LLM_QUEUE_TIMEOUT"""
+
+
+class LLMUnavailable(Exception):
+    """The circuit is open: Ollama is failing, the call was not attempted"""
+
+
+def _is_backend_failure(error: Exception) -> bool:
+    """Errors that say the backend is down or overloaded (not a bad request)"""
+    if isinstance(error, requests.HTTPError):
+        return error.response is not None and error.response.status_code >= 500
+    return isinstance(error, (requests.ConnectionError, requests.Timeout))
+
+
+class CircuitBreaker:
+    """Closed -> open after N consecutive failures -> half-open trial after a cooldown"""
+
+    CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+
+    def __init__(self, failure_threshold: int = LLM_BREAKER_FAILURES, cooldown: float = LLM_BREAKER_COOLDOWN,
+                 probe: Optional[Callable[[], bool]] = None):
+        """
+        Args:
+            failure_threshold: Consecutive failures that open the circuit
+            cooldown: Seconds before an open circuit lets a trial through
+            probe: Cheap health check run before the trial (True = healthy)
+        """
+        self.failure_threshold = max(1, failure_threshold)
+        self.cooldown = cooldown
+        self.probe = probe
+        self.state = self.CLOSED
+        self.failures = 0
+        self.retry_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Whether a call may go to the backend now (claims the trial when half-opening)"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.HALF_OPEN or time.monotonic() < self.retry_at:
+                return False
+            self.state = self.HALF_OPEN  # This caller owns the recovery attempt
+        if self.probe is not None and not self.probe():
+            self.record_failure()
+            return False
+        return True
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                print("✓ LLM circuit closed")
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    print(f"⚠ LLM circuit open for {self.cooldown:g}s after {self.failures} failure(s)")
+                self.state = self.OPEN
+                self.retry_at = time.monotonic() + self.cooldown
+
+    def release_trial(self):
+        """The half-open trial ended without reaching the backend; let the next caller retry"""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self.state = self.OPEN
+                self.retry_at = time.monotonic()
+
+    @property
+    def is_open(self) -> bool:
+        return self.state == self.OPEN
+
+    def state_code(self) -> int:
+        return {self.CLOSED: 0, self.HALF_OPEN: 1, self.OPEN: 2}[self.state]
+
+
+class _Flight:
+    """One upstream request and the cancellation tokens of every caller waiting on it"""
+
+    def __init__(self, key: str):
+        self.key = key
+        self.future = Future()
+        self.cancellations: List[Optional[Cancellation]] = []
+
+    def abandoned(self) -> bool:
+        """True once every caller has cancelled (callers without a token never do)"""
+        return all(c is not None and c.cancelled for c in self.cancellations)
+
+    def cancel_reason(self) -> str:
+        return next((c.reason for c in self.cancellations if c is not None and c.reason), "cancelled")
+
+
+class LLMGateway:
+    """Thread-safe priority gate in front of the Ollama generate endpoint"""
+
+    def __init__(self, generate_url: str = OLLAMA_GENERATE_URL, max_concurrency: int = LLM_MAX_CONCURRENCY,
+                 queue_timeout: float = LLM_QUEUE_TIMEOUT, probe_url: str = f"{OLLAMA_BASE_URL}/api/tags"):
+        self.generate_url = generate_url
+        self.probe_url = probe_url
+        self.max_concurrency = max(1, max_concurrency)
+        self.queue_timeout = queue_timeout
+        self.session = requests.Session()  # Keep-alive connections to Ollama
+        self.breaker = CircuitBreaker(probe=self._probe)
+        self._cond = threading.Condition()
+        self._queue: List[list] = []  # Heap of [priority, seq, key]
+        self._queued: Dict[str, list] = {}  # key -> its heap entry while queued
+        self._pending: Dict[str, _Flight] = {}  # key -> the queued/running request
+        self._seq = itertools.count()
+        self.in_flight = 0
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._queue)
+
+    def _probe(self) -> bool:
+        try:
+            return self.session.get(self.probe_url, timeout=LLM_CONNECT_TIMEOUT).status_code == 200
+        except requests.RequestException:
+            return False
+
+    def _acquire(self, flight: "_Flight", priority: int, deadline: float):
+        with self._cond:
+            entry = [priority, next(self._seq), flight.key]
+            heapq.heappush(self._queue, entry)
+            self._queued[flight.key] = entry
+            try:
+                while self.in_flight >= self.max_concurrency or self._queue[0] is not entry:
+                    if self.breaker.is_open:
+                        raise LLMUnavailable("LLM circuit open")
+                    if flight.abandoned():
+                        raise LLMCancelled(flight.cancel_reason())
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise LLMQueueTimeout(f"No LLM slot free after {self.queue_timeout:g}s")
+                    self._cond.wait(min(remaining, CANCEL_POLL_INTERVAL))
+                heapq.heappop(self._queue)
+                self.in_flight += 1
+            except BaseException:
+                if entry in self._queue:
+                    self._queue.remove(entry)
+                    heapq.heapify(self._queue)
+                    self._cond.notify_all()
+                raise
+            finally:
+                self._queued.pop(flight.key, None)
+
+    def _release(self):
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    def _boost(self, key: str, priority: int):
+        """Raise a queued request's priority to that of a caller joining it"""
+        entry = self._queued.get(key)
+        if entry is not None and priority < entry[0]:
+            entry[0] = priority
+            heapq.heapify(self._queue)
+            self._cond.notify_all()
+
+    def _stream(self, flight: "_Flight", payload: Dict, read_timeout: float) -> str:
+        """Stream the generation, closing the connection (Ollama then stops) if every caller cancelled"""
+        with self.session.post(self.generate_url, json={**payload, "stream": True}, stream=True,
+                               timeout=(LLM_CONNECT_TIMEOUT, read_timeout)) as response:
+            response.raise_for_status()
+            parts = []
+            for line in response.iter_lines():
+                if flight.abandoned():
+                    raise LLMCancelled(flight.cancel_reason())
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if chunk.get("error"):
+                    raise requests.HTTPError(f"Ollama error: {chunk['error']}", response=response)
+                parts.append(chunk.get("response", ""))
+                if chunk.get("done"):
+                    break
+            return "".join(parts)
+
+    def _wait_coalesced(self, flight: "_Flight", cancellation: Optional[Cancellation], caller: str,
+                        timeout: float) -> str:
+        """Wait for another caller's identical request, giving up on our own cancellation"""
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                return flight.future.result(timeout=CANCEL_POLL_INTERVAL)
+            except FutureTimeout:
+                if cancellation is not None and cancellation.cancelled:
+                    CANCELLATIONS.inc(caller=caller, reason=cancellation.reason, stage="coalesced")
+                    with self._cond:
+                        self._cond.notify_all()  # The leader may now be abandoned
+                    raise LLMCancelled(cancellation.reason)
+                if time.monotonic() >= deadline:
+                    raise LLMQueueTimeout("Timed out waiting for a coalesced LLM request")
+
+    def generate(self, prompt: str, options: Optional[Dict] = None, caller: str = "default",
+                 priority: int = PRIORITY_BATCH, timeout: Optional[float] = None, model: str = OLLAMA_MODEL,
+                 format: Optional[Union[str, Dict]] = None) -> str:
+        """
+        Run one generation through the gateway
+
+        The request is cancelled with the current request's Cancellation
+        token (services/cancellation.py); a coalesced request is only
+        dropped once every caller waiting on it has cancelled.
+
+        Args:
+            prompt: Full prompt text
+            options: Ollama options (temperature, num_predict, ...)
+            caller: Label for the queue metrics (e.g. 'rag_chat')
+            priority: PRIORITY_INTERACTIVE or PRIORITY_BATCH (lower runs first)
+            timeout: Read deadline of the generation in seconds (default LLM_READ_TIMEOUT)
+            model: Ollama model name
+            format: Ollama structured output: "json" or a JSON schema the generation is constrained to
+
+        Returns:
+            Generated text
+
+        Raises:
+            LLMUnavailable: the circuit is open (returned immediately)
+            LLMQueueTimeout: no slot within the queue timeout
+            LLMCancelled: the client disconnected or the request deadline passed
+            requests.RequestException: Ollama unreachable or returned an error status
+        """
+        read_timeout = LLM_READ_TIMEOUT if timeout is None else timeout
+        payload = {"model": model, "prompt": prompt, "options": options or {}}
+        if format is not None:
+            payload["format"] = format
+        key = hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+        cancellation = current_cancellation()
+        if cancellation is not None:
+            cancellation.check()
+
+        with self._cond:
+            flight = self._pending.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._pending[key] = _Flight(key)
+            else:
+                self._boost(key, priority)
+            flight.cancellations.append(cancellation)
+
+        if not leader:
+            REQUESTS.inc(caller=caller, outcome="coalesced")
+            return self._wait_coalesced(flight, cancellation, caller,
+                                        self.queue_timeout + LLM_CONNECT_TIMEOUT + read_timeout)
+
+        stage = "queued"
+        try:
+            if not self.breaker.allow():
+                raise LLMUnavailable("LLM circuit open")
+            queued_at = time.perf_counter()
+            try:
+                self._acquire(flight, priority, time.monotonic() + self.queue_timeout)
+            except Exception:
+                self.breaker.release_trial()
+                raise
+            finally:
+                QUEUE_WAIT.observe(time.perf_counter() - queued_at, caller=caller)
+            stage = "generating"
+            try:
+                with stage_timer('llm_generation'):
+                    text = self._stream(flight, payload, read_timeout)
+            except Exception as e:
+                if _is_backend_failure(e):
+                    self.breaker.record_failure()
+                elif not isinstance(e, LLMCancelled):
+                    self.breaker.record_success()  # Ollama answered, the request itself was bad
+                else:
+                    self.breaker.release_trial()
+                raise
+            finally:
+                self._release()
+        except Exception as e:
+            if isinstance(e, LLMCancelled):
+                outcome = "cancelled"
+                CANCELLATIONS.inc(caller=caller, reason=e.reason, stage=stage)
+            elif isinstance(e, LLMUnavailable):
+                outcome = "rejected"
+            elif isinstance(e, LLMQueueTimeout):
+                outcome = "queue_timeout"
+            else:
+                outcome = "error"
+            REQUESTS.inc(caller=caller, outcome=outcome)
+            with self._cond:
+                self._pending.pop(key, None)
+                self._cond.notify_all()  # Queued callers re-check the breaker
+            flight.future.set_exception(e)
+            raise
+
+        self.breaker.record_success()
+        REQUESTS.inc(caller=caller, outcome="generated")
+        with self._cond:
+            self._pending.pop(key, None)
+        flight.future.set_result(text)
+        return text
+
+
+_gateway: Optional[LLMGateway] = None
+_gateway_lock = threading.Lock()
+
+
+def get_llm_gateway() -> LLMGateway:
+    """The process-wide gateway, created on first use"""
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                _gateway = LLMGateway()
+                REGISTRY.gauge("llm_in_flight", "LLM generations running").set_function(
+                    lambda: _gateway.in_flight)
+                REGISTRY.gauge("llm_queue_depth", "LLM requests waiting for a slot").set_function(
+                    lambda: _gateway.queue_depth)
+                REGISTRY.gauge("llm_circuit_state", "LLM circuit: 0 closed, 1 half-open, 2 open").set_function(
+                    lambda: _gateway.breaker.state_code())
+    return _gateway
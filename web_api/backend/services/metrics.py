@@ -0,0 +1,369 @@
+"""
+Metrics Service
+===============
+In-process counters, gauges and latency histograms exposed in the
+Prometheus text format at /metrics.
+
+- `MetricsMiddleware` records request count, latency and in-flight
+  requests per route template (not per raw path, to bound cardinality)
+- `stage_timer('predict')` times one pipeline stage (data fetch, feature
+  engineering, scaler, predict, embedding, vector search, LLM generation,
+  ...) into `stage_duration_seconds{stage=...}`
+- `register_cache(...)` publishes hit/miss/size gauges for a service-owned
+  cache, read at scrape time from the cache's own counters
+
+Usage:
+    from services.metrics import stage_timer, REGISTRY
+
+    with stage_timer('data_fetch'):
+        df = fetch()
+
+    @stage_timer('llm_generation')
+    def call_llm(...): ...
+"""
+
+import bisect
+import functools
+import math
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Seconds; covers sub-millisecond model calls up to minute-long LLM generations
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if value == -math.inf:
+        return "-Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra is not None:
+        pairs.append(f'{extra[0]}="{_escape(extra[1])}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+    kind = "counter"
+
+    def __init__(self, name, help_text, labelnames=()):
+        super().__init__(name, help_text, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+
+class Gauge(_Metric):
+    """Value that goes up and down, set directly or read from a callback at scrape time"""
+    kind = "gauge"
+
+    def __init__(self, name, help_text, labelnames=()):
+        super().__init__(name, help_text, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._functions: Dict[Tuple[str, ...], Callable[[], float]] = {}
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def set_function(self, func: Callable[[], float], **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._functions[key] = func
+
+    def value(self, **labels) -> float:
+        key = self._key(labels)
+        if key in self._functions:
+            return float(self._functions[key]())
+        return self._values.get(key, 0.0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+            functions = dict(self._functions)
+        for key, func in functions.items():
+            try:
+                values[key] = float(func())
+            except Exception:
+                values[key] = math.nan
+        return [f"{self.name}{_labels(self.labelnames, key)} {_format_value(value)}"
+                for key, value in sorted(values.items())]
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket latency histogram"""
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [bucket counts..., +Inf count], sum
+        self._counts: Dict[Tuple[str, ...], List[int]] = {}
+        self._sums: Dict[Tuple[str, ...], float] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._counts.get(key)
+            if counts is None:
+                counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+                self._sums[key] = 0.0
+            counts[index] += 1
+            self._sums[key] += value
+
+    def count(self, **labels) -> int:
+        return sum(self._counts.get(self._key(labels), []))
+
+    def quantile(self, q: float, **labels) -> Optional[float]:
+        """Bucket-interpolated quantile (what histogram_quantile() would return)"""
+        counts = self._counts.get(self._key(labels))
+        if not counts or sum(counts) == 0:
+            return None
+        rank = q * sum(counts)
+        cumulative, lower = 0, 0.0
+        for upper, bucket_count in zip(self.buckets + (math.inf,), counts):
+            if cumulative + bucket_count >= rank and bucket_count:
+                if upper == math.inf:
+                    return lower
+                return lower + (upper - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+            lower = upper
+        return lower
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, list(counts), self._sums[key]) for key, counts in self._counts.items())
+        lines = []
+        for key, counts, total in items:
+            cumulative = 0
+            for upper, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, ('le', _format_value(upper)))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """Get-or-create registry of named metrics"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, help_text, labelnames, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help_text, labelnames, **kwargs)
+            elif not isinstance(metric, cls) or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"Metric '{name}' already registered with a different type or labels")
+            return metric
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, help_text, labelnames)
+
+    def gauge(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, help_text, labelnames)
+
+    def histogram(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, help_text, labelnames, buckets=buckets)
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.header())
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+STAGE_DURATION = REGISTRY.histogram(
+    "stage_duration_seconds", "Duration of pipeline stages", ["stage"])
+STAGE_ERRORS = REGISTRY.counter(
+    "stage_errors_total", "Pipeline stages that raised", ["stage"])
+HTTP_REQUESTS = REGISTRY.counter(
+    "http_requests_total", "HTTP requests by route and status", ["method", "route", "status"])
+HTTP_DURATION = REGISTRY.histogram(
+    "http_request_duration_seconds", "HTTP request latency (to the end of the response body)", ["method", "route"])
+HTTP_IN_PROGRESS = REGISTRY.gauge(
+    "http_requests_in_progress", "HTTP requests currently being served", ["method"])
+CACHE_HITS = REGISTRY.gauge("cache_hits", "Hits of a service-owned cache", ["cache"])
+CACHE_MISSES = REGISTRY.gauge("cache_misses", "Misses of a service-owned cache", ["cache"])
+CACHE_ENTRIES = REGISTRY.gauge("cache_entries", "Entries held by a service-owned cache", ["cache"])
+
+
+# ========================================
+# Stage timers
+# ========================================
+
+class stage_timer:
+    """
+    Time a pipeline stage, as a context manager or decorator
+
+    Failed stages are timed too and counted in stage_errors_total.
+    """
+
+    def __init__(self, stage: str):
+        self.stage = stage
+        self._started = []
+
+    def __enter__(self):
+        self._started.append(time.perf_counter())
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self._started.pop()
+        STAGE_DURATION.observe(elapsed, stage=self.stage)
+        if exc_type is not None:
+            STAGE_ERRORS.inc(stage=self.stage)
+        return False
+
+    def __call__(self, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage_timer(self.stage):
+                return func(*args, **kwargs)
+        return wrapper
+
+
+def register_cache(name: str, hits: Optional[Callable[[], float]] = None,
+                   misses: Optional[Callable[[], float]] = None,
+                   entries: Optional[Callable[[], float]] = None):
+    """
+    Publish gauges for a cache owned by a service
+
+    Args:
+        name: Cache label (e.g. 'price_cache')
+        hits / misses / entries: Zero-argument callables read at scrape time
+    """
+    if hits is not None:
+        CACHE_HITS.set_function(hits, cache=name)
+    if misses is not None:
+        CACHE_MISSES.set_function(misses, cache=name)
+    if entries is not None:
+        CACHE_ENTRIES.set_function(entries, cache=name)
+
+
+# ========================================
+# Request middleware
+# ========================================
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording request count, latency and in-flight requests
+
+    Pure ASGI (not BaseHTTPMiddleware) so streaming responses such as the
+    SSE price stream are passed through untouched; their latency is the
+    lifetime of the stream.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        HTTP_IN_PROGRESS.inc(method=method)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            HTTP_IN_PROGRESS.dec(method=method)
+            route = self._route_template(scope)
+            HTTP_REQUESTS.inc(method=method, route=route, status=str(status["code"]))
+            HTTP_DURATION.observe(elapsed, method=method, route=route)
+
+    @staticmethod
+    def _route_template(scope) -> str:
+        route = scope.get("route")
+        if route is not None and hasattr(route, "path"):
+            template = route.path
+            if ":path}" in template:
+                return template
+            # Routes of an included router may carry only their own path;
+            # the leading segments of the request path are the static prefix
+            segments = scope["path"].split("/")
+            prefix = "/".join(segments[:len(segments) - template.count("/")])
+            return prefix + template
+        # Older Starlette does not expose the matched route in the scope
+        app = scope.get("app")
+        if app is not None:
+            from starlette.routing import Match
+            for candidate in getattr(app, "routes", []):
+                match, _ = candidate.matches(scope)
+                if match == Match.FULL and hasattr(candidate, "path"):
+                    return candidate.path
+        return "unmatched"
@@ -0,0 +1,105 @@
+"""
+News Near-Duplicate Collapsing
+==============================
+Feeds carry the same story from many outlets with small edits (a changed
+headline, a trimmed paragraph), which exact body hashing does not catch.
+Before prompting, articles are clustered by MinHash similarity of their
+word 3-shingles (title + body) and each cluster is reduced to its newest
+article, annotated with how many outlets reported it.
+
+MinHash: each article becomes NEWS_MINHASH_PERMUTATIONS minimum hash
+values, one per random hash function; the fraction of positions on which
+two signatures agree estimates the Jaccard similarity of their shingle
+sets. An article joins the first cluster holding an article it matches at
+NEWS_DUPLICATE_THRESHOLD or more, otherwise it starts a new cluster. Word
+3-shingles of unrelated stories barely overlap, so a low threshold still
+separates them while catching trimmed rewrites of the same story.
+
+Settings:
+    NEWS_DUPLICATE_THRESHOLD=0.3      estimated Jaccard similarity that makes a near duplicate
+    NEWS_MINHASH_PERMUTATIONS=64      hash functions per signature
+
+Usage:
+    clusters = collapse_near_duplicates(articles)   # newest first in, newest first out
+    clusters[0]['cluster_size'], clusters[0]['sources']
+"""
+
+import hashlib
+import os
+import re
+from typing import Dict, List
+
+import numpy as np
+
+from services.metrics import REGISTRY
+
+NEWS_DUPLICATE_THRESHOLD = float(os.getenv("NEWS_DUPLICATE_THRESHOLD", "0.3"))
+NEWS_MINHASH_PERMUTATIONS = int(os.getenv("NEWS_MINHASH_PERMUTATIONS", "64"))
+
+SHINGLE_SIZE = 3
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_TOKEN = re.compile(r"\w+")
+
+DUPLICATES_COLLAPSED = REGISTRY.counter(
+    "news_duplicates_collapsed_total", "Articles folded into an earlier report of the same story before prompting")
+
+# Fixed seed: signatures must be comparable across calls and processes
+_rng = np.random.RandomState(1)
+_PERM_A = _rng.randint(1, 1 << 61, size=NEWS_MINHASH_PERMUTATIONS, dtype=np.int64).astype(np.uint64)
+_PERM_B = _rng.randint(0, 1 << 61, size=NEWS_MINHASH_PERMUTATIONS, dtype=np.int64).astype(np.uint64)
+
+
+def _shingles(text: str) -> set:
+    tokens = _TOKEN.findall(text.lower())
+    if len(tokens) < SHINGLE_SIZE:
+        return {" ".join(tokens)} if tokens else set()
+    return {" ".join(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1)}
+
+
+def minhash_signature(text: str) -> np.ndarray:
+    """MinHash signature (NEWS_MINHASH_PERMUTATIONS uint64 values) of a text's word shingles"""
+    shingles = _shingles(text)
+    if not shingles:
+        return np.full(NEWS_MINHASH_PERMUTATIONS, _MAX_HASH, dtype=np.uint64)
+    hashes = np.array([int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little")
+                       for s in shingles], dtype=np.uint64)
+    # (a*x + b) mod p, truncated to 32 bits, for every (permutation, shingle) pair
+    with np.errstate(over="ignore"):
+        permuted = (np.outer(_PERM_A, hashes) + _PERM_B[:, None]) % _MERSENNE_PRIME & _MAX_HASH
+    return permuted.min(axis=1)
+
+
+def similarity(signature_a: np.ndarray, signature_b: np.ndarray) -> float:
+    """Estimated Jaccard similarity of two signatures"""
+    return float(np.mean(signature_a == signature_b))
+
+
+def collapse_near_duplicates(articles: List[Dict], threshold: float = NEWS_DUPLICATE_THRESHOLD) -> List[Dict]:
+    """
+    Cluster near-duplicate articles and keep one representative per cluster
+
+    Args:
+        articles: Dicts with title, body and source, newest first
+        threshold: Estimated Jaccard similarity at which two articles are the same story
+
+    Returns:
+        The first (newest) article of each cluster, in input order, with
+        'cluster_size' (articles in the cluster) and 'sources' (distinct outlets)
+    """
+    representatives, members = [], []
+    for article in articles:
+        signature = minhash_signature(f"{article.get('title', '')} {article.get('body', '')}")
+        source = article.get('source')
+        for cluster, signatures in zip(representatives, members):
+            if any(similarity(signature, other) >= threshold for other in signatures):
+                cluster['cluster_size'] += 1
+                if source and source not in cluster['sources']:
+                    cluster['sources'].append(source)
+                signatures.append(signature)
+                break
+        else:
+            representatives.append({**article, 'cluster_size': 1, 'sources': [source] if source else []})
+            members.append([signature])
+    DUPLICATES_COLLAPSED.inc(len(articles) - len(representatives))
+    return representatives
@@ -0,0 +1,187 @@
+"""
+News Store
+==========
+Persistent, incremental store of news articles per coin, so the sentiment
+service only ingests what is new and keeps a history to backtest against.
+
+One SQLite file (WAL mode, safe across uvicorn workers):
+
+    articles   (coin, article_id) -> published_on, title, source, url, body_hash
+               indexed on (coin, published_on)
+    bodies     body_hash -> body, stored once however many articles
+               (or coins) carry the same text
+
+Each coin's watermark is the newest `published_on` it holds. A fetch keeps
+only articles at or above the watermark (the (coin, article_id) key drops
+the ones already stored, so articles sharing the watermark's second still
+get in), and a repeat fetch writes a small delta (usually nothing) instead
+of the whole feed. Prompts are built from
+`latest()`, which returns the newest articles with one article per body.
+
+Settings:
+    NEWS_STORE_PATH=backend/state/news.db    database file
+
+Usage:
+    store = get_news_store()
+    added = store.add("bitcoin", articles, watermark=store.watermark("bitcoin"))
+    articles = store.latest("bitcoin", limit=10)
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from services.metrics import REGISTRY
+
+NEWS_STORE_PATH = Path(os.getenv("NEWS_STORE_PATH", Path(__file__).parent.parent / "state" / "news.db"))
+
+ARTICLES_INGESTED = REGISTRY.counter("news_articles_ingested_total", "Articles added to the news store", ["coin"])
+ARTICLES_SKIPPED = REGISTRY.counter(
+    "news_articles_skipped_total", "Fetched articles already in the store (below the watermark or known ids)", ["coin"])
+
+
+def body_hash(body: str) -> str:
+    """Content key of an article body (whitespace and case insensitive)"""
+    normalized = " ".join(body.split()).lower()
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+class NewsStore:
+    """SQLite article store with per-coin published_on watermarks"""
+
+    def __init__(self, path: Path = NEWS_STORE_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        with self._transaction() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS bodies (body_hash TEXT PRIMARY KEY, body TEXT)")
+            conn.execute("CREATE TABLE IF NOT EXISTS articles ("
+                         "coin TEXT, article_id TEXT, published_on INTEGER, title TEXT, source TEXT, url TEXT, "
+                         "body_hash TEXT REFERENCES bodies (body_hash), fetched_at REAL, "
+                         "PRIMARY KEY (coin, article_id))")
+            conn.execute("CREATE INDEX IF NOT EXISTS articles_coin_published ON articles (coin, published_on)")
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit mode; writes go through _transaction's BEGIN IMMEDIATE
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        """Write transaction holding the database write lock from the start"""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def watermark(self, coin: str) -> int:
+        """Newest published_on stored for a coin (0 when it has no articles)"""
+        row = self._connection().execute(
+            "SELECT MAX(published_on) FROM articles WHERE coin = ?", (coin,)).fetchone()
+        return row[0] or 0
+
+    def add(self, coin: str, articles: Iterable[Dict], watermark: Optional[int] = None) -> int:
+        """
+        Store the articles newer than the coin's watermark
+
+        Args:
+            coin: Store key, e.g. 'bitcoin'
+            articles: Feed items with id, published_on, title, body, source, url
+            watermark: Skip articles published before this (default: the stored watermark)
+
+        Returns:
+            Number of articles added
+        """
+        if watermark is None:
+            watermark = self.watermark(coin)
+        added = skipped = 0
+        now = time.time()
+        with self._transaction() as conn:
+            for article in articles:
+                published = int(article.get("published_on") or 0)
+                if published < watermark:  # Same-second articles are new unless their id is stored
+                    skipped += 1
+                    continue
+                body = article.get("body") or ""
+                digest = body_hash(body)
+                conn.execute("INSERT OR IGNORE INTO bodies (body_hash, body) VALUES (?, ?)", (digest, body))
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO articles "
+                    "(coin, article_id, published_on, title, source, url, body_hash, fetched_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (coin, str(article.get("id") or article.get("url") or digest), published,
+                     article.get("title", ""), article.get("source", ""), article.get("url", ""), digest, now))
+                if cursor.rowcount:
+                    added += 1
+                else:
+                    skipped += 1
+        ARTICLES_INGESTED.inc(added, coin=coin)
+        ARTICLES_SKIPPED.inc(skipped, coin=coin)
+        return added
+
+    def latest(self, coin: str, limit: int = 10) -> List[Dict]:
+        """Newest articles of a coin, one per distinct body (prompt-ready dicts)"""
+        return self.between(coin, limit=limit, newest_first=True)
+
+    def between(self, coin: str, since: Optional[int] = None, until: Optional[int] = None,
+                limit: Optional[int] = None, newest_first: bool = False) -> List[Dict]:
+        """
+        Stored articles of a coin in a published_on window, for backtesting
+
+        Args:
+            coin: Store key
+            since: Earliest published_on (inclusive)
+            until: Latest published_on (exclusive)
+            limit: Maximum number of articles
+            newest_first: Order newest to oldest instead of oldest to newest
+
+        Returns:
+            Dicts with id, title, body, source, url and published (unix seconds);
+            of articles sharing a body only the newest is returned
+        """
+        query = ("SELECT a.article_id, a.title, b.body, a.source, a.url, MAX(a.published_on) "
+                 "FROM articles a JOIN bodies b ON b.body_hash = a.body_hash "
+                 "WHERE a.coin = ? AND a.published_on >= ? AND a.published_on < ? "
+                 f"GROUP BY a.body_hash ORDER BY MAX(a.published_on) {'DESC' if newest_first else 'ASC'}")
+        params = [coin, since or 0, until if until is not None else 2 ** 62]
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        rows = self._connection().execute(query, params).fetchall()
+        return [{"id": article_id, "title": title, "body": body, "source": source, "url": url,
+                 "published": published}
+                for article_id, title, body, source, url, published in rows]
+
+    def stats(self) -> Dict[str, Dict]:
+        """Article count and watermark per coin"""
+        rows = self._connection().execute(
+            "SELECT coin, COUNT(*), MAX(published_on) FROM articles GROUP BY coin").fetchall()
+        return {coin: {"articles": count, "watermark": latest} for coin, count, latest in rows}
+
+
+_store: Optional[NewsStore] = None
+_store_lock = threading.Lock()
+
+
+def get_news_store() -> NewsStore:
+    """The process-wide store, created on first use"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = NewsStore()
+    return _store
@@ -0,0 +1,214 @@
+"""
+Live Price Streaming Service
+=============================
+One background poller feeds a shared in-memory last-price cache, and every
+connected dashboard is pushed updates from that cache. N clients cost one
+upstream poll per interval instead of N.
+
+The upstream is any zero-argument callable returning {symbol: quote}, so
+`SimulatedTickSource` (or `FakeMarketDataSource`) can drive the stream
+without network access.
+"""
+
+import asyncio
+import json
+import random
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+
+class PriceCache:
+    """Thread-safe last-price cache with async fan-out to subscribers"""
+
+    def __init__(self):
+        self._prices: Dict[str, Dict[str, Any]] = {}
+        self._updated_at: Optional[float] = None
+        self._version = 0
+        self._lock = threading.Lock()
+        self._subscribers: List[asyncio.Queue] = []
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    @property
+    def updated_at(self) -> Optional[float]:
+        return self._updated_at
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Current prices plus freshness metadata"""
+        with self._lock:
+            if self._prices:
+                self.hits += 1
+            else:
+                self.misses += 1
+            return {
+                "prices": {symbol: dict(quote) for symbol, quote in self._prices.items()},
+                "version": self._version,
+                "updated_at": datetime.fromtimestamp(self._updated_at).isoformat() if self._updated_at else None
+            }
+
+    def snapshot_symbols(self) -> List[str]:
+        """Symbols currently cached (does not count as a hit or miss)"""
+        with self._lock:
+            return list(self._prices)
+
+    def update(self, prices: Dict[str, Dict[str, Any]]) -> bool:
+        """
+        Store fresh quotes and notify subscribers
+
+        Failed quotes (carrying an "error" key) never overwrite a good
+        last price. Returns True if anything changed.
+        """
+        with self._lock:
+            changed = False
+            for symbol, quote in prices.items():
+                if "error" in quote and "error" not in self._prices.get(symbol, {"error": True}):
+                    continue
+                if self._prices.get(symbol) != quote:
+                    self._prices[symbol] = dict(quote)
+                    changed = True
+            self._updated_at = time.time()
+            if changed:
+                self._version += 1
+            subscribers = list(self._subscribers)
+
+        if changed:
+            for queue in subscribers:
+                self._offer(queue)
+        return changed
+
+    @staticmethod
+    def _offer(queue: asyncio.Queue):
+        """Wake a subscriber; a pending wake-up already covers newer data"""
+        try:
+            queue.put_nowait(True)
+        except asyncio.QueueFull:
+            pass
+
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=1)
+        with self._lock:
+            self._subscribers.append(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        with self._lock:
+            if queue in self._subscribers:
+                self._subscribers.remove(queue)
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+
+class PricePoller:
+    """Background task polling the upstream once per interval for everyone"""
+
+    def __init__(self, fetch: Callable[[], Dict[str, Dict[str, Any]]], cache: PriceCache,
+                 interval: float = 10.0):
+        """
+        Args:
+            fetch: Zero-argument callable returning {symbol: quote}
+            cache: Shared PriceCache to publish into
+            interval: Seconds between upstream polls
+        """
+        self.fetch = fetch
+        self.cache = cache
+        self.interval = interval
+        self.polls = 0
+        self.errors = 0
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def poll_once(self):
+        """Fetch from upstream (off the event loop) and publish"""
+        self.polls += 1
+        try:
+            prices = await asyncio.to_thread(self.fetch)
+            self.cache.update(prices)
+        except Exception as e:
+            self.errors += 1
+            print(f"⚠ Price poll failed: {e}")
+
+    async def _run(self):
+        while True:
+            started = time.monotonic()
+            await self.poll_once()
+            await asyncio.sleep(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def start(self):
+        """Start polling on the running event loop (idempotent)"""
+        if not self.running:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+async def sse_price_events(cache: PriceCache, heartbeat: float = 15.0, is_disconnected=None):
+    """
+    Server-Sent Events generator for one client
+
+    Sends the current snapshot immediately, then one event per cache
+    update. A comment line is sent every `heartbeat` seconds so proxies
+    keep the connection open.
+    """
+    queue = cache.subscribe()
+    try:
+        yield f"event: prices\ndata: {json.dumps(cache.snapshot())}\n\n"
+        while True:
+            try:
+                await asyncio.wait_for(queue.get(), timeout=heartbeat)
+            except asyncio.TimeoutError:
+                if is_disconnected is not None and await is_disconnected():
+                    break
+                yield ": keep-alive\n\n"
+                continue
+            yield f"event: prices\ndata: {json.dumps(cache.snapshot())}\n\n"
+    finally:
+        cache.unsubscribe(queue)
+
+
+class SimulatedTickSource:
+    """
+    Local random-walk quote source
+
+    Implements the `quote(ticker)` half of the market data source interface,
+    so it can back a MarketDataFetcher or be polled directly.
+    """
+
+    def __init__(self, base_prices: Optional[Dict[str, float]] = None, volatility: float = 0.001,
+                 seed: Optional[int] = None):
+        self.prices = dict(base_prices or {'BTC-USD': 60000.0, 'ETH-USD': 3000.0})
+        self.previous_close = dict(self.prices)
+        self.volatility = volatility
+        self.quote_calls = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def quote(self, ticker: str) -> Dict[str, float]:
+        with self._lock:
+            self.quote_calls += 1
+            price = self.prices.setdefault(ticker, 100.0)
+            price *= 1 + self._rng.gauss(0, self.volatility)
+            self.prices[ticker] = price
+            return {
+                "current_price": price,
+                "previous_close": self.previous_close.setdefault(ticker, price),
+                "volume": 0,
+                "market_cap": 0
+            }
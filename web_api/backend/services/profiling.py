@@ -0,0 +1,163 @@
+"""
+Request Profiling
+=================
+Opt-in, per-request sampling profiler that writes flamegraph-ready
+collapsed stacks ("root;caller;callee <samples>", the format read by
+flamegraph.pl, speedscope and inferno).
+
+Enabled with the PROFILING environment variable:
+    PROFILING=off       default, requests pass straight through
+    PROFILING=header    profile requests sent with `X-Profile: 1`
+    PROFILING=all       profile every request, keep those slower than PROFILE_SLOW_MS
+
+Other settings:
+    PROFILE_SLOW_MS=500         threshold for PROFILING=all (header requests are always kept)
+    PROFILE_INTERVAL_MS=1       sampling interval
+    PROFILE_DIR=profiles        output directory (relative to the backend)
+
+Each kept profile is written as `<id>.collapsed` plus `<id>.json` (method,
+route, status, duration, samples), and the response carries
+`X-Profile-Id: <id>`.
+
+One sampler thread serves every profiled request. It samples the thread
+the request runs on (the event loop thread for `async def` endpoints), so
+time spent awaiting a worker thread shows up as the awaiting frame, and
+concurrent requests on the loop share samples.
+"""
+
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional
+
+PROFILING_MODE = os.getenv("PROFILING", "off").lower()
+PROFILE_SLOW_MS = float(os.getenv("PROFILE_SLOW_MS", "500"))
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL_MS", "1")) / 1000
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", Path(__file__).parent.parent / "profiles"))
+
+
+def collapse_stack(frame) -> str:
+    """Root-first `function (file:line)` frames joined by ';'"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class _Session:
+    def __init__(self, thread_id: int):
+        self.thread_id = thread_id
+        self.stacks: Counter = Counter()
+
+
+class StackSampler:
+    """Shared sampling thread; runs only while at least one session is active"""
+
+    def __init__(self, interval: float = PROFILE_INTERVAL):
+        self.interval = interval
+        self._sessions: Dict[int, _Session] = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, thread_id: Optional[int] = None) -> int:
+        session_id = next(self._ids)
+        with self._lock:
+            self._sessions[session_id] = _Session(thread_id or threading.get_ident())
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+                self._thread.start()
+        return session_id
+
+    def stop(self, session_id: int) -> Counter:
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+        return session.stacks if session is not None else Counter()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._sessions:
+                    self._thread = None
+                    return
+                sessions = list(self._sessions.values())
+            frames = sys._current_frames()
+            for session in sessions:
+                frame = frames.get(session.thread_id)
+                if frame is not None:
+                    session.stacks[collapse_stack(frame)] += 1
+            del frames
+            time.sleep(self.interval)
+
+
+def write_profile(profile_id: str, stacks: Counter, meta: Dict, directory: Path = PROFILE_DIR) -> Path:
+    """Write collapsed stacks and their metadata"""
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"{profile_id}.collapsed"
+    with open(path, "w", encoding="utf-8") as f:
+        for stack, count in stacks.most_common():
+            f.write(f"{stack} {count}\n")
+    with open(directory / f"{profile_id}.json", "w", encoding="utf-8") as f:
+        json.dump({**meta, "samples": sum(stacks.values()), "collapsed": path.name}, f, indent=2)
+    return path
+
+
+class ProfilingMiddleware:
+    """ASGI middleware profiling requests according to PROFILING"""
+
+    def __init__(self, app, mode: str = PROFILING_MODE, slow_ms: float = PROFILE_SLOW_MS,
+                 directory: Path = PROFILE_DIR, sampler: Optional[StackSampler] = None):
+        self.app = app
+        self.mode = mode
+        self.slow_ms = slow_ms
+        self.directory = Path(directory)
+        self.sampler = sampler or StackSampler()
+        self._counter = itertools.count()
+
+    def _requested(self, scope) -> bool:
+        if self.mode == "all":
+            return True
+        if self.mode == "header":
+            return any(name == b"x-profile" and value not in (b"", b"0")
+                       for name, value in scope.get("headers", []))
+        return False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._requested(scope):
+            await self.app(scope, receive, send)
+            return
+
+        explicit = self.mode == "header"
+        profile_id = f"{datetime.now():%Y%m%d-%H%M%S}-{os.getpid()}-{next(self._counter)}"
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                message = dict(message)
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", profile_id.encode())]
+            await send(message)
+
+        session = self.sampler.start()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            stacks = self.sampler.stop(session)
+            if explicit or elapsed_ms >= self.slow_ms:
+                write_profile(profile_id, stacks, {
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "status": status["code"],
+                    "duration_ms": round(elapsed_ms, 2),
+                    "interval_ms": self.sampler.interval * 1000
+                }, self.directory)
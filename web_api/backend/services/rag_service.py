@@ -9,13 +9,19 @@ from chromadb.utils import embedding_functions
 from pathlib import Path
 import time
 from typing import Dict, List
-import requests
 import json
 
+from services.config import OLLAMA_GENERATE_URL, OLLAMA_MODEL
+from services.metrics import stage_timer, register_cache
+from services.llm_gateway import get_llm_gateway, PRIORITY_INTERACTIVE
+from services.shared_state import get_shared_state
+
+CHAT_HISTORY_MAX = 200  # Oldest exchanges are dropped beyond this
+
 class RAGService:
     def __init__(self, crypto_service=None):
         """Initialize RAG service with ChromaDB and Ollama"""
-        self.chat_history = []
+        self.shared_state = get_shared_state()  # Chat history shared by every worker
         self.crypto_service = crypto_service  # Reference to crypto service for live predictions
         self.db_path = Path(__file__).parent.parent.parent.parent / "rag" / "chroma"
         
@@ -45,9 +51,10 @@ class RAGService:
                 print("✓ Created new collection")
             
             # Ollama configuration
-            self.ollama_url = "http://localhost:11434/api/generate"
-            self.model = "llama3.2"
+            self.ollama_url = OLLAMA_GENERATE_URL
+            self.model = OLLAMA_MODEL
             
+            register_cache('rag_chat_history', entries=lambda: self.shared_state.list_len('rag_chat_history'))
             print("✓ RAG service initialized successfully")
             
         except Exception as e:
@@ -57,10 +64,13 @@ class RAGService:
     def search_documents(self, query: str, n_results: int = 3) -> List[Dict]:
         """Search for relevant documents in ChromaDB"""
         try:
-            results = self.collection.query(
-                query_texts=[query],
-                n_results=n_results
-            )
+            with stage_timer('embedding'):
+                query_embeddings = self.embedding_function([query])
+            with stage_timer('vector_search'):
+                results = self.collection.query(
+                    query_embeddings=query_embeddings,
+                    n_results=n_results
+                )
             
             documents = []
             if results['documents'] and len(results['documents']) > 0:
@@ -105,6 +115,32 @@ class RAGService:
             print(f"Error getting live predictions: {e}")
             return ""
     
+    def index_live_predictions(self, predictions: Dict) -> int:
+        """
+        Upsert one document per coin describing the latest model prediction
+        
+        Args:
+            predictions: CryptoService.get_current_predictions() output
+            
+        Returns:
+            Number of documents written
+        """
+        ids, documents, metadatas = [], [], []
+        for symbol, pred in predictions.items():
+            ids.append(f"live-prediction-{symbol}")
+            documents.append(
+                f"Latest {symbol} model prediction ({pred['timestamp']}): "
+                f"price ${pred['current_price']:,.2f}, predicted next close ${pred['next_day_prediction']:,.2f} "
+                f"({pred['predicted_change_percent']:+.2f}%), trend {pred['trend']}, signal {pred['signal']}, "
+                f"confidence {pred['confidence']:.0%}. {pred['recommendation']}"
+            )
+            metadatas.append({"source": "live_predictions", "symbol": symbol, "date": pred['timestamp']})
+        
+        with stage_timer('embedding'):
+            embeddings = self.embedding_function(documents)
+        self.collection.upsert(ids=ids, documents=documents, embeddings=embeddings, metadatas=metadatas)
+        return len(ids)
+    
     def generate_answer(self, query: str, context: str) -> str:
         """Generate answer using Ollama with live prediction data"""
         try:
@@ -150,30 +186,31 @@ REMEMBER: Present this as "what the model predicts" and "how traders typically i
 
 Your educational analysis:"""
 
-            # Call Ollama API
-            response = requests.post(
-                self.ollama_url,
-                json={
-                    "model": self.model,
-                    "prompt": prompt,
-                    "stream": False,
-                    "options": {
-                        "temperature": 0.7,
-                        "num_predict": 500
-                    }
+            # Call Ollama through the shared gateway, ahead of batch sentiment work
+            answer = get_llm_gateway().generate(
+                prompt,
+                options={
+                    "temperature": 0.7,
+                    "num_predict": 500
                 },
-                timeout=60
+                caller="rag_chat",
+                priority=PRIORITY_INTERACTIVE,
+                model=self.model
             )
-            
-            if response.status_code == 200:
-                result = response.json()
-                return result.get('response', '').strip()
-            else:
-                return f"Error: Ollama returned status {response.status_code}"
+            return answer.strip()
                 
         except Exception as e:
             print(f"Error generating answer: {e}")
-            return f"Error generating answer: {str(e)}"
+            raise
+    
+    def _sources_only_answer(self, relevant_docs: List[Dict]) -> str:
+        """Degraded answer while the LLM is unavailable: the retrieved passages, best first"""
+        excerpts = "\n\n".join(
+            f"{i+1}. {doc['content'][:400].strip()}"
+            for i, doc in enumerate(relevant_docs)
+        )
+        return ("The AI assistant is temporarily unavailable, so no answer could be generated. "
+                "The most relevant passages from the knowledge base are:\n\n" + excerpts)
     
     def ask_question(self, question: str) -> Dict:
         """
@@ -212,9 +249,14 @@ Your educational analysis:"""
                 for i, doc in enumerate(relevant_docs)
             ])
             
-            # Generate answer
+            # Generate answer (retrieved sources only if the LLM is down)
             gen_start = time.time()
-            answer = self.generate_answer(question, context)
+            try:
+                answer = self.generate_answer(question, context)
+                degraded = False
+            except Exception:
+                answer = self._sources_only_answer(relevant_docs)
+                degraded = True
             gen_time = time.time() - gen_start
             
             # Calculate confidence based on relevance scores
@@ -232,11 +274,12 @@ Your educational analysis:"""
             ]
             
             # Add to chat history
-            self.chat_history.append({
-                "question": question,
-                "answer": answer,
-                "timestamp": time.time()
-            })
+            if not degraded:
+                self.shared_state.list_append('rag_chat_history', {
+                    "question": question,
+                    "answer": answer,
+                    "timestamp": time.time()
+                }, max_len=CHAT_HISTORY_MAX)
             
             total_time = time.time() - start_time
             
@@ -244,6 +287,7 @@ Your educational analysis:"""
                 "answer": answer,
                 "sources": sources,
                 "confidence": round(confidence, 2),
+                "degraded": degraded,
                 "metrics": {
                     "search_time": round(search_time, 3),
                     "generation_time": round(gen_time, 3),
@@ -268,7 +312,7 @@ Your educational analysis:"""
     
     def clear_history(self):
         """Clear chat history"""
-        self.chat_history = []
+        self.shared_state.list_clear('rag_chat_history')
         return {"message": "Chat history cleared"}
     
     def get_stats(self) -> Dict:
@@ -279,7 +323,7 @@ Your educational analysis:"""
             return {
                 "status": "operational",
                 "documents_count": doc_count,
-                "chat_history_length": len(self.chat_history),
+                "chat_history_length": self.shared_state.list_len('rag_chat_history'),
                 "model": self.model,
                 "collection_name": self.collection.name
             }
@@ -0,0 +1,191 @@
+"""
+Service Registry
+================
+Process-wide, lazily built service singletons.
+
+Routers call `get_crypto_service()` and friends instead of building
+services at import time, so importing `main` only loads FastAPI and the
+routers themselves. Heavy dependencies (pandas, numpy, xgboost, chromadb,
+the ONNX embedding model, the 50k-row clients CSV) are imported the first
+time a service is built: on the first request that needs it, or earlier
+by the warm-up task started from the app lifespan.
+
+STARTUP_MODE selects when that happens:
+    STARTUP_MODE=background   default, serve immediately and warm up in a worker thread
+    STARTUP_MODE=eager        build every service before accepting traffic
+    STARTUP_MODE=lazy         build each service on first use only
+
+WARMUP_SERVICES (comma-separated, default "crypto,sentiment,rag,clients")
+lists the services warmed up and awaited by readiness.
+
+Every getter returns the same instance for the life of the process; in
+particular the RAG assistant shares the crypto service instead of
+loading the models a second time.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+STARTUP_MODE = os.getenv("STARTUP_MODE", "background").lower()
+WARMUP_SERVICES = [name.strip() for name in
+                   os.getenv("WARMUP_SERVICES", "crypto,sentiment,rag,clients").split(",") if name.strip()]
+
+
+class LazyService:
+    """Thread-safe, build-once holder for one service"""
+
+    def __init__(self, name: str, factory: Callable[[], object]):
+        self.name = name
+        self.factory = factory
+        self.state = "idle"  # idle -> loading -> ready | failed
+        self.error: Optional[str] = None
+        self.load_seconds: Optional[float] = None
+        self._instance = None
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self.state == "ready"
+
+    def get(self):
+        """Return the service, building it on first call (failed builds are retried)"""
+        if self._instance is not None:
+            return self._instance
+        with self._lock:
+            if self._instance is None:
+                self.state = "loading"
+                started = time.perf_counter()
+                try:
+                    instance = self.factory()
+                except Exception as e:
+                    self.state = "failed"
+                    self.error = str(e)
+                    raise
+                self.load_seconds = round(time.perf_counter() - started, 3)
+                self.error = None
+                self._instance = instance
+                self.state = "ready"
+        return self._instance
+
+    def peek(self):
+        """The service if it is already built, else None (never triggers a build)"""
+        return self._instance
+
+    def status(self) -> Dict:
+        status = {"state": self.state}
+        if self.load_seconds is not None:
+            status["load_seconds"] = self.load_seconds
+        if self.error:
+            status["error"] = self.error
+        return status
+
+
+# ============================================================================
+# FACTORIES (imports are deferred to build time on purpose)
+# ============================================================================
+
+def _build_crypto():
+    from services.crypto_service import CryptoService
+    return CryptoService()
+
+
+def _build_rag():
+    from services.rag_service import RAGService
+    return RAGService(crypto_service=get_crypto_service())
+
+
+def _build_sentiment():
+    from services.sentiment_service import SentimentService
+    return SentimentService()
+
+
+def _build_clients():
+    from services.client_service import ClientService
+    return ClientService()
+
+
+SERVICES: Dict[str, LazyService] = {
+    "crypto": LazyService("crypto", _build_crypto),
+    "sentiment": LazyService("sentiment", _build_sentiment),
+    "rag": LazyService("rag", _build_rag),
+    "clients": LazyService("clients", _build_clients),
+}
+
+
+def get_crypto_service():
+    return SERVICES["crypto"].get()
+
+
+def get_rag_service():
+    return SERVICES["rag"].get()
+
+
+def get_sentiment_service():
+    return SERVICES["sentiment"].get()
+
+
+def get_client_service():
+    return SERVICES["clients"].get()
+
+
+async def load_service(name: str):
+    """
+    Service for an async handler, without blocking the event loop
+
+    A service that is still loading (warm-up) or not built yet (lazy mode)
+    is awaited or built in a worker thread, so /health, /ready and the
+    price stream keep answering meanwhile.
+    """
+    service = SERVICES[name]
+    instance = service.peek()
+    if instance is not None:
+        return instance
+    return await asyncio.to_thread(service.get)
+
+
+# ============================================================================
+# WARM-UP AND READINESS
+# ============================================================================
+
+_warmup = {"started": None, "finished": None}
+
+
+async def warm_up(names=None):
+    """
+    Build services one after another in a worker thread
+
+    Failures are recorded on the service (and reported by readiness) but do
+    not stop the remaining services from loading.
+    """
+    _warmup["started"] = time.time()
+    for name in names or WARMUP_SERVICES:
+        service = SERVICES.get(name)
+        if service is None:
+            print(f"⚠ Unknown service in WARMUP_SERVICES: {name}")
+            continue
+        try:
+            await asyncio.to_thread(service.get)
+            print(f"✓ {name} service ready ({service.load_seconds}s)")
+        except Exception as e:
+            print(f"⚠ {name} service failed to load: {e}")
+    _warmup["finished"] = time.time()
+
+
+def readiness() -> Dict:
+    """
+    Readiness report: ready once every warm-up service has loaded
+
+    In lazy mode nothing is preloaded, so the process is ready as soon as
+    it is alive and each service reports its own state.
+    """
+    required = [] if STARTUP_MODE == "lazy" else [n for n in WARMUP_SERVICES if n in SERVICES]
+    return {
+        "ready": all(SERVICES[name].ready for name in required),
+        "startup_mode": STARTUP_MODE,
+        "warmup_seconds": (round(_warmup["finished"] - _warmup["started"], 3)
+                           if _warmup["finished"] and _warmup["started"] else None),
+        "services": {name: service.status() for name, service in SERVICES.items()}
+    }
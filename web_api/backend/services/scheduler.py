@@ -0,0 +1,239 @@
+"""
+Job Scheduler
+=============
+In-process replacement for the Windows Task Scheduler + .bat runners.
+Jobs run inside the API, so they reuse the already-loaded models, candle
+store and caches instead of starting a fresh interpreter.
+
+Each job fires on a fixed grid aligned to the UTC epoch (`period` seconds,
+shifted by `offset`), e.g. 5 minutes after every daily candle close:
+
+- jitter: each run is delayed by a random 0..`jitter` seconds, so several
+  API instances do not hit the upstreams at the same instant
+- catch-up: the last completed slot is stored in shared state; if the API
+  was down (or the machine asleep) when a slot passed, the job runs once
+  as soon as the scheduler starts, not once per missed slot
+- one runner: with SHARED_STATE=sqlite only the worker holding the
+  'scheduler' lease runs jobs; the lease is renewed while a job runs, so a
+  long job does not let another worker take over and repeat its slot
+- metrics: scheduler_job_duration_seconds{job}, scheduler_job_runs_total{job,status}
+  and scheduler_job_last_success_timestamp{job}
+
+Settings:
+    SCHEDULER=on|off            default on
+    SCHEDULER_JOBS=a,b          subset of jobs to run (default: all)
+    SCHEDULER_JITTER=60         max jitter in seconds
+
+Jobs:
+    candle_close_refresh   daily, 00:05 UTC   new predictions into predictions_history.csv
+    sentiment_refresh      hourly             fresh news + sentiment analysis per coin
+    rag_reindex            daily, 00:15 UTC   live prediction snapshot into the RAG collection
+"""
+
+import asyncio
+import os
+import random
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+from services.metrics import REGISTRY
+from services.shared_state import get_shared_state
+
+SCHEDULER_ENABLED = os.getenv("SCHEDULER", "on").lower() not in ("0", "off", "false", "no")
+SCHEDULER_JOBS = os.getenv("SCHEDULER_JOBS", "")
+SCHEDULER_JITTER = float(os.getenv("SCHEDULER_JITTER", "60"))
+
+JOB_DURATION = REGISTRY.histogram("scheduler_job_duration_seconds", "Scheduled job run time", ["job"])
+JOB_RUNS = REGISTRY.counter("scheduler_job_runs_total", "Scheduled job runs", ["job", "status"])
+JOB_LAST_SUCCESS = REGISTRY.gauge("scheduler_job_last_success_timestamp",
+                                  "Unix time of the last successful run", ["job"])
+
+
+class Job:
+    """A function run on an epoch-aligned grid"""
+
+    def __init__(self, name: str, func: Callable[[], object], period: float, offset: float = 0.0,
+                 jitter: float = SCHEDULER_JITTER, catch_up: bool = True):
+        """
+        Args:
+            name: Job name (metrics label and shared-state key)
+            func: Zero-argument callable, run in a worker thread
+            period: Seconds between slots
+            offset: Seconds after each period boundary (UTC epoch) the slot starts
+            jitter: Max random delay added to each run
+            catch_up: Run once at startup if a slot was missed while the API was down
+        """
+        self.name = name
+        self.func = func
+        self.period = period
+        self.offset = offset
+        self.jitter = jitter
+        self.catch_up = catch_up
+        self.last_result = None
+        self.last_error: Optional[str] = None
+
+    def slot_before(self, now: float) -> float:
+        """Start of the most recent slot at or before `now`"""
+        return (now - self.offset) // self.period * self.period + self.offset
+
+    def next_slot(self, now: float) -> float:
+        return self.slot_before(now) + self.period
+
+
+class Scheduler:
+    """Runs jobs on the event loop; the jobs themselves run in worker threads"""
+
+    def __init__(self, jobs: List[Job], lease_ttl: float = 120.0):
+        self.jobs = {job.name: job for job in jobs}
+        self.lease_ttl = lease_ttl
+        self.state = get_shared_state()
+        self._tasks: List[asyncio.Task] = []
+
+    def last_run(self, job: Job) -> Optional[float]:
+        return self.state.cache_get("scheduler", job.name)
+
+    async def run_job(self, job: Job, slot: Optional[float] = None) -> bool:
+        """Run one job now and record the slot it covered; returns success"""
+        started = time.perf_counter()
+        try:
+            job.last_result = await asyncio.to_thread(job.func)
+            job.last_error = None
+            status = "success"
+        except Exception as e:
+            job.last_error = str(e)
+            status = "error"
+            print(f"⚠ Scheduled job {job.name} failed: {e}")
+        JOB_DURATION.observe(time.perf_counter() - started, job=job.name)
+        JOB_RUNS.inc(job=job.name, status=status)
+        if status == "success":
+            JOB_LAST_SUCCESS.set(time.time(), job=job.name)
+            self.state.cache_set("scheduler", job.name, slot if slot is not None else time.time())
+        return status == "success"
+
+    def _is_leader(self) -> bool:
+        return self.state.lead("scheduler", ttl=self.lease_ttl)
+
+    async def _loop(self, job: Job):
+        # Catch up on a slot missed while the API was down
+        if job.catch_up:
+            slot = job.slot_before(time.time())
+            last = self.last_run(job)
+            if (last is None or last < slot) and self._is_leader():
+                print(f"⏰ Catching up missed run of {job.name} ({_utc(slot)})")
+                await self._run_holding_lease(job, slot)
+
+        while True:
+            slot = job.next_slot(time.time())
+            delay = slot - time.time() + random.uniform(0, job.jitter)
+            await self._sleep_holding_lease(delay)
+            last = self.last_run(job)
+            if (last is None or last < slot) and self._is_leader():
+                await self._run_holding_lease(job, slot)
+
+    async def _run_holding_lease(self, job: Job, slot: float) -> bool:
+        """Run a job while a side task keeps renewing the leader lease (jobs can outlast lease_ttl)"""
+        renewer = asyncio.create_task(self._sleep_holding_lease(float("inf")))
+        try:
+            return await self.run_job(job, slot)
+        finally:
+            renewer.cancel()
+
+    async def _sleep_holding_lease(self, delay: float):
+        """Sleep, renewing the leader lease often enough that it never lapses"""
+        deadline = time.monotonic() + max(0.0, delay)
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            self._is_leader()
+            await asyncio.sleep(min(remaining, self.lease_ttl / 3))
+
+    def start(self):
+        if self._tasks:
+            return
+        loop = asyncio.get_running_loop()
+        self._tasks = [loop.create_task(self._loop(job)) for job in self.jobs.values()]
+        print(f"✓ Scheduler started: {', '.join(self.jobs)}")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        self.state.resign("scheduler")
+
+    def status(self) -> Dict:
+        now = time.time()
+        return {
+            name: {
+                "period_seconds": job.period,
+                "last_run": _utc(self.last_run(job)),
+                "next_run": _utc(job.next_slot(now)),
+                "last_error": job.last_error,
+                "duration_p50_seconds": JOB_DURATION.quantile(0.5, job=name)
+            }
+            for name, job in self.jobs.items()
+        }
+
+
+def _utc(timestamp: Optional[float]) -> Optional[str]:
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).isoformat() if timestamp else None
+
+
+# ============================================================================
+# JOBS
+# ============================================================================
+
+SENTIMENT_COINS = {"BTC": "Bitcoin", "ETH": "Ethereum"}
+
+
+def refresh_candle_close():
+    """Score the newest daily candle and append it to predictions_history.csv"""
+    from services.registry import get_crypto_service
+    return get_crypto_service().refresh_predictions()
+
+
+def refresh_sentiment():
+    """Refetch news and re-run sentiment analysis against the current technical predictions"""
+    from services.registry import get_sentiment_service
+    sentiment_service = get_sentiment_service()
+    results = {}
+    for symbol, crypto_name in SENTIMENT_COINS.items():
+        sentiment_service.refresh_news(crypto_name)
+        # No technical input: the agent takes the crypto service's current prediction
+        results[symbol] = sentiment_service.refresh_latest(crypto_name)
+    return {symbol: result["recommendation"]["action"] for symbol, result in results.items()}
+
+
+def reindex_rag():
+    """Upsert the live prediction snapshot into the RAG collection"""
+    from services.registry import get_crypto_service, get_rag_service
+    return get_rag_service().index_live_predictions(get_crypto_service().get_current_predictions())
+
+
+DAY = 86400
+
+
+def default_jobs() -> List[Job]:
+    jobs = [
+        Job("candle_close_refresh", refresh_candle_close, period=DAY, offset=5 * 60),
+        Job("sentiment_refresh", refresh_sentiment, period=3600, offset=10 * 60),
+        Job("rag_reindex", reindex_rag, period=DAY, offset=15 * 60),
+    ]
+    selected = [name.strip() for name in SCHEDULER_JOBS.split(",") if name.strip()]
+    return [job for job in jobs if job.name in selected] if selected else jobs
+
+
+_scheduler: Optional[Scheduler] = None
+
+
+def get_scheduler() -> Scheduler:
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = Scheduler(default_jobs())
+    return _scheduler
@@ -0,0 +1,199 @@
+"""
+Sentiment Agent Graph
+=====================
+The sentiment workflow (the notebook's LangGraph CryptoSentimentAgent) as a
+graph of nodes, run by SentimentService.analyze_crypto and so by
+/api/sentiment/analyze and the scheduled refresh:
+
+    fetch_news ───────► analyze_sentiment ──┐
+                                            ├──► combine_signals ──► generate_recommendation
+    technical_signal ───────────────────────┘
+
+A node starts as soon as its dependencies are done, in a small thread pool,
+so the news fetch and the technical-signal retrieval (the crypto service's
+current prediction when the caller sends none) run in parallel.
+
+Checkpoints: each node's output is kept in the shared state under the run
+key (coin + technical input) for AGENT_CHECKPOINT_TTL seconds. Running the
+same analysis again loads the finished nodes and resumes at the first node
+without a checkpoint, so a retry after an LLM failure neither refetches the
+news nor repeats a successful analysis. Checkpoints expire independently, so
+a node is only loaded when all of its dependencies were loaded too: once a
+node is recomputed (e.g. fresh news), everything downstream is recomputed.
+Degraded outputs (LLM unavailable) and everything computed from them are not
+checkpointed, so a retry reruns exactly those nodes. Each result carries the
+run trace under 'agent'.
+
+Settings:
+    AGENT_CHECKPOINT_TTL=900    seconds node outputs are kept for resuming (0 disables)
+"""
+
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextvars import copy_context
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from services.metrics import REGISTRY
+
+AGENT_CHECKPOINT_TTL = float(os.getenv("AGENT_CHECKPOINT_TTL", "900"))
+COIN_SYMBOLS = {'bitcoin': 'BTC', 'ethereum': 'ETH'}
+
+NODE_RUNS = REGISTRY.counter("sentiment_agent_nodes_total", "Sentiment agent node executions",
+                             ["node", "source"])
+
+
+class Node:
+    """One step of the graph: a function of the run state and its dependencies' outputs"""
+
+    def __init__(self, name: str, func: Callable[[Dict], Dict], deps: Sequence[str] = ()):
+        self.name = name
+        self.func = func
+        self.deps = list(deps)
+
+
+class SentimentAgent:
+    """Runs the sentiment graph over a SentimentService's steps, with per-node checkpoints"""
+
+    def __init__(self, service, checkpoint_ttl: float = AGENT_CHECKPOINT_TTL):
+        """
+        Args:
+            service: SentimentService providing the news, LLM and scoring steps
+            checkpoint_ttl: Seconds node outputs are kept (0 disables checkpoints)
+        """
+        self.service = service
+        self.shared_state = service.shared_state
+        self.checkpoint_ttl = checkpoint_ttl
+        self.nodes: List[Node] = [
+            Node("fetch_news", self._fetch_news),
+            Node("technical_signal", self._technical_signal),
+            Node("analyze_sentiment", self._analyze_sentiment, ["fetch_news"]),
+            Node("combine_signals", self._combine_signals, ["technical_signal", "analyze_sentiment"]),
+            Node("generate_recommendation", self._generate_recommendation,
+                 ["technical_signal", "analyze_sentiment", "combine_signals"]),
+        ]
+
+    # --- nodes ------------------------------------------------------------
+
+    def _fetch_news(self, state: Dict) -> Dict:
+        return {'articles': self.service._fetch_news(state['crypto_name'])}
+
+    def _technical_signal(self, state: Dict) -> Dict:
+        technical = state['technical_prediction'] or self._current_technical(state['crypto_name'])
+        return {'technical': technical, 'score': self.service._technical_score(technical)}
+
+    def _analyze_sentiment(self, state: Dict) -> Dict:
+        return self.service._analyze_sentiment(state['crypto_name'], state['fetch_news']['articles'])
+
+    def _combine_signals(self, state: Dict) -> Dict:
+        return self.service._combine_signals(state['technical_signal']['technical'], state['analyze_sentiment'])
+
+    def _generate_recommendation(self, state: Dict) -> Dict:
+        return self.service._generate_recommendation(
+            state['combine_signals'], state['technical_signal']['technical'], state['analyze_sentiment'])
+
+    def _current_technical(self, crypto_name: str) -> Dict[str, Any]:
+        """The crypto service's current daily prediction, in the technical-input shape"""
+        from services.registry import get_crypto_service
+        symbol = COIN_SYMBOLS.get(crypto_name.lower())
+        if symbol is None:
+            raise ValueError(f"No technical model for '{crypto_name}'; send a technical prediction")
+        prediction = get_crypto_service().get_current_predictions()[symbol]
+        return {
+            "signal": prediction["signal"],
+            "pct_change": prediction["predicted_change_percent"],
+            "current_price": prediction["current_price"],
+            "predicted_price": prediction["next_day_prediction"],
+            "rsi": prediction.get("rsi")
+        }
+
+    # --- checkpoints ------------------------------------------------------
+
+    def _run_key(self, crypto_name: str, technical_prediction: Optional[Dict]) -> str:
+        payload = json.dumps([crypto_name.lower(), technical_prediction], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()[:24]
+
+    def _load(self, run_key: str, node: str) -> Optional[Dict]:
+        if self.checkpoint_ttl <= 0:
+            return None
+        return self.shared_state.cache_get('sentiment_agent', f"{run_key}:{node}")
+
+    def _save(self, run_key: str, node: str, output: Dict):
+        if self.checkpoint_ttl > 0:
+            self.shared_state.cache_set('sentiment_agent', f"{run_key}:{node}", output, ttl=self.checkpoint_ttl)
+
+    # --- execution --------------------------------------------------------
+
+    @staticmethod
+    def _timed(func: Callable[[Dict], Dict], state: Dict):
+        started = time.perf_counter()
+        return func(state), time.perf_counter() - started
+
+    def run(self, crypto_name: str, technical_prediction: Optional[Dict[str, Any]] = None,
+            resume: bool = True) -> Dict[str, Any]:
+        """
+        Run the graph for one coin
+
+        Args:
+            crypto_name: Name of cryptocurrency (e.g., 'Bitcoin', 'Ethereum')
+            technical_prediction: Technical analysis input (None: the crypto service's current prediction)
+            resume: Reuse checkpointed node outputs of the same run (False: recompute every node)
+
+        Returns:
+            The analysis (SentimentService.analyze_crypto shape) plus 'agent':
+            the run key and, per node, its source (run/checkpoint), seconds and degraded flag
+        """
+        run_key = self._run_key(crypto_name, technical_prediction)
+        state = {'crypto_name': crypto_name, 'technical_prediction': technical_prediction}
+        trace: Dict[str, Dict] = {}
+        degraded = set()
+        fresh = set()  # Nodes computed in this run; their dependents must be recomputed too
+        pending = list(self.nodes)
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=2, thread_name_prefix="sentiment-agent") as pool:
+            while pending or running:
+                # Nodes are listed in dependency order, so one pass starts every ready node
+                for node in list(pending):
+                    if not all(dep in state for dep in node.deps):
+                        continue
+                    pending.remove(node)
+                    reusable = resume and not any(dep in fresh for dep in node.deps)
+                    checkpoint = self._load(run_key, node.name) if reusable else None
+                    if checkpoint is not None:
+                        state[node.name] = checkpoint
+                        trace[node.name] = {'source': 'checkpoint', 'seconds': 0.0, 'degraded': False}
+                        NODE_RUNS.inc(node=node.name, source='checkpoint')
+                        continue
+                    # Each task gets a copy of this context (request cancellation token)
+                    running[pool.submit(copy_context().run, self._timed, node.func, state)] = node
+                if not running:
+                    continue
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    node = running.pop(future)
+                    output, seconds = future.result()  # A raising node fails the run; finished nodes stay saved
+                    state[node.name] = output
+                    fresh.add(node.name)
+                    NODE_RUNS.inc(node=node.name, source='run')
+                    is_degraded = bool(output.get('degraded')) or any(dep in degraded for dep in node.deps)
+                    if is_degraded:
+                        degraded.add(node.name)
+                    else:
+                        self._save(run_key, node.name, output)
+                    trace[node.name] = {'source': 'run', 'seconds': round(seconds, 3), 'degraded': is_degraded}
+
+        return {
+            'crypto': crypto_name,
+            'technical': state['technical_signal']['technical'],
+            'sentiment': state['analyze_sentiment'],
+            'combined_signal': state['combine_signals'],
+            'recommendation': state['generate_recommendation'],
+            'news_count': len(state['fetch_news']['articles']),
+            'timestamp': datetime.now().isoformat(),
+            'agent': {'run': run_key, 'nodes': trace}
+        }
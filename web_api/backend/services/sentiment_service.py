@@ -4,19 +4,104 @@ Sentiment Analysis Service
 Provides crypto sentiment analysis using Ollama LLM and real-time news.
 
 Combines technical predictions with news sentiment for enhanced trading recommendations.
+
+News is ingested incrementally into the article store (services/news_store.py):
+a fetch keeps only articles newer than the coin's published_on watermark, and
+prompts are built from the newest stored articles, so an upstream outage
+still leaves the last known news to analyze. Near-duplicate reports of the
+same story are collapsed before prompting (services/news_dedup.py), so the
+prompt carries distinct stories, each with the number of articles reporting it.
+
+The steps below are run as a graph by services/sentiment_agent.py: news and
+the technical signal in parallel, every step checkpointed so a retry after
+an LLM failure resumes at the failed step.
+
+The sentiment generation is constrained to a JSON schema (SentimentOutput,
+sent as Ollama's `format`) and capped at SENTIMENT_NUM_PREDICT tokens, so
+the reply is validated in one step. A reply that fails validation gets the
+keyword fallback and is counted in sentiment_parse_total{outcome="invalid"}.
+
+Settings:
+    SENTIMENT_NUM_PREDICT=300    token budget of the sentiment JSON
+    REASONING_NUM_PREDICT=200    token budget of the recommendation reasoning
 """
 
 import os
-import json
+import re
 import requests
-from typing import Dict, Any, List
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from typing import Dict, Any, List, Literal, Optional
 from datetime import datetime
 
+from pydantic import BaseModel, Field, ValidationError
+
+from services.config import OLLAMA_GENERATE_URL, OLLAMA_MODEL, NEWS_API_URL
+from services.metrics import REGISTRY, stage_timer, register_cache
+from services.llm_gateway import get_llm_gateway, LLM_MAX_CONCURRENCY, PRIORITY_BATCH
+from services.news_dedup import collapse_near_duplicates
+from services.news_store import get_news_store
+from services.sentiment_agent import SentimentAgent
+from services.shared_state import get_shared_state
+
+NEWS_CACHE_TTL = float(os.getenv("NEWS_CACHE_TTL", "3600"))  # Seconds a fetched feed is reused
+NEWS_PROMPT_ARTICLES = 20  # Newest stored articles handed to the analysis
+NEWS_PROMPT_STORIES = 5  # Distinct stories (near-duplicate clusters) put in the prompt
+
+# Generation budgets: the sentiment schema fills ~150 tokens with a two-sentence reasoning
+SENTIMENT_NUM_PREDICT = int(os.getenv("SENTIMENT_NUM_PREDICT", "300"))
+REASONING_NUM_PREDICT = int(os.getenv("REASONING_NUM_PREDICT", "200"))  # 2-3 sentence summary
+
+SENTIMENT_BATCH_SIZE = int(os.getenv("SENTIMENT_BATCH_SIZE", "5"))  # Coins per batched sentiment prompt
+
+PARSE_RESULTS = REGISTRY.counter("sentiment_parse_total", "Sentiment generations by validation outcome",
+                                 ["outcome"])
+BATCH_RESULTS = REGISTRY.counter("sentiment_batch_total",
+                                 "Batched sentiment prompts by outcome (ok, partial, fallback, unavailable)", ["outcome"])
+
+# Headline keywords for the rule-based fallback used while the LLM is unavailable
+BULLISH_KEYWORDS = ['surge', 'rally', 'soar', 'gain', 'bull', 'record', 'high', 'adoption', 'approval',
+                    'approve', 'inflow', 'partnership', 'upgrade', 'breakout', 'rise', 'jump', 'buy']
+BEARISH_KEYWORDS = ['crash', 'plunge', 'drop', 'fall', 'bear', 'low', 'hack', 'exploit', 'ban', 'lawsuit',
+                    'sec sues', 'outflow', 'sell-off', 'selloff', 'liquidation', 'fraud', 'decline', 'slump']
+_KEYWORD_PATTERNS = {
+    word: re.compile(rf"\b{re.escape(word)}(?:s|es|d|ed|ing)?\b")
+    for word in BULLISH_KEYWORDS + BEARISH_KEYWORDS
+}
+
+class SentimentOutput(BaseModel):
+    """Sentiment generation schema: sent to Ollama as `format` and used to validate the reply"""
+    sentiment: Literal['BULLISH', 'BEARISH', 'NEUTRAL']
+    score: float = Field(ge=-100, le=100, description="-100 very bearish to +100 very bullish")
+    confidence: float = Field(ge=0, le=1)
+    key_factors: List[str] = Field(max_length=5)
+    reasoning: str = Field(description="One or two sentences")
+
+
+class CoinSentimentOutput(SentimentOutput):
+    coin: str = Field(description="Coin name exactly as given in the prompt")
+
+
+class BatchSentimentOutput(BaseModel):
+    """Batched generation schema: one sentiment per coin of the prompt"""
+    coins: List[CoinSentimentOutput]
+
+
+SENTIMENT_SCHEMA = SentimentOutput.model_json_schema()
+BATCH_SENTIMENT_SCHEMA = BatchSentimentOutput.model_json_schema()
+NO_NEWS_SENTIMENT = {
+    'sentiment': 'NEUTRAL',
+    'score': 0,
+    'confidence': 0.5,
+    'key_factors': [],
+    'reasoning': 'No news articles available'
+}
+
 class SentimentService:
     """Service for crypto sentiment analysis using Ollama"""
     
-    def __init__(self, ollama_url: str = "http://localhost:11434/api/generate", 
-                 ollama_model: str = "llama3.2"):
+    def __init__(self, ollama_url: str = OLLAMA_GENERATE_URL, 
+                 ollama_model: str = OLLAMA_MODEL):
         """
         Initialize sentiment service
         
@@ -26,176 +111,277 @@ class SentimentService:
         """
         self.ollama_url = ollama_url
         self.ollama_model = ollama_model
-        self.news_cache = {}  # Cache news by crypto
+        self.shared_state = get_shared_state()  # News cache shared by every worker
+        self.news_store = get_news_store()  # Article history, deduplicated by body
+        self.agent = SentimentAgent(self)  # Runs the analysis steps as a checkpointed graph
+        self.news_cache_hits = 0
+        self.news_cache_misses = 0
+        register_cache('news_cache',
+                       hits=lambda: self.news_cache_hits,
+                       misses=lambda: self.news_cache_misses,
+                       entries=lambda: self.shared_state.cache_size('news'))
         
-    def _call_ollama(self, prompt: str, timeout: int = 60) -> str:
-        """Call Ollama API"""
-        try:
-            response = requests.post(
-                self.ollama_url,
-                json={
-                    "model": self.ollama_model,
-                    "prompt": prompt,
-                    "stream": False,
-                    "options": {
-                        "temperature": 0.3,
-                        "num_predict": 2000
-                    }
-                },
-                timeout=timeout
-            )
-            response.raise_for_status()
-            return response.json().get("response", "")
-        except Exception as e:
-            raise Exception(f"Ollama API error: {str(e)}")
+    def _call_ollama(self, prompt: str, timeout: Optional[float] = None, caller: str = "sentiment",
+                     num_predict: int = REASONING_NUM_PREDICT, format: Optional[Dict] = None) -> str:
+        """
+        Call Ollama through the shared LLM gateway (batch priority, behind chat)
+        
+        Raises the gateway's errors unchanged (LLMUnavailable, LLMQueueTimeout,
+        LLMCancelled, requests.RequestException), so callers can tell a backend
+        failure from a bad reply
+        """
+        return get_llm_gateway().generate(
+            prompt,
+            options={
+                "temperature": 0.3,
+                "num_predict": num_predict
+            },
+            caller=caller,
+            priority=PRIORITY_BATCH,
+            timeout=timeout,
+            model=self.ollama_model,
+            format=format
+        )
     
     def _fetch_news(self, crypto_name: str) -> List[Dict[str, str]]:
         """Fetch recent crypto news"""
         # Check cache first
-        if crypto_name in self.news_cache:
-            return self.news_cache[crypto_name]
+        cached = self.shared_state.cache_get('news', crypto_name)
+        if cached is not None:
+            self.news_cache_hits += 1
+            return cached
         
+        # One worker fetches, the others wait for its result
+        with self.shared_state.lock(f'news_fetch:{crypto_name}', ttl=30):
+            cached = self.shared_state.cache_get('news', crypto_name)
+            if cached is not None:
+                self.news_cache_hits += 1
+                return cached
+            self.news_cache_misses += 1
+            return self._fetch_news_upstream(crypto_name)
+    
+    def _fetch_news_upstream(self, crypto_name: str) -> List[Dict[str, str]]:
+        """Store the articles above the coin's watermark, then cache the newest stored ones"""
+        coin = crypto_name.lower()
         try:
-            url = f"https://min-api.cryptocompare.com/data/v2/news/?lang=EN&categories={crypto_name}"
-            response = requests.get(url, timeout=10)
+            url = f"{NEWS_API_URL}?lang=EN&categories={crypto_name}"
+            with stage_timer('news_fetch'):
+                response = requests.get(url, timeout=10)
             response.raise_for_status()
             
             data = response.json()
-            articles = []
-            
-            if 'Data' in data:
-                for article in data['Data'][:10]:
-                    articles.append({
-                        'title': article.get('title', ''),
-                        'body': article.get('body', '')[:500],
-                        'source': article.get('source', ''),
-                        'published': article.get('published_on', 0)
-                    })
-            
-            # Cache the results
-            self.news_cache[crypto_name] = articles
-            return articles
+            added = self.news_store.add(coin, data.get('Data') or [])
+            if added:
+                print(f"✓ News store: {added} new {crypto_name} article(s)")
             
         except Exception as e:
             print(f"News fetch error: {str(e)}")
-            return []
+            return self.news_store.latest(coin, limit=NEWS_PROMPT_ARTICLES)
+        
+        articles = self.news_store.latest(coin, limit=NEWS_PROMPT_ARTICLES)
+        
+        # Cache the results
+        self.shared_state.cache_set('news', crypto_name, articles, ttl=NEWS_CACHE_TTL)
+        return articles
     
-    def _analyze_sentiment(self, crypto_name: str, articles: List[Dict[str, str]]) -> Dict[str, Any]:
-        """Analyze sentiment using Ollama"""
+    def _analyze_sentiment(self, crypto_name: str, articles: List[Dict[str, str]],
+                           as_of: Optional[str] = None) -> Dict[str, Any]:
+        """Analyze sentiment using Ollama (as_of: date the news is assessed at, for historical backfills)"""
         if not articles:
-            return {
-                'sentiment': 'NEUTRAL',
-                'score': 0,
-                'confidence': 0.5,
-                'key_factors': [],
-                'reasoning': 'No news articles available'
-            }
+            return dict(NO_NEWS_SENTIMENT)
         
-        # Prepare news summary
-        news_summary = "\n\n".join([
-            f"Article {i+1}:\nTitle: {a['title']}\nSummary: {a['body'][:200]}"
-            for i, a in enumerate(articles[:5])
-        ])
+        stories = self._stories(articles)
+        news_summary = self._news_summary(stories)
         
-        prompt = f"""You are a crypto market sentiment analyst. Analyze the following recent news about {crypto_name} and provide a sentiment assessment.
+        timeframe = f"news about {crypto_name} published up to {as_of}" if as_of else f"recent news about {crypto_name}"
+        prompt = f"""You are a crypto market sentiment analyst. Analyze the following {timeframe} and provide a sentiment assessment.
 
 News Articles:
 {news_summary}
 
-Provide your analysis in the following JSON format:
-{{
-    "sentiment": "BULLISH" or "BEARISH" or "NEUTRAL",
-    "score": <number between -100 (very bearish) and +100 (very bullish)>,
-    "confidence": <number between 0 and 1>,
-    "key_factors": ["factor1", "factor2", "factor3"],
-    "reasoning": "Brief explanation of your sentiment assessment"
-}}
+Give the overall sentiment (BULLISH, BEARISH or NEUTRAL), a score from -100 (very bearish) to +100 (very bullish), your confidence from 0 to 1, up to three key factors and a one or two sentence reasoning.
 
 Consider:
+- How widely each story is reported
 - Regulatory news
 - Adoption/partnerships
 - Technical developments
 - Market trends
 - Expert opinions
 
-Return ONLY valid JSON, no additional text."""
+Respond in JSON."""
         
         try:
-            response_text = self._call_ollama(prompt)
-            
-            # Remove markdown code blocks if present
-            response_text = response_text.strip()
-            if '```json' in response_text:
-                # Extract JSON from markdown code block
-                start = response_text.find('```json') + 7
-                end = response_text.find('```', start)
-                response_text = response_text[start:end].strip()
-            elif response_text.startswith('```'):
-                # Remove any code block markers
-                lines = response_text.split('\n')
-                response_text = '\n'.join(lines[1:-1] if len(lines) > 2 else lines)
-            
-            # Try to find JSON object if there's extra text
-            if not response_text.startswith('{'):
-                start_idx = response_text.find('{')
-                end_idx = response_text.rfind('}')
-                if start_idx != -1 and end_idx != -1:
-                    response_text = response_text[start_idx:end_idx+1]
-            
-            # Parse JSON
-            sentiment_data = json.loads(response_text)
-            
-            # Ensure all required fields exist
-            if 'sentiment' not in sentiment_data:
-                sentiment_data['sentiment'] = 'NEUTRAL'
-            if 'score' not in sentiment_data:
-                sentiment_data['score'] = 0
-            if 'confidence' not in sentiment_data:
-                sentiment_data['confidence'] = 0.5
-            if 'key_factors' not in sentiment_data:
-                sentiment_data['key_factors'] = []
-            if 'reasoning' not in sentiment_data:
-                sentiment_data['reasoning'] = 'No reasoning provided'
-                
-            return sentiment_data
+            # Decoding is constrained to SENTIMENT_SCHEMA, so the reply is parsed once, with no cleanup
+            response_text = self._call_ollama(prompt, caller="sentiment_analysis",
+                                              num_predict=SENTIMENT_NUM_PREDICT, format=SENTIMENT_SCHEMA)
+        except Exception as e:
+            print(f"⚠ Sentiment analysis error, using keyword fallback: {str(e)}")
+            return self._rule_based_sentiment(stories, reason=str(e))
+        
+        try:
+            sentiment_data = SentimentOutput.model_validate_json(response_text).model_dump()
+        except ValidationError as e:
+            # Truncated at the token budget, or a backend that ignores `format`
+            PARSE_RESULTS.inc(outcome="invalid")
+            print(f"⚠ Invalid sentiment response ({e.error_count()} error(s)), using keyword fallback: "
+                  f"{response_text[:200]!r}")
+            return self._rule_based_sentiment(stories, reason="invalid LLM response")
+        PARSE_RESULTS.inc(outcome="ok")
+        return sentiment_data
+    
+    @staticmethod
+    def _stories(articles: List[Dict[str, str]]) -> List[Dict]:
+        """One article per story, newest first; repeats only raise the outlet count"""
+        return collapse_near_duplicates(articles)[:NEWS_PROMPT_STORIES]
+    
+    @staticmethod
+    def _news_summary(stories: List[Dict]) -> str:
+        return "\n\n".join([
+            f"Article {i+1}:\nTitle: {a['title']}\nSummary: {a['body'][:200]}"
+            + (f"\nReported by {a['cluster_size']} articles" if a['cluster_size'] > 1 else "")
+            for i, a in enumerate(stories)
+        ])
+    
+    def analyze_sentiment_batch(self, news: Dict[str, List[Dict[str, str]]], as_of: Optional[str] = None,
+                                batch_size: int = SENTIMENT_BATCH_SIZE) -> Dict[str, Dict[str, Any]]:
+        """
+        Sentiment of several coins, `batch_size` coins per LLM prompt
+        
+        Args:
+            news: Articles per coin name, newest first
+            as_of: Date the news is assessed at (historical backfills)
+            batch_size: Coins per prompt (1: one _analyze_sentiment call per coin)
             
-        except json.JSONDecodeError as e:
-            print(f"JSON parsing error: {str(e)}")
-            print(f"Response text: {response_text[:500]}")
-            return {
-                'sentiment': 'NEUTRAL',
-                'score': 0,
-                'confidence': 0.3,
-                'key_factors': ['Unable to parse AI response'],
-                'reasoning': 'AI response could not be parsed as valid JSON'
-            }
+        Returns:
+            Sentiment per coin, in the _analyze_sentiment shape. Coins a batch
+            reply does not cover, or every coin of a failed batch, are analyzed
+            one by one
+        """
+        results = {name: dict(NO_NEWS_SENTIMENT) for name, articles in news.items() if not articles}
+        names = [name for name, articles in news.items() if articles]
+        if batch_size <= 1 or len(names) <= 1:
+            results.update({name: self._analyze_sentiment(name, news[name], as_of) for name in names})
+            return results
+        
+        batches = [names[i:i + batch_size] for i in range(0, len(names), batch_size)]
+        if len(batches) == 1:
+            results.update(self._analyze_batch({name: news[name] for name in names}, as_of))
+            return results
+        # Batches queue on the gateway's slots; each task carries this context (cancellation token)
+        with ThreadPoolExecutor(max_workers=min(LLM_MAX_CONCURRENCY, len(batches))) as pool:
+            futures = [pool.submit(copy_context().run, self._analyze_batch, {name: news[name] for name in batch}, as_of)
+                       for batch in batches]
+            for future in futures:
+                results.update(future.result())
+        return results
+    
+    def _analyze_batch(self, news: Dict[str, List[Dict[str, str]]], as_of: Optional[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        One structured prompt for several coins
+        
+        Coins missing from the reply, or all coins of a reply that fails
+        validation, are analyzed one by one. When the LLM call itself fails
+        (circuit open, queue timeout, cancellation, transport error) every coin
+        gets the keyword fallback at once: per-coin calls would only wait on
+        the same backend again
+        """
+        sections = "\n\n".join(f"### {name}\n{self._news_summary(self._stories(articles))}"
+                                 for name, articles in news.items())
+        timeframe = f"news published up to {as_of}" if as_of else "recent news"
+        prompt = f"""You are a crypto market sentiment analyst. Analyze the following {timeframe} about {len(news)} cryptocurrencies and provide a sentiment assessment for each one, using only the articles listed under its name.
+
+{sections}
+
+For each coin, give the coin name exactly as in its heading, the overall sentiment (BULLISH, BEARISH or NEUTRAL), a score from -100 (very bearish) to +100 (very bullish), your confidence from 0 to 1, up to three key factors and a one or two sentence reasoning.
+
+Consider:
+- How widely each story is reported
+- Regulatory news
+- Adoption/partnerships
+- Technical developments
+- Market trends
+- Expert opinions
+
+Respond in JSON."""
+        
+        results = {}
+        try:
+            response_text = self._call_ollama(prompt, caller="sentiment_batch",
+                                              num_predict=SENTIMENT_NUM_PREDICT * len(news),
+                                              format=BATCH_SENTIMENT_SCHEMA)
+            batch = BatchSentimentOutput.model_validate_json(response_text)
+            PARSE_RESULTS.inc(outcome="ok")
+            by_name = {name.lower(): name for name in news}
+            for entry in batch.coins:
+                name = by_name.get(entry.coin.strip().lower())
+                if name is not None and name not in results:
+                    results[name] = entry.model_dump(exclude={'coin'})
+        except ValidationError as e:
+            PARSE_RESULTS.inc(outcome="invalid")
+            print(f"⚠ Invalid batched sentiment response ({e.error_count()} error(s)), analyzing coins one by one")
         except Exception as e:
-            print(f"Sentiment analysis error: {str(e)}")
-            return {
-                'sentiment': 'NEUTRAL',
-                'score': 0,
-                'confidence': 0.3,
-                'key_factors': [],
-                'reasoning': f'Error in analysis: {str(e)}'
-            }
+            print(f"⚠ Batched sentiment error, using keyword fallback: {str(e)}")
+            BATCH_RESULTS.inc(outcome="unavailable")
+            return {name: self._rule_based_sentiment(self._stories(articles), reason=str(e))
+                    for name, articles in news.items()}
+        
+        missing = [name for name in news if name not in results]
+        BATCH_RESULTS.inc(outcome="ok" if not missing else "fallback" if not results else "partial")
+        for name in missing:
+            results[name] = self._analyze_sentiment(name, news[name], as_of)
+        return results
     
-    def _combine_signals(self, technical_pred: Dict[str, Any], sentiment: Dict[str, Any]) -> Dict[str, Any]:
-        """Combine technical and sentiment signals"""
-        # Normalize technical signal to score
+    def _rule_based_sentiment(self, articles: List[Dict[str, str]], reason: str) -> Dict[str, Any]:
+        """Keyword-count sentiment over headlines and summaries, returned at once when the LLM is down"""
+        bullish, bearish = {}, {}
+        for article in articles:
+            text = f"{article.get('title', '')} {article.get('body', '')[:200]}".lower()
+            for word in BULLISH_KEYWORDS:
+                if _KEYWORD_PATTERNS[word].search(text):
+                    bullish[word] = bullish.get(word, 0) + 1
+            for word in BEARISH_KEYWORDS:
+                if _KEYWORD_PATTERNS[word].search(text):
+                    bearish[word] = bearish.get(word, 0) + 1
+        
+        up, down = sum(bullish.values()), sum(bearish.values())
+        score = round(100 * (up - down) / (up + down)) if up + down else 0
+        if score > 20:
+            sentiment = 'BULLISH'
+        elif score < -20:
+            sentiment = 'BEARISH'
+        else:
+            sentiment = 'NEUTRAL'
+        
+        factors = sorted({**bullish, **bearish}.items(), key=lambda item: -item[1])[:3]
+        return {
+            'sentiment': sentiment,
+            'score': score,
+            'confidence': 0.4,
+            'key_factors': [f"'{word}' in {count} article(s)" for word, count in factors],
+            'reasoning': f'Keyword-based estimate from {len(articles)} articles (LLM unavailable: {reason})',
+            'degraded': True
+        }
+    
+    def _technical_score(self, technical_pred: Dict[str, Any]) -> float:
+        """Normalize a technical signal to a score from -100 to +100"""
         tech_signal = technical_pred.get('signal', 'HOLD').upper()
         tech_pct = technical_pred.get('pct_change', 0)
         
-        # Technical score: -100 to +100
         if tech_signal == 'STRONG BUY':
-            tech_score = min(100, 80 + (tech_pct * 4))
+            return min(100, 80 + (tech_pct * 4))
         elif tech_signal == 'BUY':
-            tech_score = min(80, 40 + (tech_pct * 4))
+            return min(80, 40 + (tech_pct * 4))
         elif tech_signal == 'SELL':
-            tech_score = max(-80, -40 + (tech_pct * 4))
+            return max(-80, -40 + (tech_pct * 4))
         elif tech_signal == 'STRONG SELL':
-            tech_score = max(-100, -80 + (tech_pct * 4))
+            return max(-100, -80 + (tech_pct * 4))
         else:  # HOLD
-            tech_score = tech_pct * 4
+            return tech_pct * 4
+    
+    def _combine_signals(self, technical_pred: Dict[str, Any], sentiment: Dict[str, Any]) -> Dict[str, Any]:
+        """Combine technical and sentiment signals"""
+        tech_score = self._technical_score(technical_pred)
         
         sentiment_score = sentiment.get('score', 0)
         
@@ -248,13 +434,14 @@ Return ONLY valid JSON, no additional text."""
                 action = "HOLD"
                 confidence = 0.4
         
-        # Generate reasoning using Ollama
+        # Generate reasoning using Ollama (RSI only when it was actually measured)
+        rsi = technical.get('rsi')
+        rsi_line = f"\n- RSI: {rsi:.1f}" if rsi is not None else ""
         reasoning_prompt = f"""Provide a brief trading recommendation summary (2-3 sentences) based on:
 
 Technical Analysis:
 - Signal: {technical.get('signal')}
-- Price Change: {technical.get('pct_change', 0):.2f}%
-- RSI: {technical.get('rsi', 50):.1f}
+- Price Change: {technical.get('pct_change', 0):.2f}%{rsi_line}
 
 Sentiment Analysis:
 - Sentiment: {sentiment.get('sentiment')}
@@ -266,52 +453,78 @@ Signals Aligned: {aligned}
 
 Provide clear, actionable reasoning for a trader."""
         
-        try:
-            reasoning = self._call_ollama(reasoning_prompt)
-        except:
-            reasoning = f"Combined analysis suggests {action} with {confidence:.0%} confidence."
+        fallback = f"Combined analysis suggests {action} with {confidence:.0%} confidence."
+        degraded = True
+        if sentiment.get('degraded'):
+            reasoning = fallback  # The LLM just failed; don't wait on it a second time
+        else:
+            try:
+                reasoning = self._call_ollama(reasoning_prompt, caller="sentiment_reasoning")
+                degraded = False
+            except Exception:
+                reasoning = fallback
         
         return {
             'action': action,
             'confidence': confidence,
             'aligned': aligned,
             'reasoning': reasoning.strip(),
-            'timestamp': datetime.now().isoformat()
+            'timestamp': datetime.now().isoformat(),
+            'degraded': degraded
         }
     
-    def analyze_crypto(self, crypto_name: str, technical_prediction: Dict[str, Any]) -> Dict[str, Any]:
+    def analyze_crypto(self, crypto_name: str, technical_prediction: Optional[Dict[str, Any]] = None,
+                       resume: bool = True) -> Dict[str, Any]:
         """
-        Run full sentiment analysis for a cryptocurrency
+        Run full sentiment analysis for a cryptocurrency (the agent graph in services/sentiment_agent.py)
         
         Args:
             crypto_name: Name of cryptocurrency (e.g., 'Bitcoin', 'Ethereum')
-            technical_prediction: Dict with technical analysis data
+            technical_prediction: Dict with technical analysis data (None: current model prediction)
+            resume: Reuse checkpointed steps of an identical earlier run
             
         Returns:
             Dict containing sentiment analysis and combined recommendation
         """
-        # Fetch news
-        articles = self._fetch_news(crypto_name)
-        
-        # Analyze sentiment
-        sentiment = self._analyze_sentiment(crypto_name, articles)
-        
-        # Combine signals
-        combined = self._combine_signals(technical_prediction, sentiment)
-        
-        # Generate recommendation
-        recommendation = self._generate_recommendation(combined, technical_prediction, sentiment)
+        return self.agent.run(crypto_name, technical_prediction, resume=resume)
+    
+    def analyze_sentiments(self, crypto_names: List[str],
+                           batch_size: int = SENTIMENT_BATCH_SIZE) -> Dict[str, Dict[str, Any]]:
+        """
+        News sentiment of many coins at once (no technical signal or recommendation)
         
+        Args:
+            crypto_names: Names of cryptocurrencies (e.g., every coin of a dashboard)
+            batch_size: Coins per LLM prompt
+            
+        Returns:
+            Per coin name: crypto, sentiment (the analyze_crypto sentiment shape) and news_count
+        """
+        names = list(dict.fromkeys(crypto_names))
+        with ThreadPoolExecutor(max_workers=min(8, max(1, len(names)))) as pool:
+            news = dict(zip(names, pool.map(self._fetch_news, names)))
+        sentiments = self.analyze_sentiment_batch(news, batch_size=batch_size)
         return {
-            'crypto': crypto_name,
-            'technical': technical_prediction,
-            'sentiment': sentiment,
-            'combined_signal': combined,
-            'recommendation': recommendation,
-            'news_count': len(articles),
-            'timestamp': datetime.now().isoformat()
+            name: {'crypto': name, 'sentiment': sentiments[name], 'news_count': len(news[name])}
+            for name in names
         }
     
+    def refresh_news(self, crypto_name: str) -> List[Dict[str, str]]:
+        """Drop the cached feed for one coin and fetch it again"""
+        self.shared_state.cache_clear('news', crypto_name)
+        return self._fetch_news(crypto_name)
+    
+    def refresh_latest(self, crypto_name: str,
+                       technical_prediction: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Run a full analysis and keep it as the coin's latest (served by /latest/{crypto})"""
+        result = self.analyze_crypto(crypto_name, technical_prediction, resume=False)
+        self.shared_state.cache_set('sentiment_latest', crypto_name.lower(), result)
+        return result
+    
+    def get_latest(self, crypto_name: str):
+        """Latest scheduled analysis for a coin, or None"""
+        return self.shared_state.cache_get('sentiment_latest', crypto_name.lower())
+    
     def clear_cache(self):
         """Clear the news cache"""
-        self.news_cache.clear()
+        self.shared_state.cache_clear('news')
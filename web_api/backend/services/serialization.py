@@ -0,0 +1,239 @@
+"""
+Response Serialization
+======================
+Fast JSON, response compression and a columnar format for bulk endpoints.
+
+- `FastJSONResponse`: orjson rendering (numpy scalars/arrays, NaN -> null),
+  the app's default response class; falls back to the standard json module
+  when orjson is not installed
+- `CompressionMiddleware`: brotli (if the `brotli` package is installed)
+  or gzip, negotiated from Accept-Encoding, for complete responses larger
+  than COMPRESS_MIN_BYTES. Streamed responses (SSE, NDJSON) pass through
+  untouched
+- `to_columnar(records)`: one array per field instead of one object per
+  row; repetitive string/list columns are dictionary-encoded
+
+Columnar layout (bulk endpoints, `?format=columnar`):
+
+    {
+      "format": "columnar",
+      "rows": 3,
+      "columns": {
+        "risk_score": [2.1, 7.4, 5.0],
+        "segment": {"dictionary": ["Prudent", "Aventurier", "Équilibré"], "codes": [0, 1, 2]},
+        "probabilities.Prudent": [0.85, 0.05, 0.15]
+      }
+    }
+
+Nested objects are flattened one level with dotted names. A column is
+dictionary-encoded when it has at most half as many distinct values as
+rows; decode with `dictionary[code]`.
+"""
+
+import gzip
+import json
+import os
+from typing import Any, Dict, Iterable, List, Optional
+
+from starlette.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # Optional: the standard library encoder is used instead
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # Optional: gzip only
+    brotli = None
+
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "5"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+
+RESPONSE_FORMATS = ("records", "columnar")
+
+
+def _default(value):
+    """Fallback encoder for the standard json module (numpy/pandas values)"""
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_default,
+                            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+# ============================================================================
+# COLUMNAR FORMAT
+# ============================================================================
+
+def _hashable(value):
+    if isinstance(value, list):
+        return ("list", tuple(_hashable(v) for v in value))
+    if isinstance(value, dict):
+        return ("dict", tuple(sorted((k, _hashable(v)) for k, v in value.items())))
+    return value
+
+
+def _flatten(record: Dict) -> Dict:
+    flat = {}
+    for key, value in record.items():
+        if isinstance(value, dict):
+            for sub_key, sub_value in value.items():
+                flat[f"{key}.{sub_key}"] = sub_value
+        else:
+            flat[key] = value
+    return flat
+
+
+def _encode_column(values: List) -> Any:
+    if not values or not isinstance(values[0], (str, list, dict)):
+        return values
+    codes, index, dictionary = [], {}, []
+    for value in values:
+        try:
+            key = tuple(value) if isinstance(value, list) else value
+            code = index.get(key)
+        except TypeError:  # Nested lists/dicts
+            key = _hashable(value)
+            code = index.get(key)
+        if code is None:
+            code = index[key] = len(dictionary)
+            dictionary.append(value)
+            if len(dictionary) * 2 > len(values):
+                return values  # Too many distinct values to be worth encoding
+        codes.append(code)
+    return {"dictionary": dictionary, "codes": codes}
+
+
+def to_columnar(records: Iterable[Dict], fields: Optional[List[str]] = None) -> Dict:
+    """
+    Pivot a list of row dicts into the columnar layout
+
+    Args:
+        records: Row dicts (nested dicts are flattened one level)
+        fields: Column order/subset (default: keys of the first row, then any new keys)
+    """
+    rows = [_flatten(record) for record in records]
+    if fields is None:
+        fields = []
+        seen = set()
+        for row in rows:
+            for key in row:
+                if key not in seen:
+                    seen.add(key)
+                    fields.append(key)
+    return {
+        "format": "columnar",
+        "rows": len(rows),
+        "columns": {field: _encode_column([row.get(field) for row in rows]) for field in fields}
+    }
+
+
+def bulk_response(records: List[Dict], response_format: str = "records", **extra) -> FastJSONResponse:
+    """
+    Response for a bulk endpoint: `{**extra, "predictions": [...]}` in
+    records format, or `{**extra, **to_columnar(records)}` in columnar format
+    """
+    if response_format == "columnar":
+        return FastJSONResponse({**extra, **to_columnar(records)})
+    return FastJSONResponse({**extra, "predictions": records})
+
+
+# ============================================================================
+# COMPRESSION
+# ============================================================================
+
+def _accepted_encodings(headers) -> Dict[str, float]:
+    for name, value in headers:
+        if name == b"accept-encoding":
+            accepted = {}
+            for part in value.decode("latin-1").split(","):
+                token, _, params = part.strip().partition(";")
+                quality = 1.0
+                if params.strip().startswith("q="):
+                    try:
+                        quality = float(params.strip()[2:])
+                    except ValueError:
+                        quality = 0.0
+                accepted[token.strip().lower()] = quality
+            return accepted
+    return {}
+
+
+def choose_encoding(headers) -> Optional[str]:
+    accepted = _accepted_encodings(headers)
+    if brotli is not None and accepted.get("br", 0) > 0:
+        return "br"
+    if accepted.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing complete (single-message) responses"""
+
+    def __init__(self, app, minimum_size: int = COMPRESS_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(scope.get("headers", []))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, passthrough
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            headers = list(start_message.get("headers", []))
+            already_encoded = any(name == b"content-encoding" for name, _ in headers)
+            if message.get("more_body", False) or already_encoded or len(body) < self.minimum_size:
+                # Streams and small or pre-encoded bodies go out as they are
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            compressed = compress(body, encoding)
+            headers = [(name, value) for name, value in headers if name != b"content-length"]
+            headers += [(b"content-encoding", encoding.encode()),
+                        (b"content-length", str(len(compressed)).encode()),
+                        (b"vary", b"Accept-Encoding")]
+            await send({**start_message, "headers": headers})
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,337 @@
+"""
+Shared State
+============
+Caches, locks and leadership that hold across uvicorn workers.
+
+Two backends, selected with SHARED_STATE:
+    SHARED_STATE=memory    default, plain Python objects (single worker)
+    SHARED_STATE=sqlite    one SQLite file (WAL mode) shared by every worker
+                           on the host, at SHARED_STATE_PATH
+                           (default backend/state/shared_state.db)
+
+Both expose the same operations:
+
+- keyed caches with optional TTL: `cache_get` / `cache_set` / `cache_clear`
+- append-only lists (chat history): `list_append` / `list_get` / `list_clear`
+- mutual exclusion: `with state.lock("refresh_predictions"): ...`
+- leadership: `state.lead("price_poller", ttl=30)` is True in exactly one
+  process at a time; the leader renews by calling it again, and a crashed
+  leader is replaced once its lease expires
+
+Locks are leases as well, so a worker killed while holding one cannot
+block the others for longer than the lease `ttl`. Values must be JSON
+serializable.
+
+Usage:
+    state = get_shared_state()
+    with state.lock("refresh_predictions", ttl=600):
+        rewrite_history_file()
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+SHARED_STATE_BACKEND = os.getenv("SHARED_STATE", "memory").lower()
+SHARED_STATE_PATH = Path(os.getenv("SHARED_STATE_PATH",
+                                   Path(__file__).parent.parent / "state" / "shared_state.db"))
+
+
+class LockTimeout(Exception):
+    """Raised when a shared lock could not be acquired in time"""
+
+
+class SharedState(ABC):
+    """Backend interface; subclasses must implement the cache, list and lease primitives"""
+
+    def __init__(self):
+        # One identity per process: leadership belongs to the process, not a thread
+        self.process_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    # --- primitives -------------------------------------------------------
+
+    @abstractmethod
+    def cache_get(self, namespace: str, key: str) -> Optional[Any]:
+        ...
+
+    @abstractmethod
+    def cache_set(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None):
+        ...
+
+    @abstractmethod
+    def cache_clear(self, namespace: str, key: Optional[str] = None):
+        ...
+
+    @abstractmethod
+    def cache_size(self, namespace: str) -> int:
+        ...
+
+    @abstractmethod
+    def list_append(self, namespace: str, value: Any, max_len: Optional[int] = None):
+        ...
+
+    @abstractmethod
+    def list_get(self, namespace: str) -> List[Any]:
+        ...
+
+    @abstractmethod
+    def list_clear(self, namespace: str):
+        ...
+
+    @abstractmethod
+    def list_len(self, namespace: str) -> int:
+        ...
+
+    @abstractmethod
+    def _acquire_lease(self, name: str, owner: str, ttl: float) -> bool:
+        """Take or renew `name` for `owner` unless someone else holds a live lease"""
+
+    @abstractmethod
+    def _release_lease(self, name: str, owner: str):
+        ...
+
+    # --- locks and leadership --------------------------------------------
+
+    @contextmanager
+    def lock(self, name: str, timeout: Optional[float] = None, ttl: float = 300.0, poll: float = 0.05):
+        """
+        Exclusive section across threads and workers
+
+        Args:
+            name: Lock name
+            timeout: Seconds to wait before raising LockTimeout (None waits forever)
+            ttl: Lease length; a holder that dies frees the lock after this long
+            poll: Seconds between attempts
+        """
+        owner = f"{self.process_id}:{threading.get_ident()}:{uuid.uuid4().hex[:8]}"
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self._acquire_lease(f"lock:{name}", owner, ttl):
+            if deadline is not None and time.monotonic() >= deadline:
+                raise LockTimeout(f"Could not acquire shared lock '{name}' within {timeout}s")
+            time.sleep(poll)
+        try:
+            yield
+        finally:
+            self._release_lease(f"lock:{name}", owner)
+
+    def lead(self, role: str, ttl: float) -> bool:
+        """Become or stay leader for `role`; call at least once per `ttl` to keep it"""
+        return self._acquire_lease(f"leader:{role}", self.process_id, ttl)
+
+    def resign(self, role: str):
+        self._release_lease(f"leader:{role}", self.process_id)
+
+
+# ============================================================================
+# IN-PROCESS BACKEND
+# ============================================================================
+
+class InProcessState(SharedState):
+    """Dict-backed state; correct across threads, not across workers"""
+
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.Lock()
+        self._caches: Dict[str, Dict[str, tuple]] = {}
+        self._lists: Dict[str, List[Any]] = {}
+        self._leases: Dict[str, tuple] = {}
+
+    def cache_get(self, namespace, key):
+        with self._lock:
+            entry = self._caches.get(namespace, {}).get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires is not None and expires < time.time():
+                del self._caches[namespace][key]
+                return None
+            return value
+
+    def cache_set(self, namespace, key, value, ttl=None):
+        with self._lock:
+            self._caches.setdefault(namespace, {})[key] = (value, time.time() + ttl if ttl else None)
+
+    def cache_clear(self, namespace, key=None):
+        with self._lock:
+            if key is None:
+                self._caches.pop(namespace, None)
+            else:
+                self._caches.get(namespace, {}).pop(key, None)
+
+    def cache_size(self, namespace):
+        now = time.time()
+        with self._lock:
+            return sum(1 for _, expires in self._caches.get(namespace, {}).values()
+                       if expires is None or expires >= now)
+
+    def list_append(self, namespace, value, max_len=None):
+        with self._lock:
+            items = self._lists.setdefault(namespace, [])
+            items.append(value)
+            if max_len is not None and len(items) > max_len:
+                del items[:len(items) - max_len]
+
+    def list_get(self, namespace):
+        with self._lock:
+            return list(self._lists.get(namespace, []))
+
+    def list_clear(self, namespace):
+        with self._lock:
+            self._lists.pop(namespace, None)
+
+    def list_len(self, namespace):
+        with self._lock:
+            return len(self._lists.get(namespace, []))
+
+    def _acquire_lease(self, name, owner, ttl):
+        now = time.time()
+        with self._lock:
+            holder = self._leases.get(name)
+            if holder is None or holder[0] == owner or holder[1] < now:
+                self._leases[name] = (owner, now + ttl)
+                return True
+            return False
+
+    def _release_lease(self, name, owner):
+        with self._lock:
+            if self._leases.get(name, (None,))[0] == owner:
+                del self._leases[name]
+
+
+# ============================================================================
+# SQLITE BACKEND
+# ============================================================================
+
+class SQLiteState(SharedState):
+    """SQLite-backed state shared by every process that opens the same file"""
+
+    def __init__(self, path: Path = SHARED_STATE_PATH):
+        super().__init__()
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        with self._transaction() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS cache ("
+                         "namespace TEXT, key TEXT, value TEXT, expires REAL, PRIMARY KEY (namespace, key))")
+            conn.execute("CREATE TABLE IF NOT EXISTS lists ("
+                         "id INTEGER PRIMARY KEY AUTOINCREMENT, namespace TEXT, value TEXT)")
+            conn.execute("CREATE INDEX IF NOT EXISTS lists_namespace ON lists (namespace, id)")
+            conn.execute("CREATE TABLE IF NOT EXISTS leases (name TEXT PRIMARY KEY, owner TEXT, expires REAL)")
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit mode; writes go through _transaction's BEGIN IMMEDIATE
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        """Write transaction holding the database write lock from the start"""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def cache_get(self, namespace, key):
+        row = self._connection().execute(
+            "SELECT value, expires FROM cache WHERE namespace = ? AND key = ?", (namespace, key)).fetchone()
+        if row is None:
+            return None
+        value, expires = row
+        if expires is not None and expires < time.time():
+            with self._transaction() as conn:
+                conn.execute("DELETE FROM cache WHERE namespace = ? AND key = ? AND expires < ?",
+                             (namespace, key, time.time()))
+            return None
+        return json.loads(value)
+
+    def cache_set(self, namespace, key, value, ttl=None):
+        with self._transaction() as conn:
+            conn.execute("INSERT OR REPLACE INTO cache (namespace, key, value, expires) VALUES (?, ?, ?, ?)",
+                         (namespace, key, json.dumps(value), time.time() + ttl if ttl else None))
+
+    def cache_clear(self, namespace, key=None):
+        with self._transaction() as conn:
+            if key is None:
+                conn.execute("DELETE FROM cache WHERE namespace = ?", (namespace,))
+            else:
+                conn.execute("DELETE FROM cache WHERE namespace = ? AND key = ?", (namespace, key))
+
+    def cache_size(self, namespace):
+        return self._connection().execute(
+            "SELECT COUNT(*) FROM cache WHERE namespace = ? AND (expires IS NULL OR expires >= ?)",
+            (namespace, time.time())).fetchone()[0]
+
+    def list_append(self, namespace, value, max_len=None):
+        with self._transaction() as conn:
+            conn.execute("INSERT INTO lists (namespace, value) VALUES (?, ?)", (namespace, json.dumps(value)))
+            if max_len is not None:
+                conn.execute("DELETE FROM lists WHERE namespace = ? AND id NOT IN ("
+                             "SELECT id FROM lists WHERE namespace = ? ORDER BY id DESC LIMIT ?)",
+                             (namespace, namespace, max_len))
+
+    def list_get(self, namespace):
+        rows = self._connection().execute(
+            "SELECT value FROM lists WHERE namespace = ? ORDER BY id", (namespace,)).fetchall()
+        return [json.loads(value) for (value,) in rows]
+
+    def list_clear(self, namespace):
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM lists WHERE namespace = ?", (namespace,))
+
+    def list_len(self, namespace):
+        return self._connection().execute(
+            "SELECT COUNT(*) FROM lists WHERE namespace = ?", (namespace,)).fetchone()[0]
+
+    def _acquire_lease(self, name, owner, ttl):
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute("SELECT owner, expires FROM leases WHERE name = ?", (name,)).fetchone()
+            if row is not None and row[0] != owner and row[1] >= now:
+                return False
+            conn.execute("INSERT OR REPLACE INTO leases (name, owner, expires) VALUES (?, ?, ?)",
+                         (name, owner, now + ttl))
+            return True
+
+    def _release_lease(self, name, owner):
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM leases WHERE name = ? AND owner = ?", (name, owner))
+
+
+# ============================================================================
+# PROCESS-WIDE INSTANCE
+# ============================================================================
+
+BACKENDS = {"memory": InProcessState, "sqlite": SQLiteState}
+
+_state: Optional[SharedState] = None
+_state_lock = threading.Lock()
+
+
+def get_shared_state() -> SharedState:
+    """The backend selected by SHARED_STATE, created on first use"""
+    global _state
+    if _state is None:
+        with _state_lock:
+            if _state is None:
+                if SHARED_STATE_BACKEND not in BACKENDS:
+                    raise ValueError(f"SHARED_STATE must be one of {list(BACKENDS)}, got '{SHARED_STATE_BACKEND}'")
+                _state = BACKENDS[SHARED_STATE_BACKEND]()
+                print(f"✓ Shared state: {SHARED_STATE_BACKEND}")
+    return _state
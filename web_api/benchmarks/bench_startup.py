@@ -0,0 +1,168 @@
+"""
+Startup Benchmark
+=================
+Measures how long the backend takes to come up:
+
+- import time: `import main` in a fresh interpreter (median of N runs),
+  plus which heavy libraries that import dragged in
+- time to live / ready: uvicorn is started with the given STARTUP_MODE
+  and /health and /ready are polled until each first answers 200
+
+Usage:
+    cd web_api/benchmarks
+    python bench_startup.py                        # import time + background mode
+    python bench_startup.py --modes eager,background,lazy --runs 10
+    python bench_startup.py --ref HEAD~1           # also time `import main` at another commit
+
+`--ref` checks the commit out into a temporary git worktree, so the
+working tree is left untouched.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+import requests
+
+from run_benchmarks import _free_port
+
+BENCH_DIR = Path(__file__).parent
+BACKEND_DIR = BENCH_DIR.parent / "backend"
+REPO_ROOT = BENCH_DIR.parent.parent
+
+HEAVY_MODULES = ["pandas", "numpy", "sklearn", "xgboost", "yfinance", "chromadb", "onnxruntime"]
+
+IMPORT_PROBE = f"""
+import json, sys, time
+started = time.perf_counter()
+import main
+elapsed = time.perf_counter() - started
+print(json.dumps({{"seconds": elapsed, "heavy": [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))
+"""
+
+ENV = {
+    "MARKET_DATA_SOURCE": "fake",
+    "SCHEDULER": "off",
+    "PYTHONUNBUFFERED": "1"
+}
+
+
+# ========================================
+# Import time
+# ========================================
+
+def time_import(backend_dir: Path, runs: int) -> Dict:
+    """Median wall time of `import main` in fresh interpreters"""
+    samples, heavy, error = [], [], None
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, "-c", IMPORT_PROBE], cwd=backend_dir,
+                                env={**os.environ, **ENV}, capture_output=True, text=True)
+        if result.returncode != 0:
+            error = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else f"exit {result.returncode}"
+            break
+        probe = json.loads(result.stdout.strip().splitlines()[-1])
+        samples.append(probe["seconds"])
+        heavy = probe["heavy"]
+    if not samples:
+        return {"error": error}
+    return {
+        "median_s": round(statistics.median(samples), 3),
+        "min_s": round(min(samples), 3),
+        "max_s": round(max(samples), 3),
+        "runs": len(samples),
+        "heavy_modules": heavy
+    }
+
+
+def time_import_at(ref: str, runs: int) -> Dict:
+    """`time_import` against another commit, via a temporary worktree"""
+    with tempfile.TemporaryDirectory(prefix="startup-bench-") as tmp:
+        worktree = Path(tmp) / "tree"
+        subprocess.run(["git", "worktree", "add", "--detach", str(worktree), ref],
+                       cwd=REPO_ROOT, check=True, capture_output=True)
+        try:
+            return time_import(worktree / BACKEND_DIR.relative_to(REPO_ROOT), runs)
+        finally:
+            subprocess.run(["git", "worktree", "remove", "--force", str(worktree)],
+                           cwd=REPO_ROOT, capture_output=True)
+
+
+# ========================================
+# Time to live / ready
+# ========================================
+
+def time_to_ready(mode: str, timeout: float = 300.0) -> Dict:
+    """Seconds from process start until /health and /ready first return 200"""
+    port = _free_port()
+    started = time.monotonic()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=BACKEND_DIR, env={**os.environ, **ENV, "STARTUP_MODE": mode},
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    live: Optional[float] = None
+    ready: Optional[float] = None
+    report = None
+    try:
+        while time.monotonic() - started < timeout and process.poll() is None:
+            try:
+                if live is None and requests.get(f"{base_url}/health", timeout=1).status_code == 200:
+                    live = time.monotonic() - started
+                if live is not None:
+                    response = requests.get(f"{base_url}/ready", timeout=1)
+                    report = response.json()
+                    if response.status_code == 200:
+                        ready = time.monotonic() - started
+                        break
+                    if any(s["state"] == "failed" for s in report["services"].values()) \
+                            and report.get("warmup_seconds") is not None:
+                        break  # Warm-up finished with failures, it will not become ready
+            except requests.RequestException:
+                pass
+            time.sleep(0.05)
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+    return {
+        "mode": mode,
+        "live_s": round(live, 3) if live is not None else None,
+        "ready_s": round(ready, 3) if ready is not None else None,
+        "services": report["services"] if report else None
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backend cold-start benchmark")
+    parser.add_argument("--modes", default="background", help="Comma-separated STARTUP_MODE values to time")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters for the import timing")
+    parser.add_argument("--ref", help="Also time `import main` at this git ref")
+    args = parser.parse_args()
+
+    print("import main (current tree)")
+    current = time_import(BACKEND_DIR, args.runs)
+    print(f"  {json.dumps(current)}")
+
+    if args.ref:
+        print(f"import main ({args.ref})")
+        print(f"  {json.dumps(time_import_at(args.ref, args.runs))}")
+
+    for mode in [m.strip() for m in args.modes.split(",") if m.strip()]:
+        result = time_to_ready(mode)
+        ready = f"{result['ready_s']}s" if result["ready_s"] is not None else "never (see failed services)"
+        print(f"STARTUP_MODE={mode}: live after {result['live_s']}s, ready after {ready}")
+        for name, status in (result["services"] or {}).items():
+            print(f"  {name:<10} {json.dumps(status)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,333 @@
+"""
+API Benchmark Suite
+===================
+Starts the backend under uvicorn against local stubs (fake market data,
+stub Ollama, stub news feed), drives every router at the requested
+concurrency levels and records throughput, latency percentiles and the
+server's resident memory.
+
+Usage:
+    cd web_api/benchmarks
+    python run_benchmarks.py                                   # all routers, concurrency 1 and 8
+    python run_benchmarks.py --routers crypto,clients --concurrency 1,4,16 --requests 200
+    python run_benchmarks.py --compare results/baseline.json   # flag regressions (exit 1)
+    python run_benchmarks.py --profile                         # also dump profiles of slow requests
+
+Results are written to results/<timestamp>.json, with the server's
+/metrics snapshot next to them.
+"""
+
+import argparse
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import requests
+
+from stubs import StubNewsServer, StubOllamaServer
+
+BENCH_DIR = Path(__file__).parent
+BACKEND_DIR = BENCH_DIR.parent / "backend"
+RESULTS_DIR = BENCH_DIR / "results"
+
+TECHNICAL = {"signal": "BUY", "pct_change": 2.5, "current_price": 65000.0, "predicted_price": 66625.0, "rsi": 58.0}
+COINS = ["Bitcoin", "Ethereum", "Ripple", "Cardano", "Dogecoin", "Polkadot", "Litecoin", "Chainlink",
+         "Stellar", "Uniswap", "Solana", "Polygon", "Avalanche"]  # agentic/config.py CURRENCY_MAP names
+CLIENT = {"montant_investi": 15000, "freq_trading": 12, "volatilite_portefeuille": 0.35, "periode_detention_moy": 90}
+
+# router -> [(scenario name, method, path, json body)]
+SCENARIOS = {
+    "crypto": [
+        ("predictions", "GET", "/api/crypto/predictions", None),
+        ("prediction_btc", "GET", "/api/crypto/predictions/BTC", None),
+        ("prices_current", "GET", "/api/crypto/prices/current", None),
+        ("candles_1h", "GET", "/api/crypto/candles/BTC?timeframe=1h&limit=200", None),
+        ("history", "GET", "/api/crypto/history?limit=30", None),
+        ("history_columnar", "GET", "/api/crypto/history?limit=365&format=columnar", None),
+        ("svm_backtest_approx", "GET", "/api/crypto/svm/backtest/BTC?days=365&mode=approx", None),
+    ],
+    "rag": [
+        ("chat", "POST", "/api/rag/chat", {"question": "What does the model predict for Bitcoin?"}),
+        ("stats", "GET", "/api/rag/stats", None),
+    ],
+    "sentiment": [
+        ("analyze", "POST", "/api/sentiment/analyze", {"crypto": "Bitcoin", "technical": TECHNICAL}),
+        ("analyze_batch", "POST", "/api/sentiment/analyze/batch", {"cryptos": COINS}),
+    ],
+    "clients": [
+        ("predict", "POST", "/api/clients/predict", CLIENT),
+        ("predict_batch", "POST", "/api/clients/predict/batch", {"clients": [CLIENT] * 50}),
+        ("predict_batch_columnar", "POST", "/api/clients/predict/batch?format=columnar", {"clients": [CLIENT] * 500}),
+        ("segments", "GET", "/api/clients/segments", None),
+    ],
+}
+
+
+# ========================================
+# Server process
+# ========================================
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def read_rss_mb(pid: int) -> Optional[float]:
+    """Resident set size of a process in MB (psutil if installed, else /proc)"""
+    try:
+        import psutil
+        return psutil.Process(pid).memory_info().rss / 2**20
+    except ImportError:
+        pass
+    except Exception:
+        return None
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+    return None
+
+
+class RssSampler:
+    """Tracks peak RSS of the server while a scenario runs"""
+
+    def __init__(self, pid: int, interval: float = 0.05):
+        self.pid = pid
+        self.interval = interval
+        self.peak = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            rss = read_rss_mb(self.pid)
+            if rss is not None:
+                self.peak = rss if self.peak is None else max(self.peak, rss)
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def start_server(app: str, env: Dict[str, str], port: int, timeout: float = 300.0) -> subprocess.Popen:
+    """Run uvicorn in a subprocess and wait until / answers"""
+    log = open(RESULTS_DIR / "server.log", "w")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", app, "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env={**os.environ, **env}, stdout=log, stderr=subprocess.STDOUT
+    )
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode}, see {RESULTS_DIR / 'server.log'}")
+        try:
+            requests.get(f"http://127.0.0.1:{port}/", timeout=1)
+            return process
+        except requests.RequestException:
+            time.sleep(0.25)
+    process.terminate()
+    raise RuntimeError(f"Server did not start within {timeout:.0f}s")
+
+
+# ========================================
+# Load generation
+# ========================================
+
+_local = threading.local()
+
+
+def _session() -> requests.Session:
+    if not hasattr(_local, "session"):
+        _local.session = requests.Session()
+    return _local.session
+
+
+def _one_request(base_url: str, method: str, path: str, body, timeout: float):
+    started = time.perf_counter()
+    try:
+        response = _session().request(method, base_url + path, json=body, timeout=timeout)
+        ok = response.status_code < 400
+        status = response.status_code
+    except requests.RequestException as e:
+        ok, status = False, type(e).__name__
+    return time.perf_counter() - started, ok, status
+
+
+def run_scenario(base_url: str, pid: int, method: str, path: str, body, concurrency: int,
+                 n_requests: int, warmup: int, timeout: float) -> Dict:
+    """Fire n_requests with `concurrency` in flight; return latency/throughput/RSS stats"""
+    for _ in range(warmup):
+        _one_request(base_url, method, path, body, timeout)
+
+    with RssSampler(pid) as rss, ThreadPoolExecutor(max_workers=concurrency) as pool:
+        started = time.perf_counter()
+        outcomes = list(pool.map(lambda _: _one_request(base_url, method, path, body, timeout), range(n_requests)))
+        wall = time.perf_counter() - started
+
+    latencies = np.array([o[0] for o in outcomes]) * 1000
+    errors = [o[2] for o in outcomes if not o[1]]
+    return {
+        "concurrency": concurrency,
+        "requests": n_requests,
+        "errors": len(errors),
+        "error_statuses": sorted({str(e) for e in errors}),
+        "throughput_rps": n_requests / wall,
+        "mean_ms": float(latencies.mean()),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "max_ms": float(latencies.max()),
+        "rss_peak_mb": rss.peak,
+        "rss_end_mb": read_rss_mb(pid)
+    }
+
+
+# ========================================
+# Reporting
+# ========================================
+
+def print_table(results: List[Dict]):
+    print(f"\n{'router':<10}{'scenario':<22}{'conc':>5}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'err':>5}{'rss MB':>9}")
+    for r in results:
+        rss = f"{r['rss_peak_mb']:.0f}" if r['rss_peak_mb'] else "-"
+        print(f"{r['router']:<10}{r['scenario']:<22}{r['concurrency']:>5}{r['throughput_rps']:>9.1f}"
+              f"{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}{r['p99_ms']:>9.1f}{r['errors']:>5}{rss:>9}")
+
+
+def compare(results: List[Dict], baseline_path: Path, threshold: float) -> List[str]:
+    """Scenarios whose p95 or throughput regressed by more than `threshold`"""
+    baseline = json.loads(baseline_path.read_text())["results"]
+    index = {(r["router"], r["scenario"], r["concurrency"]): r for r in baseline}
+    regressions = []
+    for r in results:
+        old = index.get((r["router"], r["scenario"], r["concurrency"]))
+        if old is None:
+            continue
+        if r["p95_ms"] > old["p95_ms"] * (1 + threshold):
+            regressions.append(f"{r['router']}/{r['scenario']} c={r['concurrency']}: "
+                               f"p95 {old['p95_ms']:.1f} -> {r['p95_ms']:.1f} ms")
+        if r["throughput_rps"] < old["throughput_rps"] * (1 - threshold):
+            regressions.append(f"{r['router']}/{r['scenario']} c={r['concurrency']}: "
+                               f"throughput {old['throughput_rps']:.1f} -> {r['throughput_rps']:.1f} rps")
+    return regressions
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR, text=True).strip()
+    except Exception:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline API benchmark suite")
+    parser.add_argument("--routers", default=",".join(SCENARIOS), help="Comma-separated routers to drive")
+    parser.add_argument("--concurrency", default="1,8", help="Comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=50, help="Requests per scenario and concurrency level")
+    parser.add_argument("--warmup", type=int, default=2, help="Unmeasured requests before each run")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-request timeout in seconds")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Stub Ollama latency in seconds")
+    parser.add_argument("--app", default="main:app", help="ASGI app to serve (module:attribute)")
+    parser.add_argument("--profile", action="store_true", help="Run with PROFILING=all (slow requests only)")
+    parser.add_argument("--compare", type=Path, help="Baseline results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed regression ratio for --compare")
+    args = parser.parse_args()
+
+    routers = [r.strip() for r in args.routers.split(",") if r.strip()]
+    unknown = set(routers) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"Unknown routers: {sorted(unknown)}")
+    levels = [int(c) for c in args.concurrency.split(",")]
+    RESULTS_DIR.mkdir(exist_ok=True)
+
+    with StubOllamaServer(latency=args.llm_latency) as ollama, StubNewsServer() as news:
+        env = {
+            "MARKET_DATA_SOURCE": "fake",
+            "MARKET_DATA_RATE": "1000",
+            "OLLAMA_URL": ollama.url,
+            "NEWS_API_URL": f"{news.url}/data/v2/news/",
+            "PRICE_POLL_INTERVAL": "1",
+            "STARTUP_MODE": "eager",  # Measure steady state, not warm-up (see bench_startup.py)
+            "SCHEDULER": "off",
+            "PYTHONUNBUFFERED": "1"
+        }
+        if args.profile:
+            env.update({"PROFILING": "all", "PROFILE_DIR": str(RESULTS_DIR / "profiles")})
+
+        port = _free_port()
+        base_url = f"http://127.0.0.1:{port}"
+        print(f"Starting {args.app} on {base_url} (stubs: ollama {ollama.url}, news {news.url})")
+        started = time.perf_counter()
+        server = start_server(args.app, env, port)
+        startup_seconds = time.perf_counter() - started
+        print(f"✓ Server ready in {startup_seconds:.1f}s, RSS {read_rss_mb(server.pid) or 0:.0f} MB")
+
+        results = []
+        try:
+            for router in routers:
+                for scenario, method, path, body in SCENARIOS[router]:
+                    for concurrency in levels:
+                        stats = run_scenario(base_url, server.pid, method, path, body, concurrency,
+                                             args.requests, args.warmup, args.timeout)
+                        results.append({"router": router, "scenario": scenario, "method": method,
+                                        "path": path, **stats})
+                        print(f"  {router}/{scenario} c={concurrency}: {stats['throughput_rps']:.1f} rps, "
+                              f"p99 {stats['p99_ms']:.1f} ms, {stats['errors']} errors")
+            metrics_text = requests.get(f"{base_url}/metrics", timeout=10).text
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    output = RESULTS_DIR / f"{stamp}.json"
+    output.write_text(json.dumps({
+        "meta": {
+            "timestamp": datetime.now().isoformat(),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "app": args.app,
+            "requests": args.requests,
+            "concurrency": levels,
+            "llm_latency": args.llm_latency,
+            "startup_seconds": startup_seconds
+        },
+        "results": results
+    }, indent=2))
+    (RESULTS_DIR / f"{stamp}.metrics.txt").write_text(metrics_text)
+
+    print_table(results)
+    print(f"\n✓ Results written to {output}")
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        if regressions:
+            print(f"\n⚠ {len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+            for line in regressions:
+                print(f"  - {line}")
+            return 1
+        print(f"✓ No regressions beyond {args.threshold:.0%} against {args.compare}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
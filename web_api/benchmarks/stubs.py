@@ -0,0 +1,245 @@
+"""
+Local Upstream Stubs
+====================
+Offline stand-ins for the API's upstream services, so benchmarks are
+reproducible and never touch the network:
+
+- `StubOllamaServer`: /api/generate (plain and streamed NDJSON) and
+  /api/tags, with a configurable generation latency
+- `StubNewsServer`: CryptoCompare-style /data/v2/news/ feed with stable
+  article ids; `publish()` adds newer articles (incremental news fetches),
+  and each fixture story recurs every five articles with small edits
+  (near-duplicate collapsing)
+
+Market data is served by `FakeMarketDataSource` inside the API process
+(MARKET_DATA_SOURCE=fake), so no stub server is needed for it.
+
+Usage:
+    with StubOllamaServer(latency=0.05) as ollama, StubNewsServer() as news:
+        env = {'OLLAMA_URL': ollama.url, 'NEWS_API_URL': news.url + '/data/v2/news/'}
+"""
+
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+SENTIMENT_RESPONSE = {
+    "sentiment": "BULLISH",
+    "score": 35,
+    "confidence": 0.72,
+    "key_factors": ["ETF inflows", "Network upgrade", "Institutional adoption"],
+    "reasoning": "Benchmark stub response"
+}
+
+# Fixture news stories; article i reports story i % 5, so the feed repeats each story with small edits
+NEWS_STORIES = [
+    ("Spot ETF inflows", "Spot ETFs recorded strong net inflows as institutional demand returned, "
+                         "led by the largest issuers. Analysts read the flows as renewed confidence."),
+    ("Network upgrade", "Core developers scheduled the next network upgrade after successful testnet "
+                        "deployments, promising lower fees and faster finality for users."),
+    ("Regulatory review", "Regulators extended the review period for pending applications, citing "
+                          "open questions on custody, market surveillance and investor protection."),
+    ("Exchange outflows", "On-chain data shows coins leaving exchanges for self-custody at the fastest "
+                          "pace this quarter, which traders often read as reduced selling pressure."),
+    ("Miner revenue", "Miner revenue fell after the latest difficulty adjustment, and several public "
+                      "miners said they would sell part of their reserves to fund expansion."),
+]
+
+ANSWER_TEXT = (
+    "MARKET ANALYSIS: The model suggests a modest upward movement. "
+    "TECHNICAL INTERPRETATION: RSI is neutral and MACD is turning positive. "
+    "This is educational analysis of model predictions, not personal advice."
+)
+
+
+class _StubServer:
+    """ThreadingHTTPServer on an ephemeral localhost port, run in a daemon thread"""
+
+    handler_class = BaseHTTPRequestHandler
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        handler = type("Handler", (self.handler_class,), {"stub": self})
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self):
+        with self._lock:
+            self.requests += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class _JsonHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass  # Keep benchmark output clean
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return {}
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _send_json(self, payload, status: int = 200):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class _OllamaHandler(_JsonHandler):
+    def do_GET(self):
+        self.stub.count()
+        if urlparse(self.path).path == "/api/tags":
+            self._send_json({"models": [{"name": f"{self.stub.model}:latest"}]})
+        else:
+            self._send_json({"error": "not found"}, status=404)
+
+    def do_POST(self):
+        self.stub.count()
+        if urlparse(self.path).path != "/api/generate":
+            self._send_json({"error": "not found"}, status=404)
+            return
+        request = self._read_json()
+        text = self.stub.respond(request.get("prompt", ""), request)
+        time.sleep(self.stub.latency)
+
+        if not request.get("stream", True):
+            self._send_json({"model": request.get("model"), "response": text, "done": True})
+            return
+
+        # Streamed NDJSON, one chunk per word, like Ollama's default mode
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        words = text.split(" ")
+        try:
+            for i, word in enumerate(words):
+                chunk = {"model": request.get("model"), "response": word + (" " if i < len(words) - 1 else ""),
+                         "done": False}
+                self._write_chunk(json.dumps(chunk) + "\n")
+                if self.stub.token_delay:
+                    time.sleep(self.stub.token_delay)
+            self._write_chunk(json.dumps({"model": request.get("model"), "response": "", "done": True}) + "\n")
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            self.stub.disconnects += 1
+
+    def _write_chunk(self, data: str):
+        payload = data.encode()
+        self.wfile.write(f"{len(payload):X}\r\n".encode() + payload + b"\r\n")
+        self.wfile.flush()
+
+
+class StubOllamaServer(_StubServer):
+    """Deterministic Ollama stand-in"""
+
+    handler_class = _OllamaHandler
+
+    def __init__(self, latency: float = 0.05, token_delay: float = 0.0, model: str = "llama3.2", **kwargs):
+        """
+        Args:
+            latency: Seconds before the first byte of every generation
+            token_delay: Seconds between streamed chunks
+            model: Model name reported by /api/tags
+        """
+        super().__init__(**kwargs)
+        self.latency = latency
+        self.token_delay = token_delay
+        self.model = model
+        self.disconnects = 0
+
+    def respond(self, prompt: str, request: dict) -> str:
+        """Sentiment prompts get JSON (one entry per '### Coin' heading when batched), everything else prose"""
+        schema = request.get("format")
+        if isinstance(schema, dict) and "coins" in schema.get("properties", {}):
+            coins = re.findall(r"^### (.+)$", prompt, flags=re.MULTILINE)
+            return json.dumps({"coins": [dict(SENTIMENT_RESPONSE, coin=coin) for coin in coins]})
+        if '"sentiment"' in prompt or schema:
+            return json.dumps(SENTIMENT_RESPONSE)
+        return ANSWER_TEXT
+
+
+class _NewsHandler(_JsonHandler):
+    def do_GET(self):
+        self.stub.count()
+        if not urlparse(self.path).path.rstrip("/").endswith("/data/v2/news"):
+            self._send_json({"error": "not found"}, status=404)
+            return
+        time.sleep(self.stub.latency)
+        self._send_json({"Type": 100, "Message": "News list successfully returned", "Data": self.stub.articles()})
+
+
+class StubNewsServer(_StubServer):
+    """CryptoCompare news feed stand-in: a stable fixture feed that grows on `publish()`"""
+
+    handler_class = _NewsHandler
+
+    def __init__(self, latency: float = 0.01, n_articles: int = 10, page_size: int = 50, **kwargs):
+        """
+        Args:
+            latency: Seconds before every response
+            n_articles: Articles in the feed at start, ten minutes apart
+            page_size: Newest articles returned per request (CryptoCompare returns 50)
+        """
+        super().__init__(**kwargs)
+        self.latency = latency
+        self.page_size = page_size
+        self._feed = []
+        self.publish(n_articles, spacing=600, start=int(time.time()) - n_articles * 600)
+
+    def publish(self, n: int = 1, spacing: int = 1, start: int = None, body: str = None):
+        """
+        Add `n` articles newer than everything in the feed
+
+        Args:
+            spacing: Seconds between consecutive published_on values
+            start: published_on of the first new article (default: just after the newest)
+            body: Body shared by the new articles (default: the next fixture story)
+        """
+        with self._lock:
+            newest = self._feed[0]["published_on"] if self._feed else int(time.time())
+            first = start if start is not None else newest + spacing
+            for k in range(n):
+                i = len(self._feed)
+                headline, story = NEWS_STORIES[i % len(NEWS_STORIES)]
+                self._feed.insert(0, {
+                    "id": str(i),
+                    "title": f"{headline}: market update {i}",
+                    "body": body or f"{story} Report {i}.",
+                    "source": f"stub{i % 3}",
+                    "url": f"https://example.com/news/{i}",
+                    "published_on": first + k * spacing
+                })
+
+    def articles(self):
+        with self._lock:
+            return list(self._feed[:self.page_size])